@@ -50,6 +50,8 @@ class Challenges(Base):
     constraints = Column(String, nullable=False)
     notes = Column(String, nullable=True)
     hints = Column(JSON, nullable=True)
+    time_limit_ms = Column(Integer, nullable=True)  # Per test, runners use their own default if null
+    memory_limit_mb = Column(Integer, nullable=True)  # Null for no cap
     
     # The below likely won't get used for a good while until I implement more endpoints
 
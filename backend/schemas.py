@@ -26,6 +26,8 @@ class ChallengeListItemSchema(BaseModel):
     points: Optional[int] = None
     solves: Optional[int] = None
     likes: Optional[int] = None
+    time_limit_ms: Optional[int] = None
+    memory_limit_mb: Optional[int] = None
     # author: Optional[ChallengeAuthorSchema] = None # Will be null if not implemented
 
     class Config:
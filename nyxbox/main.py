@@ -43,6 +43,7 @@ from .plugins.auth_utils import (
     read_user_data,
 )
 from .plugins.code_runners.java_runner import run_java_code
+from .plugins.code_runners.toolchains import get_toolchains
 from .plugins.editor_tools import (
     CustomPathSelected,
     Editor,
@@ -331,6 +332,8 @@ class NyxBox(App):
             self.is_guest = True # This is a lie, its more of a "is_web_user" but honestly i've already done is_guest everywhere
         else:
             self.is_guest = False
+        # Probe compilers/JDKs in the background so the compile popup never has to wait on them
+        self.run_worker(get_toolchains(), group="toolchains", exit_on_error=False)
         if self.is_guest:
             pass
         else:
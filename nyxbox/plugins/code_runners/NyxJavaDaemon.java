@@ -0,0 +1,298 @@
+// Resident JVM for the java runner (see java_daemon.py), so a run doesn't pay for two cold
+// JVMs (javac, then java). It compiles Solution in memory with javax.tools, loads it in a
+// throwaway classloader and runs its main with the harness pointed at this process.
+//
+// Requests on stdin, all integers big-endian:
+//   u32 id, u32 per test timeout (ms), u32 config count, then count (key, value) strings,
+//   then the source. A string is a u32 length + UTF-8.
+// Responses on stdout, framed like the result channel (see protocol.py):
+//   {"id": N, "frame": <verdict frame>} for each test, then
+//   {"id": N, "done": true, "timed_out": bool, "compile_error": str|null, "error": str|null,
+//    "restart": bool}
+// Jobs run one at a time. A runaway test can't be stopped from the outside, so after a
+// timeout (or once the heap has grown past the limit) the daemon answers with restart set
+// and exits, and the runner starts a fresh one next time.
+import javax.tools.Diagnostic;
+import javax.tools.DiagnosticCollector;
+import javax.tools.FileObject;
+import javax.tools.ForwardingJavaFileManager;
+import javax.tools.JavaCompiler;
+import javax.tools.JavaFileObject;
+import javax.tools.SimpleJavaFileObject;
+import javax.tools.StandardJavaFileManager;
+import javax.tools.ToolProvider;
+import java.io.ByteArrayOutputStream;
+import java.io.DataInputStream;
+import java.io.DataOutputStream;
+import java.io.EOFException;
+import java.io.FileDescriptor;
+import java.io.FileOutputStream;
+import java.io.IOException;
+import java.io.OutputStream;
+import java.io.PrintStream;
+import java.lang.reflect.Field;
+import java.lang.reflect.InvocationTargetException;
+import java.lang.reflect.Method;
+import java.net.URI;
+import java.nio.charset.StandardCharsets;
+import java.util.ArrayList;
+import java.util.Collections;
+import java.util.HashMap;
+import java.util.LinkedHashMap;
+import java.util.List;
+import java.util.Map;
+
+public class NyxJavaDaemon {
+    private static final int COMPILED_CACHE_SIZE = 16;
+
+    private static DataOutputStream protocol;
+    private static long maxHeapBytes;
+
+    // Recently compiled sources, so Run then Submit on unchanged code skips javac
+    private static final Map<String, Map<String, byte[]>> compiled = new LinkedHashMap<String, Map<String, byte[]>>(16, 0.75f, true) {
+        @Override
+        protected boolean removeEldestEntry(Map.Entry<String, Map<String, byte[]>> eldest) {
+            return size() > COMPILED_CACHE_SIZE;
+        }
+    };
+
+    public static void main(String[] args) throws IOException {
+        maxHeapBytes = args.length > 0 ? Long.parseLong(args[0]) * 1024 * 1024 : Long.MAX_VALUE;
+        protocol = new DataOutputStream(new FileOutputStream(FileDescriptor.out));
+        // Whatever solutions print must never end up in the protocol stream
+        PrintStream sink = new PrintStream(new OutputStream() {
+            @Override
+            public void write(int b) {
+            }
+
+            @Override
+            public void write(byte[] b, int off, int len) {
+            }
+        });
+        System.setOut(sink);
+        System.setErr(sink);
+
+        JavaCompiler compiler = ToolProvider.getSystemJavaCompiler();
+        if (compiler == null) {
+            // A JRE without javac, the runner falls back to the javac/java executables
+            System.exit(3);
+        }
+        DataInputStream in = new DataInputStream(System.in);
+        while (true) {
+            int id;
+            try {
+                id = in.readInt();
+            } catch (EOFException e) {
+                return;
+            }
+            int testTimeoutMs = in.readInt();
+            int configCount = in.readInt();
+            Map<String, String> config = new HashMap<>();
+            for (int k = 0; k < configCount; k++) {
+                String key = readString(in);
+                config.put(key, readString(in));
+            }
+            String source = readString(in);
+            runJob(compiler, id, testTimeoutMs, config, source);
+        }
+    }
+
+    private static String readString(DataInputStream in) throws IOException {
+        byte[] bytes = new byte[in.readInt()];
+        in.readFully(bytes);
+        return new String(bytes, StandardCharsets.UTF_8);
+    }
+
+    private static synchronized void send(String message) {
+        try {
+            byte[] body = message.getBytes(StandardCharsets.UTF_8);
+            protocol.writeInt(body.length);
+            protocol.write(body);
+            protocol.flush();
+        } catch (IOException e) {
+            // The runner is gone
+            System.exit(0);
+        }
+    }
+
+    private static String jsonString(String s) {
+        if (s == null) return "null";
+        StringBuilder out = new StringBuilder("\"");
+        for (int k = 0; k < s.length(); k++) {
+            char c = s.charAt(k);
+            switch (c) {
+                case '"': out.append("\\\""); break;
+                case '\\': out.append("\\\\"); break;
+                case '\n': out.append("\\n"); break;
+                case '\r': out.append("\\r"); break;
+                case '\t': out.append("\\t"); break;
+                default:
+                    if (c < 0x20) out.append(String.format("\\u%04x", (int) c));
+                    else out.append(c);
+            }
+        }
+        return out.append('"').toString();
+    }
+
+    private static void done(int id, boolean timedOut, String compileError, String error) {
+        Runtime runtime = Runtime.getRuntime();
+        boolean restart = timedOut || runtime.totalMemory() - runtime.freeMemory() > maxHeapBytes;
+        send("{\"id\": " + id + ", \"done\": true, \"timed_out\": " + timedOut
+                + ", \"compile_error\": " + jsonString(compileError) + ", \"error\": " + jsonString(error)
+                + ", \"restart\": " + restart + "}");
+        if (restart) System.exit(0);
+    }
+
+    private static void runJob(JavaCompiler compiler, int id, int testTimeoutMs, Map<String, String> config, String source) {
+        Map<String, byte[]> classes = compiled.get(source);
+        if (classes == null) {
+            DiagnosticCollector<JavaFileObject> diagnostics = new DiagnosticCollector<>();
+            classes = compile(compiler, source, diagnostics);
+            if (classes == null) {
+                StringBuilder message = new StringBuilder();
+                for (Diagnostic<? extends JavaFileObject> d : diagnostics.getDiagnostics()) {
+                    if (d.getKind() != Diagnostic.Kind.ERROR) continue;
+                    message.append("Solution.java:").append(d.getLineNumber()).append(": error: ")
+                            .append(d.getMessage(null)).append('\n');
+                }
+                done(id, false, message.toString().trim(), null);
+                return;
+            }
+            compiled.put(source, classes);
+        }
+
+        final long[] lastProgress = {System.nanoTime()};
+        final Throwable[] failure = {null};
+        Thread runner;
+        try {
+            Class<?> solution = new MemoryClassLoader(classes).loadClass("Solution");
+            Field results = solution.getDeclaredField("nyxResults");
+            results.setAccessible(true);
+            results.set(null, new DataOutputStream(new FrameForwarder(id, lastProgress)));
+            Field nyxConfig = solution.getDeclaredField("nyxConfig");
+            nyxConfig.setAccessible(true);
+            nyxConfig.set(null, config);
+            Method main = solution.getMethod("main", String[].class);
+            runner = new Thread(() -> {
+                try {
+                    main.invoke(null, (Object) new String[0]);
+                } catch (InvocationTargetException e) {
+                    failure[0] = e.getCause();
+                } catch (Throwable e) {
+                    failure[0] = e;
+                }
+            }, "nyx-job-" + id);
+        } catch (ReflectiveOperationException | LinkageError e) {
+            done(id, false, null, String.valueOf(e));
+            return;
+        }
+        runner.setDaemon(true);
+        runner.start();
+        long limit = testTimeoutMs * 1_000_000L;
+        while (runner.isAlive()) {
+            long idle;
+            synchronized (lastProgress) {
+                idle = System.nanoTime() - lastProgress[0];
+            }
+            if (idle >= limit) {
+                done(id, true, null, null);
+                return;
+            }
+            try {
+                runner.join(Math.max(1, (limit - idle) / 1_000_000L));
+            } catch (InterruptedException e) {
+                Thread.currentThread().interrupt();
+            }
+        }
+        done(id, false, null, failure[0] == null ? null : String.valueOf(failure[0]));
+    }
+
+    private static Map<String, byte[]> compile(JavaCompiler compiler, String source, DiagnosticCollector<JavaFileObject> diagnostics) {
+        StandardJavaFileManager standard = compiler.getStandardFileManager(diagnostics, null, StandardCharsets.UTF_8);
+        Map<String, ByteArrayOutputStream> output = new HashMap<>();
+        ForwardingJavaFileManager<StandardJavaFileManager> manager = new ForwardingJavaFileManager<StandardJavaFileManager>(standard) {
+            @Override
+            public JavaFileObject getJavaFileForOutput(Location location, String className, JavaFileObject.Kind kind, FileObject sibling) {
+                return new SimpleJavaFileObject(URI.create("mem:///" + className.replace('.', '/') + kind.extension), kind) {
+                    @Override
+                    public OutputStream openOutputStream() {
+                        ByteArrayOutputStream bytes = new ByteArrayOutputStream();
+                        output.put(className, bytes);
+                        return bytes;
+                    }
+                };
+            }
+        };
+        JavaFileObject file = new SimpleJavaFileObject(URI.create("mem:///Solution.java"), JavaFileObject.Kind.SOURCE) {
+            @Override
+            public CharSequence getCharContent(boolean ignoreEncodingErrors) {
+                return source;
+            }
+        };
+        List<String> options = new ArrayList<>(Collections.singletonList("-nowarn"));
+        boolean ok = compiler.getTask(null, manager, diagnostics, options, null, Collections.singletonList(file)).call();
+        if (!ok) return null;
+        Map<String, byte[]> classes = new HashMap<>();
+        for (Map.Entry<String, ByteArrayOutputStream> entry : output.entrySet()) {
+            classes.put(entry.getKey(), entry.getValue().toByteArray());
+        }
+        return classes;
+    }
+
+    private static final class MemoryClassLoader extends ClassLoader {
+        private final Map<String, byte[]> classes;
+
+        MemoryClassLoader(Map<String, byte[]> classes) {
+            super(NyxJavaDaemon.class.getClassLoader());
+            this.classes = classes;
+        }
+
+        @Override
+        protected Class<?> findClass(String name) throws ClassNotFoundException {
+            byte[] bytes = classes.get(name);
+            if (bytes == null) throw new ClassNotFoundException(name);
+            return defineClass(name, bytes, 0, bytes.length);
+        }
+    }
+
+    // Takes the harness's result channel writes and relays every complete frame with the job id
+    private static final class FrameForwarder extends OutputStream {
+        private final int id;
+        private final long[] lastProgress;
+        private final ByteArrayOutputStream buffer = new ByteArrayOutputStream();
+
+        FrameForwarder(int id, long[] lastProgress) {
+            this.id = id;
+            this.lastProgress = lastProgress;
+        }
+
+        @Override
+        public synchronized void write(int b) {
+            buffer.write(b);
+        }
+
+        @Override
+        public synchronized void write(byte[] b, int off, int len) {
+            buffer.write(b, off, len);
+        }
+
+        @Override
+        public synchronized void flush() {
+            byte[] data = buffer.toByteArray();
+            int offset = 0;
+            while (data.length - offset >= 4) {
+                int length = ((data[offset] & 0xff) << 24) | ((data[offset + 1] & 0xff) << 16)
+                        | ((data[offset + 2] & 0xff) << 8) | (data[offset + 3] & 0xff);
+                if (data.length - offset - 4 < length) break;
+                String frame = new String(data, offset + 4, length, StandardCharsets.UTF_8);
+                send("{\"id\": " + id + ", \"frame\": " + frame + "}");
+                offset += 4 + length;
+            }
+            buffer.reset();
+            buffer.write(data, offset, data.length - offset);
+            synchronized (lastProgress) {
+                lastProgress[0] = System.nanoTime();
+            }
+        }
+    }
+}
@@ -0,0 +1,219 @@
+import asyncio
+import contextlib
+import hashlib
+import os
+import pathlib
+import shutil
+import tempfile
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+from .config import get_setting
+
+# Compiled artifacts keyed by a hash of everything that went into the build, so the same
+# program is only ever compiled once (Run then Submit, re-running unchanged code, ...).
+# Every entry is a directory holding whatever the toolchain produced. An entry in use (a
+# binary being run, a preamble being -included) is pinned with a shared flock on its
+# directory, see cached() and pin(), and eviction in any NyxBox process skips pinned entries.
+CACHE_DIR = pathlib.Path.home() / ".nyxbox" / "build_cache"
+
+_identities = {}
+# key -> [lock, callers holding or waiting on it], dropped once nobody is
+_locks = {}
+# Size of the cache as of the last full scan plus what this process stored since, so a miss
+# only walks the whole cache once that goes over budget. None until the first scan.
+_cache_bytes = None
+
+
+def artifact_key(*parts) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        data = part if isinstance(part, bytes) else str(part).encode("utf-8")
+        digest.update(len(data).to_bytes(8, "big"))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+async def tool_identity(path, *version_args) -> str:
+    """
+    Identifies a compiler for cache keys: its resolved path, mtime and version banner.
+    Remembered per binary, so upgrading the compiler in place still changes the key.
+    """
+    real = os.path.realpath(path)
+    mtime = os.stat(real).st_mtime_ns
+    cached = _identities.get(real)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    process = await asyncio.create_subprocess_exec(
+        real, *version_args,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT,
+    )
+    try:
+        banner, _ = await asyncio.wait_for(process.communicate(), timeout=10)
+    except asyncio.TimeoutError:
+        process.kill()
+        banner = b""
+    identity = f"{real}:{mtime}:{banner.decode('utf-8', errors='replace').strip()}"
+    _identities[real] = (mtime, identity)
+    return identity
+
+
+def _entry_size(path) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def _budget() -> int:
+    return int(get_setting("build_cache_mb")) * 1024 * 1024
+
+
+def evict(keep=None):
+    """Drop least recently used entries until the cache fits in `build_cache_mb`."""
+    global _cache_bytes
+    budget = _budget()
+    try:
+        entries = [e for e in os.scandir(CACHE_DIR) if e.is_dir() and not e.name.startswith(".")]
+    except OSError:
+        return
+    sized = []
+    total = 0
+    for entry in entries:
+        size = _entry_size(entry.path)
+        total += size
+        sized.append((entry.stat().st_mtime, entry.name, entry.path, size))
+    sized.sort()
+    for _, name, path, size in sized:
+        if total <= budget:
+            break
+        if name == keep or not _remove_unpinned(path):
+            continue
+        total -= size
+    _cache_bytes = total
+
+
+def _remove_unpinned(path) -> bool:
+    """Remove an entry unless someone has it pinned, False if it was left alone."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return True
+    try:
+        if fcntl is not None:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+        shutil.rmtree(path, ignore_errors=True)
+        return True
+    finally:
+        os.close(fd)
+
+
+def pin(path):
+    """Pin an entry, returns the fd to give back to unpin(). None if it was evicted meanwhile."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return None
+    if fcntl is not None:
+        # Only waits while an evict() elsewhere is removing it
+        fcntl.flock(fd, fcntl.LOCK_SH)
+    try:
+        if os.stat(path).st_ino == os.fstat(fd).st_ino:
+            return fd
+    except OSError:
+        pass
+    os.close(fd)
+    return None
+
+
+def unpin(fd):
+    # Closing drops the flock
+    os.close(fd)
+
+
+def lookup(key):
+    """Cached directory for `key`, or None. Hits are touched so eviction sees them as recent."""
+    path = CACHE_DIR / key
+    if not path.is_dir():
+        return None
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return str(path)
+
+
+@contextlib.asynccontextmanager
+async def cached(key, build):
+    """
+    `async with cached(key, build) as (directory, failure):` get_or_build(), with the entry
+    pinned until the block is done, so nothing evicts it while it's used.
+    """
+    while True:
+        path, failure = await get_or_build(key, build)
+        if failure is not None:
+            yield None, failure
+            return
+        fd = pin(path)
+        if fd is not None:
+            break
+        # Evicted between the lookup and the pin, it's built again
+    try:
+        yield path, None
+    finally:
+        unpin(fd)
+
+
+async def get_or_build(key, build) -> tuple:
+    """
+    Returns (directory, failure). On a miss `await build(workdir)` fills a fresh directory;
+    it returns None on success, anything else (e.g. the compile error results) is handed
+    back as the failure and nothing is cached.
+    """
+    entry = _locks.get(key)
+    if entry is None:
+        entry = _locks[key] = [asyncio.Lock(), 0]
+    entry[1] += 1
+    try:
+        async with entry[0]:
+            return await _get_or_build(key, build)
+    finally:
+        entry[1] -= 1
+        if not entry[1] and _locks.get(key) is entry:
+            del _locks[key]
+
+
+async def _get_or_build(key, build) -> tuple:
+    global _cache_bytes
+    path = lookup(key)
+    if path is not None:
+        return path, None
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    # Built next to the cache so the final rename is atomic, other nyxbox processes
+    # either see the whole entry or none of it
+    workdir = tempfile.mkdtemp(prefix=".build-", dir=CACHE_DIR)
+    try:
+        failure = await build(workdir)
+        if failure is not None:
+            return None, failure
+        try:
+            os.rename(workdir, CACHE_DIR / key)
+        except OSError:
+            # Someone else stored the same build first, theirs is just as good
+            pass
+    finally:
+        if os.path.exists(workdir):
+            shutil.rmtree(workdir, ignore_errors=True)
+    if _cache_bytes is not None:
+        _cache_bytes += _entry_size(CACHE_DIR / key)
+    if _cache_bytes is None or _cache_bytes > _budget():
+        evict(keep=key)
+    return lookup(key), None
@@ -3,24 +3,27 @@ import json
 import tempfile
 import asyncio
 import shutil
+from .cpp_runner import COMPILE_PROFILES, cpp_type, profile_for
+from .signature import challenge_signature, type_of
 #This file is largely unused since C isn't supported and I can't bother for the life of me to do the custom dicts
 # I don't evne know how to write C
-async def run_c_code(user_code, func_name, test_cases, standard):
+async def run_c_code(user_code, func_name, test_cases, standard, is_submission=False, signature=None):
     """
     Run C++ code against test cases and return results.
+    Built with the same compile profiles as C++ (see cpp_runner.COMPILE_PROFILES).
     """    
-    c_code = generate_c_program(user_code, func_name, test_cases)
+    c_code = generate_c_program(user_code, func_name, test_cases, signature)
 
     # TODO: Write the program to a temporary file, compile it, run it, and capture output
-    results = await compile_and_run(c_code, test_cases, standard)
+    results = await compile_and_run(c_code, test_cases, standard, profile_for(is_submission))
     # TODO: Return a list of dictionaries containing test results
     return results
 
-def generate_c_program(user_code, func_name, test_cases):
+def generate_c_program(user_code, func_name, test_cases, signature=None):
     """
     Generate a C program with test code.
     """
-    test_code = generate_test_code(func_name, test_cases)
+    test_code = generate_test_code(func_name, test_cases, signature)
     program_template = """
 #include <stdio.h>
 #include <stdbool.h>
@@ -41,10 +44,12 @@ int main(void) {{
     ret = program_template.format(user_code=user_code, test_code=test_code)
     return ret
 
-def generate_test_code(func_name, test_cases):
+def generate_test_code(func_name, test_cases, signature=None):
     """
-    Generate C++ code that tests the user's function.
+    Generate C++ code that tests the user's function, typed by the challenge's signature.
     """
+    if signature is None:
+        signature = challenge_signature({"tests": test_cases})
     test_code_blocks=[]
     # TODO: Create a list to hold test code blocks
     for i, test in enumerate(test_cases):
@@ -55,13 +60,13 @@ def generate_test_code(func_name, test_cases):
         input_vars = []
         input_args = []
         for j, input_val in enumerate(inputs):
-            c_type = infer_c_type(input_val)
+            c_type = cpp_type(signature["params"][j])
             var_name = f"input_{i}_{j}"
             c_value = python_to_c_value(input_val)
             input_vars.append(f"    {c_type} {var_name} = {c_value};")
             input_args.append(var_name)
 
-        expected_type = infer_c_type(expected)
+        expected_type = cpp_type(signature["returns"])
         expected_var = f"expected_{i}"
         expected_value = python_to_c_value(expected)
 
@@ -130,35 +135,8 @@ def infer_c_type(value):
     """
     Determine the appropriate C++ type for a Python value.
     """
-    if value is None:
-        return "nullptr"
-    elif isinstance(value, bool):
-        return "bool"
-    elif isinstance(value, int):
-        return "int"
-    elif isinstance(value, float):
-        return "double"
-    elif isinstance(value, str):
-        return "string"
-    elif isinstance(value, list):
-        if not value:
-            return "vector<int>"
-        first_type = type(value[0])
-        if all(isinstance(item, first_type) for item in value):
-            element_type = infer_c_type(value[0])
-            return f"vector<{element_type}>"
-        else:
-            return "vector<auto>"  # Not valid C++ but indicates a type issue
-    elif isinstance(value, dict):
-        if not value:
-            return "map<string, int>"  # Default for empty dict
-        
-        key, val = next(iter(value.items()))
-        key_type = infer_c_type(key)
-        val_type = infer_c_type(val)
-        return f"map<{key_type}, {val_type}>"
-    else:
-        return "auto"
+    # Same types the C++ runner uses (see signature.py)
+    return cpp_type(type_of(value))
     # TODO: Determine C++ type based on Python type:
     #   - None → nullptr_t
     #   - bool → bool
@@ -168,7 +146,7 @@ def infer_c_type(value):
     #   - list → vector<appropriate_type>
     #   - dict → map<key_type, value_type>
 
-async def compile_and_run(c_code, test_cases, standard):
+async def compile_and_run(c_code, test_cases, standard, profile="run"):
     """
     Compile and run C++ code, then parse the results.
     """
@@ -193,7 +171,7 @@ async def compile_and_run(c_code, test_cases, standard):
                     "error": "No compiler found."
                 }]
         compiler_process = await asyncio.create_subprocess_exec(
-            compiler, f'-std={standard}', tmp_c_file, '-o', executable, 
+            compiler, f'-std={standard}', *COMPILE_PROFILES[profile], tmp_c_file, '-o', executable, 
             stdout = asyncio.subprocess.PIPE, stderr = asyncio.subprocess.PIPE
         )
         try:
@@ -203,7 +181,7 @@ async def compile_and_run(c_code, test_cases, standard):
                 # Compiler reached error, return the error
                 # TODO: Handle compilation errors Done
                 return [{
-                        "input": f"{compiler} -std={standard} {tmp_c_file} -o {executable}",
+                        "input": f"{compiler} -std={standard} {' '.join(COMPILE_PROFILES[profile])} {tmp_c_file} -o {executable}",
                         "output": None,
                         "expected_output": None,
                         "passed": False,
@@ -211,7 +189,7 @@ async def compile_and_run(c_code, test_cases, standard):
                     }]
         except asyncio.TimeoutError:
             return [{
-            "input": f"{compiler} -std={standard} {tmp_c_file} -o {executable}",
+            "input": f"{compiler} -std={standard} {' '.join(COMPILE_PROFILES[profile])} {tmp_c_file} -o {executable}",
             "output": None,
             "expected_output": None,
             "passed": False,
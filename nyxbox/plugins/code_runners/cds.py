@@ -0,0 +1,188 @@
+import asyncio
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+from .build_cache import artifact_key, get_or_build, lookup, tool_identity
+from .protocol import RESULT_PATH_ENV
+from .scheduler import BACKGROUND, PRIORITY, slot
+from .testvec import VECTORS_ENV, vector_file
+
+# Class data sharing archives for the cold javac/java path. A training run of javac and of
+# a warmup harness dumps every class they load (javac itself, nio, the harness helpers) into
+# a dynamic archive, and later runs map it in instead of loading and verifying all of it again.
+# Dynamic archives need JDK 13+ and a runtime classpath that starts with the dump time one.
+# Only classes from jars get archived (a non-empty directory on the dump classpath fails the
+# dump), so the warmup class is packaged in its own fixed jar that prefixes every run's classpath.
+# Each archive is checked with -Xshare:on after the training run, since -Xshare:auto would
+# just quietly run without one that doesn't map, and kept or dropped on its own.
+WARMUP_CLASS = "NyxWarmup"
+PREFIX_JAR = "prefix.jar"
+_MIN_VERSION = 13
+
+_building = {}
+
+
+async def java_major_version(jdk_path):
+    banner = (await tool_identity(os.path.join(jdk_path, "bin", "java"), "-version")).split(":", 2)[-1]
+    match = re.search(r'version "(\d+)(?:\.(\d+))?', banner)
+    if not match:
+        return None
+    major = int(match.group(1))
+    # Java 8 and older report themselves as 1.x
+    return int(match.group(2) or 0) if major == 1 else major
+
+
+def _flags(archive_dir) -> dict:
+    flags = {"javac": [], "java": [], "classpath": None}
+    javac_archive = os.path.join(archive_dir, "javac.jsa")
+    if os.path.exists(javac_archive):
+        flags["javac"] = [f"-J-XX:SharedArchiveFile={javac_archive}", "-J-Xshare:auto", "-J-Xlog:cds*=off"]
+    run_archive = os.path.join(archive_dir, "run.jsa")
+    if os.path.exists(run_archive):
+        flags["java"] = [f"-XX:SharedArchiveFile={run_archive}", "-Xshare:auto", "-Xlog:cds*=off"]
+        flags["classpath"] = os.path.join(archive_dir, PREFIX_JAR)
+    return flags
+
+
+async def _key(jdk_path, warmup_source):
+    return artifact_key(
+        "java-cds", warmup_source,
+        await tool_identity(os.path.join(jdk_path, "bin", "javac"), "-version"),
+        await tool_identity(os.path.join(jdk_path, "bin", "java"), "-version"),
+    )
+
+
+async def build_archives(jdk_path, warmup_source, warmup_tests):
+    """
+    Build this JDK's archives if they don't exist yet and return the flags for them, see
+    cds_flags. None if the JDK is too old or the training runs failed.
+    """
+    # Runs as its own task, so this only makes its training wait behind the user's runs
+    PRIORITY.set(BACKGROUND)
+    version = await java_major_version(jdk_path)
+    if version is None or version < _MIN_VERSION:
+        return None
+    key = await _key(jdk_path, warmup_source)
+
+    async def run(command, env=None):
+        """Failure message for a command that didn't exit cleanly, else None."""
+        async with slot("compile"):
+            process = await asyncio.create_subprocess_exec(
+                *command, env=env, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL
+            )
+            try:
+                await asyncio.wait_for(process.wait(), timeout=120.0)
+            except asyncio.TimeoutError:
+                process.kill()
+                return "timed out"
+        if process.returncode != 0:
+            return f"{command[0]} exited with {process.returncode}"
+        return None
+
+    javac = os.path.join(jdk_path, "bin", "javac")
+    java = os.path.join(jdk_path, "bin", "java")
+
+    async def train(workdir):
+        javac_archive = os.path.join(workdir, "javac.jsa")
+        classes = os.path.join(workdir, "classes")
+        os.makedirs(classes)
+        source = os.path.join(workdir, f"{WARMUP_CLASS}.java")
+        with open(source, "w") as f:
+            f.write(warmup_source)
+        failure = await run([javac, f"-J-XX:ArchiveClassesAtExit={javac_archive}", "-d", classes, source])
+        if failure is not None:
+            return failure
+        os.unlink(source)
+        with zipfile.ZipFile(os.path.join(workdir, PREFIX_JAR), "w") as archive:
+            for root, _, names in os.walk(classes):
+                for name in names:
+                    path = os.path.join(root, name)
+                    archive.write(path, os.path.relpath(path, classes))
+        shutil.rmtree(classes)
+        if os.path.exists(javac_archive) and await run([javac, f"-J-XX:SharedArchiveFile={javac_archive}", "-J-Xshare:on", "-version"]) is not None:
+            os.unlink(javac_archive)
+        return None
+
+    archive_dir, failure = await get_or_build(key, train)
+    if failure is not None:
+        return None
+    jar = os.path.join(archive_dir, PREFIX_JAR)
+    run_archive = os.path.join(archive_dir, "run.jsa")
+    if os.path.exists(jar) and not os.path.exists(run_archive):
+        # Dumped once the entry is in place, the archive only maps with the jar at the path it
+        # was dumped with
+        partial = f"{run_archive}.{os.getpid()}.tmp"
+        env = {**os.environ, RESULT_PATH_ENV: os.devnull, VECTORS_ENV: vector_file(warmup_tests)}
+        if (await run([java, f"-XX:ArchiveClassesAtExit={partial}", "-cp", jar, WARMUP_CLASS], env) is None
+                and await run([java, f"-XX:SharedArchiveFile={partial}", "-Xshare:on", "-cp", jar, WARMUP_CLASS], env) is None):
+            os.replace(partial, run_archive)
+        else:
+            # javac's archive is still worth keeping, without the jar this isn't tried again
+            for path in (partial, jar):
+                if os.path.exists(path):
+                    os.unlink(path)
+    flags = _flags(archive_dir)
+    return flags if flags["javac"] or flags["java"] else None
+
+
+async def cds_flags(jdk_path, warmup_source, warmup_tests):
+    """
+    {"javac": extra javac args, "java": extra java args, "classpath": jar to put first on the
+    classpath, None along with empty "java" args if only javac's archive maps} when this
+    JDK's archives are ready, otherwise None. A missing archive is built
+    in the background, so only later runs pay off and this one never waits on training.
+    """
+    key = await _key(jdk_path, warmup_source)
+    archive_dir = lookup(key)
+    if archive_dir is not None:
+        return _flags(archive_dir)
+    task = _building.get(key)
+    if task is None or task.done():
+        _building[key] = asyncio.create_task(build_archives(jdk_path, warmup_source, warmup_tests))
+    return None
+
+
+async def _benchmark(jdk_path, rounds=5):
+    from .java_runner import WARMUP_CODE, WARMUP_TESTS, generate_java_program, warmup_source
+    source = generate_java_program(WARMUP_CODE, "nyxWarmup", WARMUP_TESTS, True)
+    flags = await build_archives(jdk_path, warmup_source(), WARMUP_TESTS)
+    if flags is None:
+        print("No CDS archive for this JDK (needs JDK 13+)")
+        return
+    env = {**os.environ, RESULT_PATH_ENV: os.devnull, VECTORS_ENV: vector_file(WARMUP_TESTS)}
+
+    async def timed(argv):
+        start = time.perf_counter()
+        process = await asyncio.create_subprocess_exec(
+            *argv, env=env, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL
+        )
+        await process.wait()
+        return time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "Solution.java")
+        with open(path, "w") as f:
+            f.write(source)
+        javac = os.path.join(jdk_path, "bin", "javac")
+        java = os.path.join(jdk_path, "bin", "java")
+        for label, javac_flags, java_flags, classpath in (
+            ("plain", [], [], workdir),
+            ("cds", flags["javac"], flags["java"], os.pathsep.join(filter(None, (flags["classpath"], workdir)))),
+        ):
+            compile_times, run_times = [], []
+            for _ in range(rounds):
+                compile_times.append(await timed([javac, *javac_flags, "-d", workdir, path]))
+                run_times.append(await timed([java, *java_flags, "-cp", classpath, "Solution"]))
+            print(f"{label:>5}: javac {min(compile_times) * 1000:.0f} ms, java {min(run_times) * 1000:.0f} ms (best of {rounds})")
+
+
+if __name__ == "__main__":
+    # python -m nyxbox.plugins.code_runners.cds /path/to/jdk
+    if len(sys.argv) != 2:
+        print("usage: python -m nyxbox.plugins.code_runners.cds <jdk path>")
+        sys.exit(2)
+    asyncio.run(_benchmark(sys.argv[1]))
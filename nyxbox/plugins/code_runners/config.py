@@ -0,0 +1,62 @@
+import json
+import os
+import pathlib
+
+# Runner knobs, overridable per machine in ~/.nyxbox/runner_config.json, e.g. {"shards": 4}
+CONFIG_PATH = pathlib.Path.home() / ".nyxbox" / "runner_config.json"
+
+DEFAULTS = {
+    # How many processes a test list is split across, 0 means one per available core
+    "shards": 0,
+    # Warm node processes kept around for JS runs, 0 turns the pool off
+    "js_workers": 2,
+    # Runs a node worker serves before it's replaced with a fresh one
+    "js_worker_max_runs": 50,
+    # Size bound for compiled C++/Java builds kept in ~/.nyxbox/build_cache. A precompiled
+    # preamble is ~45 MB, one per standard and compile profile, this fits the run and submit
+    # ones for every standard with room to spare for builds
+    "build_cache_mb": 1024,
+    # Keep a resident JVM per JDK that compiles and runs java solutions in-process
+    "java_daemon": True,
+    # Heap use after which the java daemon restarts itself
+    "java_daemon_max_heap_mb": 512,
+    # stdout + stderr a program may produce before it's killed, everything past it is dropped
+    "output_limit_kb": 1024,
+    # Compilers / programs allowed to run at once across every NyxBox process on this machine,
+    # 0 means half the cores for compiles and one per core for runs
+    "compile_slots": 0,
+    "run_slots": 0,
+    # Results of recent runs kept to answer an unchanged Run/Submit without running anything
+    "verdict_cache_entries": 64,
+    # Also keep them in ~/.nyxbox/verdicts, so they outlive the app
+    "verdict_cache_persist": True,
+    # The most a program's workspace may hold while it runs (see workspace.py), and the
+    # biggest file it may write there
+    "workspace_quota_mb": 64,
+}
+
+_config = None
+
+def load_runner_config() -> dict:
+    """Defaults merged with the user's config file, read once per process."""
+    global _config
+    if _config is None:
+        config = dict(DEFAULTS)
+        try:
+            with open(CONFIG_PATH, "r") as f:
+                user_config = json.load(f)
+            if isinstance(user_config, dict):
+                config.update({k: v for k, v in user_config.items() if k in DEFAULTS})
+        except (OSError, json.JSONDecodeError):
+            pass
+        _config = config
+    return _config
+
+def get_setting(name):
+    return load_runner_config()[name]
+
+def available_cores() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
@@ -2,10 +2,22 @@
 
 import os
 import json
-import tempfile
 import asyncio
+import contextlib
+import functools
+import platform
 import shutil
 import re
+import sys
+from .build_cache import artifact_key, cached, tool_identity
+from .limits import TIME_LIMIT_ENV, TLE_EXIT_CODE, Limits
+from .process import run_process
+from .protocol import RESULT_PATH_ENV, crash_result, frame_listener, results_from_frames, stop_at_first_failure
+from .scheduler import slot
+from .sharding import FAIL_FAST_ENV, SELECTION_ENV, run_sharded
+from .signature import BOOL, FLOAT, INT, MIXED, NONE, STR, harness_shape, parse_type
+from .testvec import VECTORS_ENV, vector_file
+from .workspace import workspace
 
 ALLOWED_CPP_HEADERS = {
     "vector", "string", "algorithm", "unordered_map",
@@ -13,9 +25,39 @@ ALLOWED_CPP_HEADERS = {
     "iostream", 
 }
 
-async def run_cpp_code(user_code, func_name, test_cases, standard, is_submission=False, is_guest = False):
+EXECUTABLE_NAME = "solution.exe" if os.name == "nt" else "solution"
+TIME_LIMIT_MS = 5000 # Per test, unless the challenge sets its own
+
+# -march=native on x86, other targets (arm) spell tuning for the host CPU -mcpu=native
+NATIVE_ARCH = "-march=native" if platform.machine().lower() in ("x86_64", "amd64", "i386", "i686") else "-mcpu=native"
+# Compiler flags per compile profile. A Run is a quick check of code that's about to change
+# again, so it gets the fastest build; Submit (and the complexity benchmark, which times
+# the code) get an optimized one, the way a judge would build it. Every profile has its own
+# cached build and precompiled preamble.
+COMPILE_PROFILES = {
+    "run": ["-O0"],
+    "submit": ["-O2", NATIVE_ARCH],
+    "benchmark": ["-O2", NATIVE_ARCH],
+}
+
+def profile_for(is_submission) -> str:
+    return "submit" if is_submission else "run"
+
+def link_flags(compiler, profile) -> list:
+    """Linker flags for a profile, a Run links with gold/lld when they're installed."""
+    if profile != "run" or not sys.platform.startswith("linux"):
+        return []
+    # lld is only a given with clang, older g++ doesn't know -fuse-ld=lld
+    linker = "lld" if "clang" in os.path.basename(compiler) and shutil.which("ld.lld") else "gold" if shutil.which("ld.gold") else None
+    return [f"-fuse-ld={linker}"] if linker else []
+
+async def run_cpp_code(user_code, func_name, test_cases, standard, is_submission=False, is_guest = False, time_limit_ms=None, memory_limit_mb=None, on_result=None, profile=None, signature=None):
     """
     Run C++ code against test cases and return results.
+    time_limit_ms (per test) and memory_limit_mb are the challenge's limits, if it has any.
+    on_result(index, result) is called for each test as it finishes. profile is one of
+    COMPILE_PROFILES, by default "submit" for submissions and "run" otherwise. signature is
+    the challenge's (see signature.py), inferred from test_cases if not given.
     """    
     if is_guest:
         imports = re.findall(r'^\s*#\s*include\s*[<"]([^>"]+)[>"]', user_code, re.MULTILINE)
@@ -29,23 +71,23 @@ async def run_cpp_code(user_code, func_name, test_cases, standard, is_submission
                 "error": "Use of import statements is disallowed"
                 }]
             
-    if is_submission:
-        filtered_tests = test_cases  # All tests, including hidden
-    else:
-        filtered_tests = [t for t in test_cases if not t.get("hidden", False)]
-    cpp_code = generate_cpp_program(user_code, func_name, filtered_tests, is_submission)
+    # Every test is compiled in and the binary picks its tests at runtime, so the build only
+    # differs by profile
+    indices = [i for i, t in enumerate(test_cases) if is_submission or not t.get("hidden", False)]
+    cpp_code = generate_cpp_program(user_code, func_name, test_cases, True, signature)
 
-    results = await compile_and_run(cpp_code, filtered_tests, standard)
+    results = await compile_and_run(
+        cpp_code, test_cases, standard, indices, Limits(time_limit_ms or TIME_LIMIT_MS, memory_limit_mb), on_result,
+        profile or profile_for(is_submission), fail_fast=is_submission,
+    )
+    if is_submission:
+        return stop_at_first_failure(results)
     return results
 
-def generate_cpp_program(user_code, func_name, test_cases, is_submission):
-    """
-    Generate a C++ program with test code.
-    """
-    
-    test_code = generate_test_code(func_name, test_cases, is_submission)
-    program_template = """
-#include <iostream>
+# Fixed part of every program: headers, the result channel and printing helpers.
+# It's compiled into a precompiled header once per compiler and standard (see ensure_preamble)
+# and force-included, so a run only has to parse the user's code and the tests.
+PREAMBLE_TEMPLATE = r"""#include <iostream>
 #include <vector>
 #include <string>
 #include <map>
@@ -53,8 +95,291 @@ def generate_cpp_program(user_code, func_name, test_cases, is_submission):
 #include <unordered_set>
 #include <unordered_map>
 #include <stdexcept>
+#include <sstream>
+#include <cstdio>
+#include <cstdlib>
+#include <cstdint>
+#include <cstring>
+#include <chrono>
+#include <ctime>
+#ifndef _WIN32
+#include <sys/resource.h>
+#include <sys/time.h>
+#include <csignal>
+#include <unistd.h>
+#endif
 using namespace std;
 
+// Verdicts go out on the result channel (see protocol.py), not stdout
+static FILE* nyx_results = nullptr;
+
+static std::string nyx_json_string(const std::string& s) {{
+    std::string out = "\"";
+    for (unsigned char c : s) {{
+        switch (c) {{
+            case '"': out += "\\\""; break;
+            case '\\': out += "\\\\"; break;
+            case '\n': out += "\\n"; break;
+            case '\r': out += "\\r"; break;
+            case '\t': out += "\\t"; break;
+            default:
+                if (c < 0x20) {{
+                    char buf[8];
+                    snprintf(buf, sizeof buf, "\\u%04x", c);
+                    out += buf;
+                }} else {{
+                    out += (char)c;
+                }}
+        }}
+    }}
+    return out + "\"";
+}}
+
+static void nyx_frame(const std::string& body) {{
+    unsigned long n = body.size();
+    unsigned char head[4] = {{(unsigned char)(n >> 24), (unsigned char)(n >> 16), (unsigned char)(n >> 8), (unsigned char)n}};
+    fwrite(head, 1, 4, nyx_results);
+    fwrite(body.data(), 1, body.size(), nyx_results);
+    fflush(nyx_results);
+}}
+
+static void nyx_report(int test, const char* status, const std::string& extra) {{
+    nyx_frame("{{\"test\": " + std::to_string(test) + ", \"status\": \"" + status + "\"" + extra + "}}");
+}}
+
+// Set from {fail_fast_env} (see sharding.py): stop at the first test that doesn't pass
+static bool nyx_fail_fast = false;
+
+static void nyx_stop(int test) {{
+    nyx_frame("{{\"stopped\": " + std::to_string(test) + "}}");
+}}
+
+// Per-test watchdog (see limits.py). A test still running after {time_limit_env} ms gets its
+// "tle" frame written straight from the signal handler and the harness exits with
+// {tle_exit_code}, the runner starts a fresh one for the tests after it. No interval timers on
+// Windows, the process timeout covers it there.
+static long nyx_time_limit_ms = 0;
+static int nyx_current_test = -1;
+#ifndef _WIN32
+static char nyx_tle_frame[80];
+static size_t nyx_tle_size = 0;
+
+static void nyx_on_alarm(int) {{
+    ssize_t written = write(fileno(nyx_results), nyx_tle_frame, nyx_tle_size);
+    (void)written;
+    _exit({tle_exit_code});
+}}
+#endif
+
+static void nyx_parse_limits() {{
+    const char* limit = getenv("{time_limit_env}");
+    nyx_time_limit_ms = limit ? atol(limit) : 0;
+#ifndef _WIN32
+    if (nyx_time_limit_ms > 0) signal(SIGALRM, nyx_on_alarm);
+#endif
+}}
+
+static void nyx_arm() {{
+#ifndef _WIN32
+    if (nyx_time_limit_ms <= 0) return;
+    int n = snprintf(nyx_tle_frame + 4, sizeof nyx_tle_frame - 4, "{{\"test\": %d, \"status\": \"tle\"}}", nyx_current_test);
+    nyx_tle_frame[0] = (char)(n >> 24);
+    nyx_tle_frame[1] = (char)(n >> 16);
+    nyx_tle_frame[2] = (char)(n >> 8);
+    nyx_tle_frame[3] = (char)n;
+    nyx_tle_size = 4 + n;
+    struct itimerval timer = {{}};
+    timer.it_value.tv_sec = nyx_time_limit_ms / 1000;
+    timer.it_value.tv_usec = (nyx_time_limit_ms % 1000) * 1000;
+    setitimer(ITIMER_REAL, &timer, nullptr);
+#endif
+}}
+
+static void nyx_disarm() {{
+#ifndef _WIN32
+    if (nyx_time_limit_ms <= 0) return;
+    struct itimerval timer = {{}};
+    setitimer(ITIMER_REAL, &timer, nullptr);
+#endif
+}}
+
+// Wall and CPU time since nyx_start() and this process's peak RSS so far (see protocol.py)
+static std::chrono::steady_clock::time_point nyx_wall_start;
+static double nyx_cpu_start = 0;
+
+static double nyx_cpu_ms() {{
+#ifndef _WIN32
+    struct rusage ru;
+    getrusage(RUSAGE_SELF, &ru);
+    return (ru.ru_utime.tv_sec + ru.ru_stime.tv_sec) * 1000.0 + (ru.ru_utime.tv_usec + ru.ru_stime.tv_usec) / 1000.0;
+#else
+    return std::clock() * 1000.0 / CLOCKS_PER_SEC;
+#endif
+}}
+
+static void nyx_start() {{
+    nyx_arm();
+    nyx_cpu_start = nyx_cpu_ms();
+    nyx_wall_start = std::chrono::steady_clock::now();
+}}
+
+// Also stops the watchdog, it's called as soon as the call returns
+static std::string nyx_usage() {{
+    nyx_disarm();
+    double wall = std::chrono::duration<double, std::milli>(std::chrono::steady_clock::now() - nyx_wall_start).count();
+    char buf[128];
+    snprintf(buf, sizeof buf, ", \"time_ms\": %.3f, \"cpu_ms\": %.3f", wall, nyx_cpu_ms() - nyx_cpu_start);
+    std::string usage = buf;
+#ifndef _WIN32
+    struct rusage ru;
+    getrusage(RUSAGE_SELF, &ru);
+#ifdef __APPLE__
+    long peak_kb = (long)(ru.ru_maxrss / 1024);
+#else
+    long peak_kb = (long)ru.ru_maxrss;
+#endif
+    usage += ", \"memory_kb\": " + std::to_string(peak_kb);
+#endif
+    return usage;
+}}
+
+// Which tests to run, from {selection_env} (see sharding.py). Unset means all of them.
+static std::vector<std::pair<int, int>> nyx_ranges;
+static bool nyx_run_all = true;
+
+static void nyx_parse_selection() {{
+    nyx_fail_fast = getenv("{fail_fast_env}") != nullptr;
+    const char* spec = getenv("{selection_env}");
+    if (!spec) return;
+    nyx_run_all = false;
+    std::stringstream ss(spec);
+    std::string part;
+    while (std::getline(ss, part, ',')) {{
+        if (part.empty()) continue;
+        size_t dash = part.find('-');
+        int start = std::stoi(part.substr(0, dash));
+        int end = dash == std::string::npos ? start : std::stoi(part.substr(dash + 1));
+        nyx_ranges.push_back({{start, end}});
+    }}
+}}
+
+static bool nyx_selected(int test) {{
+    if (nyx_run_all) return true;
+    for (const auto& range : nyx_ranges) {{
+        if (test >= range.first && test <= range.second) return true;
+    }}
+    return false;
+}}
+
+// Test inputs, read at runtime from the vector file in {vectors_env} (see testvec.py)
+static std::vector<unsigned char> nyx_vectors;
+
+static bool nyx_load_vectors() {{
+    const char* path = getenv("{vectors_env}");
+    FILE* f = path ? fopen(path, "rb") : nullptr;
+    if (!f) return false;
+    unsigned char chunk[65536];
+    size_t n;
+    while ((n = fread(chunk, 1, sizeof chunk, f)) > 0) nyx_vectors.insert(nyx_vectors.end(), chunk, chunk + n);
+    fclose(f);
+    return nyx_vectors.size() >= 12 && std::string(nyx_vectors.begin(), nyx_vectors.begin() + 4) == "NYXV";
+}}
+
+struct NyxReader {{
+    size_t pos;
+
+    unsigned char byte() {{
+        if (pos >= nyx_vectors.size()) throw std::runtime_error("Truncated test vector");
+        return nyx_vectors[pos++];
+    }}
+    uint64_t word(int bytes) {{
+        uint64_t value = 0;
+        for (int k = 0; k < bytes; ++k) value = (value << 8) | byte();
+        return value;
+    }}
+    uint32_t u32() {{ return (uint32_t)word(4); }}
+    // Skips a null. The signature types a value by what the other tests hold (see
+    // signature.py), so a None (a missing answer) reads as that type's empty value.
+    bool none() {{
+        if (pos >= nyx_vectors.size() || nyx_vectors[pos] != 'N') return false;
+        ++pos;
+        return true;
+    }}
+    void expect(unsigned char tag) {{
+        if (byte() != tag) throw std::runtime_error(std::string("Test vector type mismatch, expected ") + (char)tag);
+    }}
+    long long integer() {{
+        unsigned char tag = byte();
+        if (tag == 'I') return (long long)word(8);
+        if (tag == 'B') return byte();
+        throw std::runtime_error("Test vector type mismatch, expected an integer");
+    }}
+    double real() {{
+        unsigned char tag = byte();
+        if (tag == 'I') return (double)(long long)word(8);
+        if (tag != 'R') throw std::runtime_error("Test vector type mismatch, expected a number");
+        uint64_t bits = word(8);
+        double value;
+        memcpy(&value, &bits, sizeof value);
+        return value;
+    }}
+    std::string text() {{
+        expect('S');
+        uint32_t n = u32();
+        if (pos + n > nyx_vectors.size()) throw std::runtime_error("Truncated test vector");
+        std::string value(nyx_vectors.begin() + pos, nyx_vectors.begin() + pos + n);
+        pos += n;
+        return value;
+    }}
+}};
+
+template <typename T> struct NyxDecode;
+template <typename T> static T nyx_read(NyxReader& r);
+template <> struct NyxDecode<int> {{ static int read(NyxReader& r) {{ return (int)r.integer(); }} }};
+template <> struct NyxDecode<long long> {{ static long long read(NyxReader& r) {{ return r.integer(); }} }};
+template <> struct NyxDecode<bool> {{ static bool read(NyxReader& r) {{ return r.integer() != 0; }} }};
+template <> struct NyxDecode<double> {{ static double read(NyxReader& r) {{ return r.real(); }} }};
+template <> struct NyxDecode<std::string> {{ static std::string read(NyxReader& r) {{ return r.text(); }} }};
+template <typename T> struct NyxDecode<std::vector<T>> {{
+    static std::vector<T> read(NyxReader& r) {{
+        r.expect('L');
+        uint32_t n = r.u32();
+        std::vector<T> value;
+        value.reserve(n);
+        for (uint32_t k = 0; k < n; ++k) value.push_back(nyx_read<T>(r));
+        return value;
+    }}
+}};
+template <typename K, typename V> struct NyxDecode<std::map<K, V>> {{
+    static std::map<K, V> read(NyxReader& r) {{
+        r.expect('M');
+        uint32_t n = r.u32();
+        std::map<K, V> value;
+        for (uint32_t k = 0; k < n; ++k) {{
+            K key = nyx_read<K>(r);
+            value[key] = nyx_read<V>(r);
+        }}
+        return value;
+    }}
+}};
+
+template <typename T>
+static T nyx_read(NyxReader& r) {{
+    if (r.none()) return T{{}};
+    return NyxDecode<T>::read(r);
+}}
+
+// Reader positioned on the first input of test i. Also restarts the usage timers and the
+// watchdog, the test code restarts them again right before the call so decoding isn't counted.
+static NyxReader nyx_test(int i) {{
+    nyx_current_test = i;
+    nyx_start();
+    NyxReader header{{12 + 4 * (size_t)i}};
+    NyxReader r{{header.u32()}};
+    r.u32();
+    return r;
+}}
+
 // Helper to print STL containers for test output
 template <typename T>
 std::ostream& operator<<(std::ostream& os, const std::vector<T>& vec) {{
@@ -121,12 +446,41 @@ std::ostream& operator<<(std::ostream& os, const std::pair<A, B>& p) {{
     return os;
 }}
 
+template <typename T>
+static std::string nyx_show(const T& value) {{
+    std::ostringstream os;
+    os << value;
+    return os.str();
+}}
+"""
+CPP_PREAMBLE = PREAMBLE_TEMPLATE.format(
+    selection_env=SELECTION_ENV, vectors_env=VECTORS_ENV, time_limit_env=TIME_LIMIT_ENV, tle_exit_code=TLE_EXIT_CODE,
+    fail_fast_env=FAIL_FAST_ENV,
+)
+PREAMBLE_NAME = "nyx_preamble.h"
+
+# Stands in for the user's code while the harness around it is generated
+USER_CODE_MARK = "\0NYX_USER_CODE\0"
+CPP_PROGRAM_TEMPLATE = r"""
+// The preamble (CPP_PREAMBLE) is force-included by the compiler, see compile_and_run
 // ===== USER CODE START =====
 {user_code}
 // ===== USER CODE END =====
 
 int main() {{
     bool all_passed = true;
+    const char* nyx_results_path = getenv("{result_env}");
+    nyx_results = nyx_results_path ? fopen(nyx_results_path, "wb") : nullptr;
+    if (!nyx_results) {{
+        cerr << "Could not open the result channel" << endl;
+        return 2;
+    }}
+    nyx_parse_selection();
+    nyx_parse_limits();
+    if (!nyx_load_vectors()) {{
+        cerr << "Could not read the test vectors" << endl;
+        return 2;
+    }}
 
 {test_code}
 
@@ -134,214 +488,218 @@ int main() {{
     return all_passed ? 0 : 1;
 }}
 """
-    ret = program_template.format(user_code=user_code, test_code=test_code)
-    return ret
-def generate_test_code(func_name, test_cases, is_submission):
+
+def generate_cpp_program(user_code, func_name, test_cases, is_submission, signature=None):
+    """
+    Generate a C++ program with test code: the user's code in the harness (see cpp_harness).
+    """
+    prefix, suffix = cpp_harness(func_name, test_cases, is_submission, signature)
+    return prefix + user_code + suffix
+
+def cpp_harness(func_name, test_cases, is_submission, signature=None):
+    """
+    (prefix, suffix) that go around the user's code. Only the user's code changes from run to
+    run, so this is generated once per function, signature, tests and mode (see harness_shape).
+    """
+    return _cpp_harness(func_name, *harness_shape(test_cases, is_submission, signature))
+
+@functools.lru_cache(maxsize=32)
+def _cpp_harness(func_name, params, returns, count, visible):
+    test_code = _test_code(func_name, params, returns, count, visible)
+    program = CPP_PROGRAM_TEMPLATE.format(user_code=USER_CODE_MARK, test_code=test_code, result_env=RESULT_PATH_ENV, selection_env=SELECTION_ENV)
+    prefix, _, suffix = program.partition(USER_CODE_MARK)
+    return prefix, suffix
+
+def generate_test_code(func_name, test_cases, is_submission, signature=None):
     """
     Generate C++ code that tests the user's function.
+    Values are decoded from the vector file at runtime and every test has the challenge's
+    signature (see signature.py), so this is one loop whatever the number of tests.
     """
-    test_code_blocks=[]    
-    for i, test in enumerate(test_cases):
-        if not is_submission and test.get("hidden", False):
-            continue
-            
-        inputs = test.get('input', [])
-        expected = test.get('expected_output')
-        input_vars = []
-        input_args = []
-        for j, input_val in enumerate(inputs):
-            cpp_type = infer_cpp_type(input_val)
-            var_name = f"input_{i}_{j}"
-            cpp_value = python_to_cpp_value(input_val)
-            input_vars.append(f"    {cpp_type} {var_name} = {cpp_value};")
-            input_args.append(var_name)
-
-        expected_type = infer_cpp_type(expected)
-        expected_var = f"expected_{i}"
-        expected_value = python_to_cpp_value(expected)
-
-        test_block = f"""
-    // Test case {i+1}
-    cout << "Test {i+1}: ";
-    try {{
+    return _test_code(func_name, *harness_shape(test_cases, is_submission, signature))
+
+def _test_code(func_name, params, returns, count, visible):
+    input_types = [cpp_type(name) for name in params]
+    expected_type = cpp_type(returns)
+    if visible is None:
+        label = f"Test cases 1-{count}"
+        loop = f"for (int nyx_i = 0; nyx_i < {count}; nyx_i++)"
+    else:
+        label = "Visible test cases"
+        loop = "for (int nyx_i : {" + ", ".join(str(i) for i in visible) + "})"
+    input_vars = [
+        f"            {input_type} input_{j} = nyx_read<{input_type}>(nyx_in);"
+        for j, input_type in enumerate(input_types)
+    ]
+    input_args = [f"input_{j}" for j in range(len(input_types))]
+
+    return f"""
+    // {label}
+    {loop} {{
+        if (!nyx_selected(nyx_i)) continue;
+        try {{
+            NyxReader nyx_in = nyx_test(nyx_i);
 {chr(10).join(input_vars)}
-        {expected_type} {expected_var} = {expected_value};
+            {expected_type} expected = nyx_read<{expected_type}>(nyx_in);
 
-        // Call the function with test inputs
-        auto result = {func_name}({", ".join(input_args)});
+            // Call the function with test inputs
+            nyx_start();
+            auto result = {func_name}({", ".join(input_args)});
+            std::string nyx_used = nyx_usage();
 
-        // Compare result with expected output
-        if (result == {expected_var}) {{
-            cout << "PASS" << endl;
-        }} else {{
+            // Compare result with expected output
+            if (result == expected) {{
+                nyx_report(nyx_i, "pass", nyx_used);
+            }} else {{
+                all_passed = false;
+                nyx_report(nyx_i, "fail", nyx_used + ", \\"output\\": " + nyx_json_string(nyx_show(result)) + ", \\"expected\\": " + nyx_json_string(nyx_show(expected)));
+            }}
+        }} catch (const std::bad_alloc&) {{
+            all_passed = false;
+            nyx_report(nyx_i, "mle", nyx_usage());
+        }} catch (exception& e) {{
             all_passed = false;
-            cout << "FAIL - Got: " << result << ", Expected: " << {expected_var} << endl;
+            nyx_report(nyx_i, "error", nyx_usage() + ", \\"error\\": " + nyx_json_string(e.what()));
+        }}
+        if (nyx_fail_fast && !all_passed) {{
+            nyx_stop(nyx_i);
+            break;
         }}
-    }} catch (exception& e) {{
-        all_passed = false;
-        cout << "ERROR - " << e.what() << endl;
     }}"""
-        test_code_blocks.append(test_block)
 
-    return "\n".join(test_code_blocks)
+# How signature types (see signature.py) are spelled in C++
+CPP_TYPES = {NONE: "nullptr", BOOL: "bool", INT: "int", FLOAT: "double", STR: "string", MIXED: "auto"}
+
+def _cpp_type(parsed):
+    if isinstance(parsed, str):
+        return CPP_TYPES[parsed]
+    if parsed[0] == "list":
+        return f"vector<{_cpp_type(parsed[1])}>"
+    return f"map<{_cpp_type(parsed[1])}, {_cpp_type(parsed[2])}>"
 
-def python_to_cpp_value(value):
+@functools.lru_cache(maxsize=256)
+def cpp_type(name):
     """
-    Convert Python values to C++ literals.
+    The C++ type for a signature type, e.g. "vector<int>" for "list[int]". "auto" (not valid
+    as a parameter type) is where the tests don't agree on a type.
     """
-    if value is None:
-        return "nullptr"
-    elif isinstance(value, bool):
-        if value:
-            return "true"
-        return "false"
-    elif isinstance(value, int):
-        return str(value)
-    elif isinstance(value, float):
-        return str(value)
-    elif isinstance(value, str):
-        escaped = value.replace('\\', '\\\\').replace('"', '\\"')
-        return f'"{escaped}"'
-    elif isinstance(value, list):
-        elements = [python_to_cpp_value(item) for item in value]
-        return "{" + ", ".join(elements) + "}"
-    elif isinstance(value, dict):
-        pairs = ["{" + python_to_cpp_value(k) + ", " + python_to_cpp_value(v) + "}" 
-                 for k, v in value.items()]
-        return "{" + ", ".join(pairs) + "}"
-    else:
-        return "Warning: Unsupported type!"
+    return _cpp_type(parse_type(name))
 
-
-def infer_cpp_type(value):
+@contextlib.asynccontextmanager
+async def ensure_preamble(compiler, standard, identity, flags=()):
     """
-    Determine the appropriate C++ type for a Python value.
+    `async with ensure_preamble(...) as header:` path of the preamble header for this
+    compiler, standard and compiler flags, with its precompiled header built next to it and
+    kept from eviction until the block is done. `-include` picks the PCH up automatically (.gch for
+    g++, .pch for clang) and quietly falls back to parsing the header if it's missing or
+    stale (built with another -O level counts), so a failed PCH build just means slower compiles.
     """
-    if value is None:
-        return "nullptr"
-    elif isinstance(value, bool):
-        return "bool"
-    elif isinstance(value, int):
-        return "int"
-    elif isinstance(value, float):
-        return "double"
-    elif isinstance(value, str):
-        return "string"
-    elif isinstance(value, list):
-        if not value:
-            return "vector<int>"
-        first_type = type(value[0])
-        if all(isinstance(item, first_type) for item in value):
-            element_type = infer_cpp_type(value[0])
-            return f"vector<{element_type}>"
-        else:
-            return "vector<auto>"  # Not valid C++ but indicates a type issue
-    elif isinstance(value, dict):
-        if not value:
-            return "map<string, int>"  # Default for empty dict
-        
-        key, val = next(iter(value.items()))
-        key_type = infer_cpp_type(key)
-        val_type = infer_cpp_type(val)
-        return f"map<{key_type}, {val_type}>"
-    else:
-        return "auto"
-   
-async def compile_and_run(cpp_code, test_cases, standard):
+    key = artifact_key("cpp-preamble", CPP_PREAMBLE, standard, identity, *flags)
+
+    async def build(workdir):
+        header = os.path.join(workdir, PREAMBLE_NAME)
+        with open(header, "w") as f:
+            f.write(CPP_PREAMBLE)
+        suffix = ".pch" if "clang" in os.path.basename(compiler) else ".gch"
+        async with slot("compile"):
+            pch_process = await asyncio.create_subprocess_exec(
+                compiler, f'-std={standard}', *flags, '-x', 'c++-header', header, '-o', header + suffix,
+                stdout = asyncio.subprocess.DEVNULL, stderr = asyncio.subprocess.DEVNULL
+            )
+            try:
+                await asyncio.wait_for(pch_process.wait(), timeout=60.0)
+            except asyncio.TimeoutError:
+                pch_process.kill()
+        if pch_process.returncode != 0 and os.path.exists(header + suffix):
+            os.unlink(header + suffix)
+        return None
+
+    async with cached(key, build) as (preamble_dir, _):
+        yield os.path.join(preamble_dir, PREAMBLE_NAME)
+
+async def compile_and_run(cpp_code, test_cases, standard, indices=None, limits=None, on_result=None, profile="run", fail_fast=False):
     """
-    Compile and run C++ code, then parse the results.
+    Compile (or fetch the cached build of) the C++ program with the flags of `profile` (see
+    COMPILE_PROFILES), run the tests at `indices` and parse the results, with `limits`
+    (a Limits) per test. on_result hears each test's result as soon as it's in (see
+    protocol.frame_listener). fail_fast stops at the first test that doesn't pass.
     """
-    tmp_cpp_file = None
-    executable = None
-    results = []
-    
-    try:
-        with tempfile.NamedTemporaryFile(suffix='.cpp', delete=False) as tmp_file:
-            tmp_cpp_file = tmp_file.name
-            tmp_file.write(cpp_code.encode('utf-8'))
-        executable = tmp_cpp_file.strip(".cpp") + ('out.exe' if os.name == 'nt' else 'out')
-        compiler = shutil.which("g++") or shutil.which("clang++")
-        if not compiler:
-            return [{
-                    "input": "Compiler check",
+    if indices is None:
+        indices = range(len(test_cases))
+    if limits is None:
+        limits = Limits(TIME_LIMIT_MS)
+    compiler = shutil.which("g++") or shutil.which("clang++")
+    if not compiler:
+        return [{
+                "input": "Compiler check",
+                "output": None,
+                "expected_output": None,
+                "passed": False,
+                "error": "No compiler found."
+            }]
+    identity = await tool_identity(compiler, "--version")
+    flags = COMPILE_PROFILES[profile]
+    linker_flags = link_flags(compiler, profile)
+    key = artifact_key("cpp", CPP_PREAMBLE, cpp_code, standard, identity, *flags, *linker_flags)
+
+    async def build(workdir):
+        source = os.path.join(workdir, "solution.cpp")
+        with open(source, "wb") as f:
+            f.write(cpp_code.encode('utf-8'))
+        async with ensure_preamble(compiler, standard, identity, flags) as preamble:
+            command = [
+                compiler, f'-std={standard}', *flags, '-include', preamble, source, *linker_flags,
+                '-o', os.path.join(workdir, EXECUTABLE_NAME),
+            ]
+            async with slot("compile"):
+                compiler_process = await asyncio.create_subprocess_exec(
+                    *command, stdout = asyncio.subprocess.PIPE, stderr = asyncio.subprocess.PIPE
+                )
+                try:
+                    _, stderr = await asyncio.wait_for(compiler_process.communicate(), timeout=20.0)
+                except asyncio.TimeoutError:
+                    compiler_process.kill()
+                    return [{
+                    "input": " ".join(command),
                     "output": None,
                     "expected_output": None,
                     "passed": False,
-                    "error": "No compiler found."
+                    "error": "Execution timed out (20 seconds)"
                 }]
-        compiler_process = await asyncio.create_subprocess_exec(
-            compiler, f'-std={standard}', tmp_cpp_file, '-o', executable, 
-            stdout = asyncio.subprocess.PIPE, stderr = asyncio.subprocess.PIPE
-        )
-        try:
-            _, stderr = await asyncio.wait_for(compiler_process.communicate(), timeout=20.0)
             if compiler_process.returncode != 0:
                 # Compiler reached error, return the error
                 return [{
-                        "input": f"{compiler} -std={standard} {tmp_cpp_file} -o {executable}",
+                        "input": " ".join(command),
                         "output": None,
                         "expected_output": None,
                         "passed": False,
                         "error": stderr.decode('utf-8', errors='replace').strip()
                     }]
-        except asyncio.TimeoutError:
-            return [{
-            "input": f"{compiler} -std={standard} {tmp_cpp_file} -o {executable}",
-            "output": None,
-            "expected_output": None,
-            "passed": False,
-            "error": "Execution timed out (20 seconds)"
-        }]
-
-        if os.name == 'nt':
-            process = await asyncio.create_subprocess_exec(
-            executable,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        else:
-            process = await asyncio.create_subprocess_exec(
-            executable, 
-            stdout = asyncio.subprocess.PIPE, 
-            stderr = asyncio.subprocess.PIPE
-            )
-        try:
-            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=20.0)
-        except asyncio.TimeoutError:
-            return [{
-            "input": "Execution",
-            "output": None,
-            "expected_output": None,
-            "passed": False,
-            "error": "Execution timed out (20 seconds)"
-        }]
-
-        for test in stdout.decode('utf-8', errors='replace').splitlines():
-            if "Test " in test:
-                new1_test=test.split("Test ") # ["1: PASS"]
-                # ["Test ", "1: FAIL - Got: x Expected: y"]
-                test_index=int(new1_test[1].split(":")[0])-1
-                if "PASS" in test:
-                    results.append({"input": test_cases[test_index]["input"], 
-                                    "output": test_cases[test_index]['expected_output'], 
-                                    "expected_output": test_cases[test_index]['expected_output'],
-                                    "passed": True,
-                                    "error": None})
-                elif "FAIL" in test:
-                    fail_str = new1_test[1].split("FAIL - Got: ")[1]
-                    actual_output, expected_output = fail_str.split(", Expected: ")
-                    results.append({"input": test_cases[test_index]["input"], 
-                                    "output": actual_output, 
-                                    "expected_output": expected_output,
-                                    "passed": False,
-                                    "error": None})
-
-    finally:
-        try:
-            if tmp_cpp_file is not None and os.path.exists(tmp_cpp_file):
-                os.unlink(tmp_cpp_file)
-            if tmp_cpp_file is not None and os.path.exists(tmp_cpp_file):
-                os.unlink(tmp_cpp_file)
-        except Exception as e:
-            print(f"Error cleaning up temp files: {e}")
-    return results
\ No newline at end of file
+        os.unlink(source)
+        return None
+
+    # Pinned while its tests run, so another run's eviction can't take the binary away
+    async with cached(key, build) as (build_dir, failure):
+        if failure is not None:
+            return failure
+        executable = os.path.join(build_dir, EXECUTABLE_NAME)
+
+        # Same binary for every shard, each one only runs its slice of the tests
+        vectors = vector_file(test_cases)
+        on_frame = frame_listener(on_result, test_cases, check=limits.check)
+
+        async def run_shard(env):
+            async with workspace() as ws:
+                return ws.checked(await run_process(
+                    [executable], limits.process_timeout(len(indices)), cwd=ws.path,
+                    env={**os.environ, **env, **limits.env(), VECTORS_ENV: vectors}, on_frame=on_frame,
+                    preexec_fn=ws.preexec(limits.preexec()),
+                ))
+
+        result = await run_sharded(indices, run_shard, on_frame=on_frame, fail_fast=fail_fast)
+
+        results = limits.check(results_from_frames(result.frames, test_cases))
+        if result.returncode is not None and result.returncode != 0 and len(results) < len(indices):
+            # Exited part way, e.g. the solution calling exit()
+            results.append(crash_result(result.returncode, result.stderr))
+        return results
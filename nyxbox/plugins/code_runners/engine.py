@@ -0,0 +1,265 @@
+import asyncio
+import os
+import shutil
+import sys
+from .build_cache import artifact_key, tool_identity
+from .cpp_runner import run_cpp_code
+from .java_runner import run_java_code
+from .js_runner import run_js_code
+from .py_runner import run_python_code
+from .signature import challenge_signature
+from .toolchains import get_toolchains
+from .verdicts import cacheable, get_verdict_cache, tests_digest, verdict_key
+
+# One interface over the language runners, so callers don't need to know that C++ wants a
+# standard, Java a JDK, or which of them take the whole challenge. Each runner spawns through
+# process.run_process / the fork server / the worker pools, which all queue on the
+# scheduler's slots (see scheduler.py). Unchanged runs are answered from the verdict cache
+# (see verdicts.py). Per test verdicts can be heard as they come in, see Runner.stream.
+
+# Which tests a Run covers. Besides these a selection can be a list of indices into the
+# challenge's tests, e.g. the ones picked in the editor. Submit always runs everything.
+ALL_TESTS = "all"
+FAILED_ONLY = "failed"
+FAILED_FIRST = "failed_first"
+
+# Per challenge, the indices of the tests that failed the last time they ran
+_failed = {}
+
+
+def _failures_key(challenge) -> str:
+    return artifact_key(challenge.get("name"), challenge.get("function_name"), tests_digest(challenge.get("tests", [])))
+
+
+def select_tests(challenge, selection=ALL_TESTS, is_submission=False) -> list:
+    """
+    Indices into challenge["tests"] to run, in the order to run them. Falls back to every
+    visible test when there's nothing to narrow down to (no failures on record, nothing picked).
+    """
+    tests = challenge.get("tests", [])
+    visible = [i for i, test in enumerate(tests) if is_submission or not test.get("hidden", False)]
+    if is_submission or selection in (None, ALL_TESTS):
+        return visible
+    failed = _failed.get(_failures_key(challenge)) or set()
+    if selection == FAILED_ONLY:
+        chosen = [i for i in visible if i in failed]
+    elif selection == FAILED_FIRST:
+        chosen = [i for i in visible if i in failed] + [i for i in visible if i not in failed]
+    else:
+        allowed = set(visible)
+        chosen = [i for i in selection if i in allowed]
+    return chosen or visible
+
+
+def _maps_to_tests(challenge, indices, results) -> bool:
+    # Results come in test order, a submission stops at its first failure so it can be a
+    # prefix. Results about the whole run (a compile error, a crashed harness...) have no
+    # expected output where the test has one.
+    tests = challenge.get("tests", [])
+    return len(results) <= len(indices) and all(
+        result.get("input") is not None
+        and (result.get("expected_output") is not None or tests[i].get("expected_output") is None)
+        for i, result in zip(indices, results)
+    )
+
+
+def _record_failures(challenge, indices, results):
+    if _maps_to_tests(challenge, indices, results):
+        failed = {i: not result.get("passed") for i, result in zip(indices, results)}
+    else:
+        # Every test in the run still needs work
+        failed = {i: True for i in indices}
+    key = _failures_key(challenge)
+    if key not in _failed and len(_failed) >= 64:
+        _failed.clear()
+    known = _failed.setdefault(key, set())
+    for i, did_fail in failed.items():
+        if did_fail:
+            known.add(i)
+        else:
+            known.discard(i)
+
+
+class RunnerUnavailable(Exception):
+    """Raised when a runner's toolchain isn't installed, Runner.run reports it as a result."""
+    pass
+
+
+def unavailable_result(message) -> dict:
+    """Result entry for a run that couldn't start, e.g. no compiler or interpreter installed."""
+    return {"input": "Toolchain check", "output": None, "expected_output": None, "passed": False, "error": message}
+
+
+class Runner:
+    """
+    Runs a solution against a challenge's tests. `challenge["tests"]` are the tests to run
+    (hidden ones only count on submit), and its time_limit_ms/memory_limit_mb are applied.
+    `selection` narrows a Run down to some of them, see select_tests. Returns the runners'
+    result dicts, in run order with "test_index" (into challenge["tests"]) set when each one
+    maps to a test. Ones that came from the verdict cache have "cached" set.
+    on_result(result) is called with each test's result (test_index set) as soon as it's in.
+    """
+    language = None
+    needs_compile = False
+    # Options the runner can't do without, default_options() fills in the ones not given
+    required_options = ()
+
+    async def default_options(self) -> dict:
+        """Options to use when the user didn't pick any, e.g. the C++ standard."""
+        return {}
+
+    async def toolchain(self, options) -> str:
+        """Identifies what the code gets compiled/run with, for the verdict cache."""
+        return ""
+
+    async def run(self, code, challenge, is_submission=False, is_guest=False, force=False, selection=ALL_TESTS, on_result=None, **options) -> list:
+        """`force` runs the code even if the verdict cache has results for it."""
+        indices = select_tests(challenge, selection, is_submission)
+        narrowed = self._narrow(challenge, indices, selection)
+        live = None
+        if on_result is not None:
+            # Runners report positions in the test list they were given
+            def live(position, result):
+                on_result({**result, "test_index": position if narrowed is challenge else indices[position]})
+        try:
+            results = await self._run_cached(code, narrowed, is_submission, is_guest, force, options, live)
+        except RunnerUnavailable as e:
+            return [unavailable_result(str(e))]
+        except FileNotFoundError as e:
+            # A tool that went missing after the checks, or a mistyped JDK path
+            return [unavailable_result(f"Couldn't start {e.filename or 'the program'}, is it installed?")]
+        _record_failures(challenge, indices, results)
+        if _maps_to_tests(challenge, indices, results):
+            results = [{**result, "test_index": i} for i, result in zip(indices, results)]
+        return results
+
+    async def stream(self, code, challenge, **kwargs):
+        """
+        run() as an async iterator: yields ("test", result) for each test as it finishes, in
+        the order they finish, then ("done", results) with what run() returns. Takes run()'s
+        arguments except on_result.
+        """
+        queue = asyncio.Queue()
+        task = asyncio.create_task(self.run(code, challenge, on_result=lambda result: queue.put_nowait(("test", result)), **kwargs))
+        task.add_done_callback(lambda _: queue.put_nowait(None))
+        try:
+            while (item := await queue.get()) is not None:
+                yield item
+            yield "done", task.result()
+        finally:
+            if not task.done():
+                task.cancel()
+
+    def _narrow(self, challenge, indices, selection):
+        if selection in (None, ALL_TESTS):
+            # Same list object as before, so its test vector file and digests are reused
+            return challenge
+        tests = challenge.get("tests", [])
+        # The signature stays the whole challenge's, not what the picked tests alone suggest
+        return {**challenge, "tests": [tests[i] for i in indices], "signature": challenge_signature(challenge)}
+
+    async def _run_cached(self, code, challenge, is_submission, is_guest, force, options, on_result) -> list:
+        if any(name not in options for name in self.required_options):
+            options = {**await self.default_options(), **options}
+        cache = get_verdict_cache()
+        key = verdict_key(self.language, code, challenge, await self.toolchain(options), is_submission, is_guest)
+        if not force:
+            results = cache.get(key)
+            if results is not None:
+                return [{**result, "cached": True} for result in results]
+        results = await self._execute(code, challenge, is_submission, is_guest, on_result, **options)
+        # Only verdicts for the tests themselves, not a run that failed as a whole
+        if cacheable(results) and _maps_to_tests(challenge, select_tests(challenge, ALL_TESTS, is_submission), results):
+            cache.put(key, results)
+        return results
+
+    async def _execute(self, code, challenge, is_submission, is_guest, on_result, **options) -> list:
+        raise NotImplementedError
+
+
+class PythonRunner(Runner):
+    language = "py"
+
+    async def toolchain(self, options) -> str:
+        return f"{sys.executable}:{sys.version}"
+
+    async def _execute(self, code, challenge, is_submission, is_guest, on_result, **options) -> list:
+        return await run_python_code(code, challenge, is_submission, is_guest, on_result)
+
+
+class JSRunner(Runner):
+    language = "js"
+
+    async def toolchain(self, options) -> str:
+        node = shutil.which("node")
+        return await tool_identity(node, "--version") if node else ""
+
+    async def _execute(self, code, challenge, is_submission, is_guest, on_result, **options) -> list:
+        if not shutil.which("node"):
+            raise RunnerUnavailable("Node.js not found")
+        return await run_js_code(code, challenge, is_submission, is_guest, on_result)
+
+
+class CppRunner(Runner):
+    """
+    Options: standard, and profile (see cpp_runner.COMPILE_PROFILES), which defaults to the
+    optimized "submit" build for submissions and the quick "run" one otherwise.
+    """
+    language = "cpp"
+    needs_compile = True
+    required_options = ("standard",)
+
+    async def default_options(self) -> dict:
+        compilers = (await get_toolchains())["cpp"]
+        if not compilers:
+            raise RunnerUnavailable("No C++ compiler found")
+        standards = compilers[0]["standards"]
+        return {"standard": "c++17" if "c++17" in standards or not standards else standards[0]}
+
+    async def toolchain(self, options) -> str:
+        # Same pick as cpp_runner.compile_and_run
+        compiler = shutil.which("g++") or shutil.which("clang++")
+        # Without a profile the build follows is_submission, which the verdict key has already
+        return f"{await tool_identity(compiler, '--version') if compiler else ''}:{options['standard']}:{options.get('profile', '')}"
+
+    async def _execute(self, code, challenge, is_submission, is_guest, on_result, **options) -> list:
+        return await run_cpp_code(
+            code, challenge["function_name"], challenge["tests"], options["standard"], is_submission, is_guest,
+            time_limit_ms=challenge.get("time_limit_ms"), memory_limit_mb=challenge.get("memory_limit_mb"), on_result=on_result,
+            profile=options.get("profile"), signature=challenge_signature(challenge),
+        )
+
+
+class JavaRunner(Runner):
+    language = "java"
+    needs_compile = True
+    required_options = ("jdk_path",)
+
+    async def default_options(self) -> dict:
+        jdks = (await get_toolchains())["java"]
+        if not jdks:
+            raise RunnerUnavailable("No JDK found")
+        # Newest one, like the compile popup picks by default
+        return {"jdk_path": jdks[sorted(jdks, reverse=True)[0]]}
+
+    async def toolchain(self, options) -> str:
+        javac = os.path.join(options["jdk_path"], "bin", "javac.exe" if os.name == "nt" else "javac")
+        try:
+            return await tool_identity(javac, "-version")
+        except OSError:
+            # Not a JDK (a mistyped custom path), the runner reports that
+            return options["jdk_path"]
+
+    async def _execute(self, code, challenge, is_submission, is_guest, on_result, **options) -> list:
+        return await run_java_code(
+            code, challenge["function_name"], challenge["tests"], options["jdk_path"], is_submission, is_guest,
+            time_limit_ms=challenge.get("time_limit_ms"), memory_limit_mb=challenge.get("memory_limit_mb"), on_result=on_result,
+            signature=challenge_signature(challenge),
+        )
+
+
+RUNNERS = {runner.language: runner for runner in (PythonRunner(), JSRunner(), CppRunner(), JavaRunner())}
+
+def get_runner(language):
+    """The runner for a language code ("py", "js", "cpp", "java"), None if there isn't one."""
+    return RUNNERS.get(language)
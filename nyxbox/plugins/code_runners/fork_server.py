@@ -0,0 +1,146 @@
+import asyncio
+import json
+import os
+import struct
+import sys
+from .process import output_limit
+from .scheduler import slot
+
+# The server half lives in zygote.py, this is the async client the python runner talks to.
+ZYGOTE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "zygote.py")
+HEADER = struct.Struct(">I")
+# os.fork is POSIX only, Windows keeps cold starting interpreters
+FORK_SERVER_SUPPORTED = hasattr(os, "fork")
+
+
+class ForkServerError(Exception):
+    """Raised when the fork server died or could not be started."""
+    pass
+
+
+class ForkServer:
+    """
+    Long lived `python -I -S` process that forks a fresh child for every run.
+    Started lazily on first use and restarted if it dies (or the event loop changed).
+    """
+    def __init__(self):
+        self._process = None
+        self._loop = None
+        self._reader = None
+        self._pending = {}
+        self._next_id = 0
+        self._start_lock = None
+        # Keys of the harnesses the running server has compiled already
+        self._harnesses = set()
+
+    def _is_alive(self):
+        return (
+            self._process is not None
+            and self._process.returncode is None
+            and self._loop is asyncio.get_running_loop()
+        )
+
+    async def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._start_lock is None or self._loop is not loop:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self._is_alive():
+                return
+            self._loop = loop
+            self._pending = {}
+            self._harnesses = set()
+            self._process = await asyncio.create_subprocess_exec(
+                sys.executable, "-I", "-S", ZYGOTE_PATH,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL,
+            )
+            self._reader = asyncio.create_task(self._read_responses(self._process, self._pending))
+
+    async def _read_responses(self, process, pending):
+        try:
+            while True:
+                header = await process.stdout.readexactly(HEADER.size)
+                (length,) = HEADER.unpack(header)
+                response = json.loads(await process.stdout.readexactly(length))
+                job = pending.get(response["id"])
+                if job is None:
+                    continue
+                future, frames, on_frame = job
+                if "frame" in response:
+                    frames.append(response["frame"])
+                    if on_frame is not None:
+                        on_frame(response["frame"])
+                    continue
+                del pending[response["id"]]
+                if not future.done():
+                    response["frames"] = frames
+                    future.set_result(response)
+        except (asyncio.IncompleteReadError, ConnectionError, json.JSONDecodeError):
+            pass
+        finally:
+            # Whatever was in flight is lost, let the callers fall back
+            for future, _, _ in pending.values():
+                if not future.done():
+                    future.set_exception(ForkServerError("Fork server exited unexpectedly"))
+            pending.clear()
+
+    async def run(self, source, timeout, on_frame=None, env=None, memory_limit_mb=None, cwd=None, file_limit=None, harness=None):
+        """
+        Run `source` in a freshly forked child, with `env` added to its environment.
+        harness is a (key, source) pair run after `source` in the same namespace, compiled
+        once by the server and reused for every later run with the same key.
+        Returns a dict with stdout, stderr, returncode, timed_out, truncated and the result
+        channel frames, on_frame is called for each frame as it arrives. memory_limit_mb caps
+        the child's address space, output past the `output_limit_kb` setting gets it killed.
+        The child runs in `cwd`, file_limit caps the size of files it writes (bytes).
+        Waits for a "run" slot first, see scheduler.py.
+        """
+        async with slot("run"):
+            return await self._submit(source, timeout, on_frame, env, memory_limit_mb, cwd, file_limit, harness)
+
+    async def _submit(self, source, timeout, on_frame, env, memory_limit_mb, cwd=None, file_limit=None, harness=None):
+        await self._ensure_started()
+        harness_key, harness_source = harness if harness is not None else (None, None)
+        if harness_key in self._harnesses:
+            harness_source = None
+        self._next_id += 1
+        job_id = self._next_id
+        future = self._loop.create_future()
+        self._pending[job_id] = (future, [], on_frame)
+        data = json.dumps({
+            "id": job_id, "source": source, "timeout": timeout, "env": env or {}, "memory_limit_mb": memory_limit_mb,
+            "output_limit": output_limit(), "cwd": cwd, "file_limit": file_limit,
+            "harness_key": harness_key, "harness": harness_source,
+        }).encode("utf-8")
+        try:
+            self._process.stdin.write(HEADER.pack(len(data)) + data)
+            if harness_key is not None:
+                # Requests are read in order, anything after this one can send just the key
+                self._harnesses.add(harness_key)
+            await self._process.stdin.drain()
+        except (ConnectionError, RuntimeError) as e:
+            self._pending.pop(job_id, None)
+            raise ForkServerError(str(e)) from e
+        # The server enforces the timeout itself, this is only a safety net if it hangs
+        return await asyncio.wait_for(future, timeout=timeout + 5)
+
+    async def close(self):
+        if self._process is not None and self._process.returncode is None:
+            try:
+                self._process.stdin.close()
+                await asyncio.wait_for(self._process.wait(), timeout=2)
+            except Exception:
+                self._process.kill()
+        self._process = None
+
+
+_fork_server = None
+
+def get_fork_server():
+    """Shared fork server for the whole app."""
+    global _fork_server
+    if _fork_server is None:
+        _fork_server = ForkServer()
+    return _fork_server
@@ -0,0 +1,160 @@
+import asyncio
+import json
+import os
+import pathlib
+import random
+import string
+import sys
+import tempfile
+from .build_cache import artifact_key
+from .process import run_process
+from .signature import challenge_signature
+
+# Large hidden stress tests that challenges describe instead of spelling out. A challenge can
+# have a "generators" list and a "reference" solution (Python source defining the challenge's
+# function) that produces their expected outputs:
+#
+#   "generators": [
+#     {"seed": 1, "size": 100000, "count": 2, "params": [
+#       {"type": "int_array", "min": -1000000, "max": 1000000},
+#       {"type": "int", "min": -2000000, "max": 2000000}
+#     ]}
+#   ]
+#
+# One param spec per function parameter. Types are int, float, bool (min/max where they
+# apply), int_array, float_array, bool_array and string ("length" defaults to the
+# generator's size, strings take an "alphabet"). Expanded tests are kept on disk per
+# (challenge, seed, size), so the reference only ever runs once for them and every
+# language's runner gets the very same list.
+GENERATED_DIR = pathlib.Path.home() / ".nyxbox" / "generated"
+_FORMAT_VERSION = 1
+REFERENCE_TIMEOUT = 120.0
+
+REFERENCE_HARNESS = """
+import json, sys
+job = json.load(sys.stdin)
+namespace = {}
+exec(job["code"], namespace)
+function = namespace[job["function_name"]]
+json.dump([function(*args) for args in job["inputs"]], sys.stdout)
+"""
+
+_expanded = {}
+
+
+class GeneratorError(Exception):
+    """Raised when a challenge's generators or reference solution are broken."""
+    pass
+
+
+def generate_value(spec, size, rng):
+    kind = spec.get("type")
+    length = int(spec.get("length", size))
+    low, high = spec.get("min", -size), spec.get("max", size)
+    match kind:
+        case "int":
+            return rng.randint(int(low), int(high))
+        case "float":
+            return rng.uniform(float(low), float(high))
+        case "bool":
+            return rng.random() < 0.5
+        case "int_array":
+            return [rng.randint(int(low), int(high)) for _ in range(length)]
+        case "float_array":
+            return [rng.uniform(float(low), float(high)) for _ in range(length)]
+        case "bool_array":
+            return [rng.random() < 0.5 for _ in range(length)]
+        case "string":
+            alphabet = spec.get("alphabet") or string.ascii_lowercase
+            return "".join(rng.choice(alphabet) for _ in range(length))
+    raise GeneratorError(f"Unknown generator param type {kind!r}")
+
+
+def generate_inputs(generator) -> list:
+    """The generator's `count` inputs, the same ones for the same seed every time."""
+    rng = random.Random(generator.get("seed", 0))
+    size = int(generator.get("size", 1000))
+    return [
+        [generate_value(spec, size, rng) for spec in generator.get("params", [])]
+        for _ in range(int(generator.get("count", 1)))
+    ]
+
+
+async def run_reference(reference, function_name, inputs) -> list:
+    """Expected outputs for `inputs`, from the reference solution in a python of its own."""
+    job = json.dumps({"code": reference, "function_name": function_name, "inputs": inputs})
+    result = await run_process([sys.executable, "-c", REFERENCE_HARNESS], REFERENCE_TIMEOUT, stdin_data=job.encode("utf-8"))
+    if result.timed_out:
+        raise GeneratorError("Reference solution timed out")
+    if result.returncode != 0:
+        lines = result.stderr.strip().splitlines()
+        raise GeneratorError(f"Reference solution failed: {lines[-1] if lines else f'exit code {result.returncode}'}")
+    try:
+        return json.loads(result.stdout)
+    except json.JSONDecodeError as e:
+        raise GeneratorError("Reference solution returned something that isn't JSON") from e
+
+
+def _load(path):
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+        if isinstance(data, dict) and data.get("format") == _FORMAT_VERSION:
+            return data["tests"]
+    except (OSError, json.JSONDecodeError, KeyError):
+        pass
+    return None
+
+
+def _save(path, tests):
+    try:
+        GENERATED_DIR.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=GENERATED_DIR, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump({"format": _FORMAT_VERSION, "tests": tests}, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+
+
+async def _generated_tests(challenge, generator) -> list:
+    # The spec and the reference are part of the key, editing either regenerates
+    key = artifact_key(
+        "generated", challenge.get("name"), generator.get("seed", 0), generator.get("size", 1000),
+        json.dumps(generator, sort_keys=True), challenge.get("reference", ""),
+    )
+    path = GENERATED_DIR / f"{key}.json"
+    tests = _load(path)
+    if tests is None:
+        inputs = await asyncio.to_thread(generate_inputs, generator)
+        outputs = await run_reference(challenge["reference"], challenge["function_name"], inputs)
+        if len(outputs) != len(inputs):
+            raise GeneratorError("Reference solution didn't answer every input")
+        tests = [
+            {"input": test_input, "expected_output": output, "hidden": True, "generated": True}
+            for test_input, output in zip(inputs, outputs)
+        ]
+        _save(path, tests)
+    return tests
+
+
+async def with_stress_tests(challenge) -> dict:
+    """
+    `challenge` with its generated tests appended, or `challenge` itself if it has none.
+    The expanded list is reused for as long as the app runs, which also keeps its test
+    vector file from being encoded again (see testvec.vector_file).
+    """
+    generators = challenge.get("generators")
+    if not generators:
+        return challenge
+    if not challenge.get("reference"):
+        raise GeneratorError("Challenge has generators but no reference solution")
+    key = artifact_key(json.dumps(challenge.get("tests"), sort_keys=True), json.dumps(generators, sort_keys=True), challenge.get("reference"))
+    tests = _expanded.get(key)
+    if tests is None:
+        tests = list(challenge.get("tests", []))
+        for generator in generators:
+            tests.extend(await _generated_tests(challenge, generator))
+        _expanded[key] = tests
+    # Generated inputs are shaped like the written ones, the signature stays theirs
+    return {**challenge, "tests": tests, "signature": challenge_signature(challenge)}
@@ -0,0 +1,167 @@
+import asyncio
+import json
+import os
+import struct
+from .build_cache import artifact_key, get_or_build, pin, tool_identity, unpin
+from .config import get_setting
+from .scheduler import slot
+
+# The daemon half lives in NyxJavaDaemon.java, this is the client the java runner talks to.
+DAEMON_SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "NyxJavaDaemon.java")
+HEADER = struct.Struct(">I")
+
+
+class JavaDaemonError(Exception):
+    """Raised when the daemon died or could not be started, callers fall back to javac/java."""
+    pass
+
+
+def _encode_string(value) -> bytes:
+    data = value.encode("utf-8")
+    return HEADER.pack(len(data)) + data
+
+
+class JavaDaemon:
+    """
+    Resident JVM for one JDK that compiles and runs the generated Solution in-process.
+    Started lazily on first use and restarted whenever it exits (crash, timeout, heap limit).
+    """
+    def __init__(self, jdk_path):
+        self.jdk_path = jdk_path
+        self._process = None
+        self._pinned = None  # fd pinning the daemon's classes in the build cache while it runs
+        self._loop = None
+        self._lock = None
+        self._next_id = 0
+        self._answered = False
+        # Set once a daemon died before answering anything (e.g. a JRE without javax.tools),
+        # there's no point paying for a JVM start on every run after that
+        self.disabled = False
+
+    def _is_alive(self):
+        return self._process is not None and self._process.returncode is None
+
+    async def _start(self):
+        javac = os.path.join(self.jdk_path, "bin", "javac")
+        with open(DAEMON_SOURCE, "r") as f:
+            source = f.read()
+
+        async def build(workdir):
+            async with slot("compile"):
+                process = await asyncio.create_subprocess_exec(
+                    javac, "-d", workdir, DAEMON_SOURCE,
+                    stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE,
+                )
+                _, stderr = await process.communicate()
+            if process.returncode != 0:
+                return stderr.decode("utf-8", errors="replace")
+            return None
+
+        self._unpin()
+        try:
+            key = artifact_key("java-daemon", source, await tool_identity(javac, "-version"))
+            # The JVM loads classes from it as it goes, so it stays pinned for the daemon's life
+            while self._pinned is None:
+                class_dir, failure = await get_or_build(key, build)
+                if failure is not None:
+                    self.disabled = True
+                    raise JavaDaemonError(failure)
+                self._pinned = pin(class_dir)
+        except OSError as e:
+            raise JavaDaemonError(str(e)) from e
+        try:
+            self._process = await asyncio.create_subprocess_exec(
+                os.path.join(self.jdk_path, "bin", "java"), "-cp", class_dir, "NyxJavaDaemon",
+                str(int(get_setting("java_daemon_max_heap_mb"))),
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL,
+            )
+        except OSError as e:
+            raise JavaDaemonError(str(e)) from e
+        self._answered = False
+
+    async def _read_message(self):
+        header = await self._process.stdout.readexactly(HEADER.size)
+        (length,) = HEADER.unpack(header)
+        return json.loads(await self._process.stdout.readexactly(length))
+
+    async def run(self, source, config, test_timeout, timeout, on_frame=None) -> dict:
+        """
+        Compile and run `source` with `config` standing in for the harness's env vars.
+        Returns a dict with frames, timed_out, compile_error and error. `test_timeout` is the
+        longest a single test may go without reporting, `timeout` only catches a wedged JVM.
+        """
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._loop is not loop:
+            # A daemon started on another event loop can't be talked to from this one
+            self.close()
+            self._lock = asyncio.Lock()
+            self._loop = loop
+        async with self._lock, slot("run"):
+            if not self._is_alive():
+                await self._start()
+            self._next_id += 1
+            job_id = self._next_id
+            request = HEADER.pack(job_id) + HEADER.pack(int(test_timeout * 1000)) + HEADER.pack(len(config))
+            for key, value in config.items():
+                request += _encode_string(key) + _encode_string(value)
+            request += _encode_string(source)
+            frames = []
+
+            async def collect():
+                while True:
+                    message = await self._read_message()
+                    if message.get("id") != job_id:
+                        continue
+                    if "frame" in message:
+                        frames.append(message["frame"])
+                        if on_frame is not None:
+                            on_frame(message["frame"])
+                        continue
+                    return message
+
+            try:
+                self._process.stdin.write(request)
+                await self._process.stdin.drain()
+                done = await asyncio.wait_for(collect(), timeout=timeout)
+            except asyncio.TimeoutError:
+                self.close()
+                return {"frames": frames, "timed_out": True, "compile_error": None, "error": None}
+            except (asyncio.IncompleteReadError, ConnectionError, json.JSONDecodeError) as e:
+                self.close()
+                if not self._answered:
+                    self.disabled = True
+                raise JavaDaemonError("Java daemon exited unexpectedly") from e
+            self._answered = True
+            if done.get("restart"):
+                # It exits right after answering, don't hand it the next job
+                self._process = None
+            done["frames"] = frames
+            return done
+
+    def close(self):
+        if self._process is not None and self._process.returncode is None:
+            try:
+                self._process.kill()
+            except (ProcessLookupError, RuntimeError):
+                pass
+        self._process = None
+        self._unpin()
+
+    def _unpin(self):
+        if self._pinned is not None:
+            unpin(self._pinned)
+            self._pinned = None
+
+
+_daemons = {}
+
+def get_java_daemon(jdk_path):
+    """Shared daemon for this JDK, or None when `java_daemon` is turned off or it can't work."""
+    if not get_setting("java_daemon"):
+        return None
+    daemon = _daemons.get(jdk_path)
+    if daemon is None:
+        daemon = _daemons[jdk_path] = JavaDaemon(jdk_path)
+    return None if daemon.disabled else daemon
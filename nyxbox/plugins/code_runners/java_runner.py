@@ -1,17 +1,58 @@
 import os
 import json
-import tempfile
 import asyncio
+import functools
 import re
+from .build_cache import artifact_key, cached, tool_identity
+from .cds import WARMUP_CLASS, build_archives, cds_flags
+from .java_daemon import JavaDaemonError, get_java_daemon
+from .limits import TIME_LIMIT_ENV, TLE_EXIT_CODE, Limits
+from .process import ProcessResult, run_process
+from .protocol import RESULT_PATH_ENV, RUN_INPUT, crash_result, frame_listener, results_from_frames, stop_at_first_failure
+from .scheduler import slot
+from .sharding import FAIL_FAST_ENV, SELECTION_ENV, run_sharded
+from .signature import BOOL, FLOAT, INT, MIXED, NONE, STR, harness_shape, parse_type
+from .testvec import VECTORS_ENV, vector_file
+from .workspace import workspace
 
 ALLOWED_JAVA_IMPORT_PREFIXES = [
     "java.util.",   
     "java.math.",    
 ]
 
-async def run_java_code(user_code, func_name, test_cases, jdk_path, is_submission=False, is_guest=False):
+TIME_LIMIT_MS = 5000 # Per test, unless the challenge sets its own
+# A JVM's first run of a solution is still interpreted, so it also gets this on top of its tests
+JVM_ALLOWANCE = 15.0
+
+# What the CDS training run (see cds.py) compiles and runs, covering the common harness paths
+WARMUP_CODE = """
+    public static int[] nyxWarmup(int[] values, Map<String, Integer> counts, String name) {
+        return values;
+    }
+"""
+WARMUP_TESTS = [
+    {"input": [[1, 2, 3], {"a": 1}, "nyx"], "expected_output": [1, 2, 3]},
+    {"input": [[], {"b": 2}, ""], "expected_output": [0]},
+]
+
+def warmup_source():
+    return generate_java_program(WARMUP_CODE, "nyxWarmup", WARMUP_TESTS, True).replace(
+        "public class Solution", f"public class {WARMUP_CLASS}"
+    )
+
+async def prepare_cds(jdk_path):
+    """Build the CDS archives for a JDK ahead of its first cold run."""
+    try:
+        await build_archives(jdk_path, warmup_source(), WARMUP_TESTS)
+    except OSError:
+        pass
+
+async def run_java_code(user_code, func_name, test_cases, jdk_path, is_submission=False, is_guest=False, time_limit_ms=None, memory_limit_mb=None, on_result=None, signature=None):
     """
     Run java code against test cases and return results.
+    time_limit_ms (per test) and memory_limit_mb are the challenge's limits, if it has any.
+    on_result(index, result) is called for each test as it finishes. signature is the
+    challenge's (see signature.py), inferred from test_cases if not given.
     """   
     if is_guest:
         imports = re.findall(r'^\s*import\s+([\w\.]+\*?);\s*$', user_code, re.MULTILINE)
@@ -24,282 +65,640 @@ async def run_java_code(user_code, func_name, test_cases, jdk_path, is_submissio
                 "passed": False,
                 "error": "Use of import statements is disallowed"
                 }]
-    if is_submission:
-        filtered_tests = test_cases  # All tests, including hidden
-    else:
-        filtered_tests = [t for t in test_cases if not t.get("hidden", False)]
-    java_code = generate_java_program(user_code, func_name, filtered_tests, is_submission)
+    # Every test is compiled in and the class picks its tests at runtime, so Run and
+    # Submit share one cached build
+    indices = [i for i, t in enumerate(test_cases) if is_submission or not t.get("hidden", False)]
+    java_code = generate_java_program(user_code, func_name, test_cases, True, signature)
 
-    results = await compile_and_run(java_code, filtered_tests, jdk_path, is_submission)
+    limits = Limits(time_limit_ms or TIME_LIMIT_MS, memory_limit_mb)
+    results = await compile_and_run(java_code, test_cases, jdk_path, is_submission, indices, limits, on_result)
+    if is_submission:
+        return stop_at_first_failure(results)
     return results
 
-def generate_java_program(user_code, func_name, test_cases, is_submission=False):
+# Stands in for the user's code while the harness around it is generated
+USER_CODE_MARK = "\0NYX_USER_CODE\0"
+
+def generate_java_program(user_code, func_name, test_cases, is_submission=False, signature=None):
+    """
+    Generate a java program with test code: the user's code in the harness (see java_harness).
+    """
+    prefix, suffix = java_harness(func_name, test_cases, is_submission, signature)
+    return prefix + user_code + suffix
+
+def java_harness(func_name, test_cases, is_submission=False, signature=None):
     """
-    Generate a java program with test code.
+    (prefix, suffix) that go around the user's code. Only the user's code changes from run to
+    run, so this is generated once per function, signature, tests and mode (see harness_shape).
     """
-    test_code = generate_test_code(func_name, test_cases, is_submission)
-    program_template = """
+    return _java_harness(func_name, *harness_shape(test_cases, is_submission, signature))
+
+@functools.lru_cache(maxsize=32)
+def _java_harness(func_name, params, returns, count, visible):
+    readers = {}
+    test_code = _test_code(func_name, params, returns, count, visible, readers)
+    program_template = r"""
 import java.util.Map;
 import java.util.HashMap;
 import java.util.Arrays;
+import java.io.DataOutputStream;
+import java.io.FileOutputStream;
+import java.io.IOException;
+import java.lang.management.ManagementFactory;
+import java.lang.management.MemoryPoolMXBean;
+import java.lang.management.MemoryType;
+import java.lang.management.ThreadMXBean;
+import java.nio.MappedByteBuffer;
+import java.nio.channels.FileChannel;
+import java.nio.charset.StandardCharsets;
+import java.nio.file.Paths;
+import java.nio.file.StandardOpenOption;
 
 public class Solution {{
     // ===== USER CODE START =====
 {user_code}
     // ===== USER CODE END =====
 
-    public static void main(String[] args) {{
+    // Verdicts go out on the result channel (see protocol.py), not System.out
+    private static DataOutputStream nyxResults;
+
+    // Filled in by the java daemon (see NyxJavaDaemon.java) when it runs this class in-process,
+    // together with nyxResults. Otherwise everything comes from the environment.
+    private static Map<String, String> nyxConfig;
+
+    private static String nyxEnv(String name) {{
+        if (nyxConfig != null && nyxConfig.containsKey(name)) return nyxConfig.get(name);
+        return System.getenv(name);
+    }}
+
+    private static String nyxJsonString(String s) {{
+        if (s == null) return "null";
+        StringBuilder out = new StringBuilder("\"");
+        for (int k = 0; k < s.length(); k++) {{
+            char c = s.charAt(k);
+            switch (c) {{
+                case '"': out.append("\\\""); break;
+                case '\\': out.append("\\\\"); break;
+                case '\n': out.append("\\n"); break;
+                case '\r': out.append("\\r"); break;
+                case '\t': out.append("\\t"); break;
+                default:
+                    if (c < 0x20) out.append(String.format("\\u%04x", (int) c));
+                    else out.append(c);
+            }}
+        }}
+        return out.append('"').toString();
+    }}
+
+    // synchronized against the watchdog, so a test never gets both a verdict and a "tle"
+    private static synchronized void nyxReport(int test, String status, String extra) {{
+        nyxFrame("{{\"test\": " + test + ", \"status\": \"" + status + "\"" + extra + "}}");
+    }}
+
+    // Set from {fail_fast_env} (see sharding.py): stop at the first test that doesn't pass
+    private static boolean nyxFailFast = false;
+
+    private static synchronized void nyxStop(int test) {{
+        nyxFrame("{{\"stopped\": " + test + "}}");
+    }}
+
+    private static void nyxFrame(String frame) {{
+        try {{
+            byte[] body = frame.getBytes(StandardCharsets.UTF_8);
+            nyxResults.writeInt(body.length);
+            nyxResults.write(body);
+            nyxResults.flush();
+        }} catch (IOException e) {{
+            throw new RuntimeException(e);
+        }}
+    }}
+
+    // Per-test watchdog (see limits.py). A test still running after {time_limit_env} ms gets a
+    // "tle" frame and the JVM halts with {tle_exit_code}, the runner starts a fresh one for the
+    // tests after it. Inside the java daemon the daemon enforces the limit itself.
+    private static long nyxLimitNanos = 0;
+    private static long nyxDeadline;
+    private static boolean nyxArmed = false;
+    private static int nyxCurrentTest = -1;
+
+    private static void nyxStartWatchdog() {{
+        String limit = nyxEnv("{time_limit_env}");
+        if (nyxConfig != null || limit == null || Long.parseLong(limit) <= 0) return;
+        nyxLimitNanos = Long.parseLong(limit) * 1_000_000L;
+        Thread watchdog = new Thread(() -> {{
+            while (true) {{
+                synchronized (Solution.class) {{
+                    if (nyxArmed && System.nanoTime() - nyxDeadline >= 0) {{
+                        nyxReport(nyxCurrentTest, "tle", "");
+                        Runtime.getRuntime().halt({tle_exit_code});
+                    }}
+                }}
+                try {{
+                    Thread.sleep(5);
+                }} catch (InterruptedException e) {{
+                    return;
+                }}
+            }}
+        }}, "nyx-watchdog");
+        watchdog.setDaemon(true);
+        watchdog.start();
+    }}
+
+    private static synchronized void nyxArm(boolean armed) {{
+        nyxDeadline = System.nanoTime() + nyxLimitNanos;
+        nyxArmed = armed && nyxLimitNanos > 0;
+    }}
+
+    // Wall and CPU time since nyxStart() and the peak heap use in between (see protocol.py).
+    // Thread CPU time, so the daemon's other threads don't count against the solution.
+    private static final ThreadMXBean nyxThreads = ManagementFactory.getThreadMXBean();
+    private static long nyxWallStart, nyxCpuStart;
+
+    private static void nyxStart() {{
+        for (MemoryPoolMXBean pool : ManagementFactory.getMemoryPoolMXBeans()) {{
+            if (pool.getType() == MemoryType.HEAP) pool.resetPeakUsage();
+        }}
+        nyxCpuStart = nyxThreads.isCurrentThreadCpuTimeSupported() ? nyxThreads.getCurrentThreadCpuTime() : 0;
+        nyxWallStart = System.nanoTime();
+        nyxArm(true);
+    }}
+
+    // Also stops the watchdog, it's called as soon as the call returns
+    private static String nyxUsage() {{
+        nyxArm(false);
+        long wall = System.nanoTime() - nyxWallStart;
+        StringBuilder usage = new StringBuilder(String.format(java.util.Locale.ROOT, ", \"time_ms\": %.3f", wall / 1e6));
+        if (nyxThreads.isCurrentThreadCpuTimeSupported()) {{
+            long cpu = nyxThreads.getCurrentThreadCpuTime() - nyxCpuStart;
+            usage.append(String.format(java.util.Locale.ROOT, ", \"cpu_ms\": %.3f", cpu / 1e6));
+        }}
+        long peak = 0;
+        for (MemoryPoolMXBean pool : ManagementFactory.getMemoryPoolMXBeans()) {{
+            if (pool.getType() == MemoryType.HEAP) peak += pool.getPeakUsage().getUsed();
+        }}
+        return usage.append(", \"memory_kb\": ").append(peak / 1024).toString();
+    }}
+
+    // Which tests to run, from {selection_env} (see sharding.py). Unset means all of them.
+    private static int[][] nyxRanges = null;
+
+    private static void nyxParseSelection() {{
+        nyxFailFast = nyxEnv("{fail_fast_env}") != null;
+        String spec = nyxEnv("{selection_env}");
+        if (spec == null) return;
+        java.util.List<int[]> ranges = new java.util.ArrayList<>();
+        for (String part : spec.split(",")) {{
+            if (part.isEmpty()) continue;
+            int dash = part.indexOf('-');
+            int start = Integer.parseInt(dash < 0 ? part : part.substring(0, dash));
+            int end = dash < 0 ? start : Integer.parseInt(part.substring(dash + 1));
+            ranges.add(new int[]{{start, end}});
+        }}
+        nyxRanges = ranges.toArray(new int[0][]);
+    }}
+
+    private static boolean nyxSelected(int test) {{
+        if (nyxRanges == null) return true;
+        for (int[] range : nyxRanges) {{
+            if (test >= range[0] && test <= range[1]) return true;
+        }}
+        return false;
+    }}
+
+    // Test inputs, memory-mapped from the vector file in {vectors_env} (see testvec.py)
+    private static MappedByteBuffer nyxVectors;
+
+    private static final class NyxReader {{
+        int pos;
+
+        NyxReader(int pos) {{
+            this.pos = pos;
+        }}
+
+        byte tag() {{
+            return nyxVectors.get(pos++);
+        }}
+
+        int u32() {{
+            int value = nyxVectors.getInt(pos);
+            pos += 4;
+            return value;
+        }}
+
+        // Skips a null. The signature types a value by what the other tests hold (see
+        // signature.py), so a None (a missing answer) reads as null for arrays, maps and strings.
+        boolean none() {{
+            if (nyxVectors.get(pos) != 'N') return false;
+            pos++;
+            return true;
+        }}
+
+        void expect(char tag) {{
+            if (tag() != (byte) tag) throw new IllegalStateException("Test vector type mismatch, expected " + tag);
+        }}
+
+        long integer() {{
+            byte tag = tag();
+            if (tag == 'B') return tag();
+            if (tag != 'I') throw new IllegalStateException("Test vector type mismatch, expected an integer");
+            long value = nyxVectors.getLong(pos);
+            pos += 8;
+            return value;
+        }}
+
+        double real() {{
+            byte tag = tag();
+            if (tag == 'I') {{
+                pos--;
+                return integer();
+            }}
+            if (tag != 'R') throw new IllegalStateException("Test vector type mismatch, expected a number");
+            double value = nyxVectors.getDouble(pos);
+            pos += 8;
+            return value;
+        }}
+
+        String text() {{
+            expect('S');
+            return raw(u32());
+        }}
+
+        String raw(int n) {{
+            byte[] bytes = new byte[n];
+            for (int k = 0; k < n; k++) bytes[k] = nyxVectors.get(pos + k);
+            pos += n;
+            return new String(bytes, StandardCharsets.UTF_8);
+        }}
+
+        Object any() {{
+            byte tag = tag();
+            switch (tag) {{
+                case 'N':
+                    return null;
+                case 'B':
+                    return tag() != 0;
+                case 'I': {{
+                    pos--;
+                    long value = integer();
+                    if (value == (int) value) return (int) value;
+                    return value;
+                }}
+                case 'R':
+                    pos--;
+                    return real();
+                case 'G':
+                    return new java.math.BigInteger(raw(u32()));
+                case 'S':
+                    return raw(u32());
+                case 'L': {{
+                    int n = u32();
+                    java.util.List<Object> list = new java.util.ArrayList<>();
+                    for (int k = 0; k < n; k++) list.add(any());
+                    return list;
+                }}
+                case 'M': {{
+                    int n = u32();
+                    Map<Object, Object> map = new HashMap<>();
+                    for (int k = 0; k < n; k++) map.put(any(), any());
+                    return map;
+                }}
+                default:
+                    throw new IllegalStateException("Bad test vector");
+            }}
+        }}
+    }}
+
+    private static int nyxReadInt(NyxReader r) {{ return (int) r.integer(); }}
+    private static long nyxReadLong(NyxReader r) {{ return r.integer(); }}
+    private static boolean nyxReadBoolean(NyxReader r) {{ return r.integer() != 0; }}
+    private static double nyxReadDouble(NyxReader r) {{ return r.real(); }}
+    private static String nyxReadString(NyxReader r) {{ return r.none() ? null : r.text(); }}
+    private static Object nyxReadObject(NyxReader r) {{ return r.any(); }}
+{readers}
+    // Reader positioned on the first input of test i. Also restarts the usage timers and the
+    // watchdog, the test code restarts them again right before the call so decoding isn't counted.
+    private static NyxReader nyxTest(int i) {{
+        nyxCurrentTest = i;
+        nyxStart();
+        NyxReader r = new NyxReader(nyxVectors.getInt(12 + 4 * i));
+        r.u32();
+        return r;
+    }}
+
+    // What a missing answer (expected null) accepts: null, or an empty array or map
+    private static boolean nyxMissing(Object value) {{
+        if (value == null) return true;
+        if (value.getClass().isArray()) return java.lang.reflect.Array.getLength(value) == 0;
+        return value instanceof Map && ((Map<?, ?>) value).isEmpty();
+    }}
+
+    private static String nyxError(Exception e) {{
+        return e.getMessage() != null ? e.getMessage() : e.toString();
+    }}
+
+    public static void main(String[] args) throws IOException {{
+        if (nyxResults == null) nyxResults = new DataOutputStream(new FileOutputStream(nyxEnv("{result_env}")));
+        nyxParseSelection();
+        nyxStartWatchdog();
+        try (FileChannel channel = FileChannel.open(Paths.get(nyxEnv("{vectors_env}")), StandardOpenOption.READ)) {{
+            nyxVectors = channel.map(FileChannel.MapMode.READ_ONLY, 0, channel.size());
+        }}
         boolean all_passed = true;
 {test_code}
         System.out.println(all_passed ? "ALL TESTS PASSED" : "SOME TESTS FAILED");
     }}
 }}
 """
-    return program_template.format(user_code=user_code, test_code=test_code)
+    program = program_template.format(
+        user_code=USER_CODE_MARK, test_code=test_code, readers="".join(readers.values()),
+        result_env=RESULT_PATH_ENV, selection_env=SELECTION_ENV, vectors_env=VECTORS_ENV,
+        time_limit_env=TIME_LIMIT_ENV, tle_exit_code=TLE_EXIT_CODE, fail_fast_env=FAIL_FAST_ENV,
+    )
+    prefix, _, suffix = program.partition(USER_CODE_MARK)
+    return prefix, suffix
 
 def generate_comparison_code(expected_type, result_var, expected_var):
     """
     Generate appropriate comparison code based on the type.
     """
-    if expected_type.endswith("[]"):
-        return f"Arrays.equals({result_var}, {expected_var})"
+    if expected_type.endswith("[][]"):
+        return f"({expected_var} == null ? nyxMissing({result_var}) : Arrays.deepEquals({result_var}, {expected_var}))"
+    elif expected_type.endswith("[]"):
+        return f"({expected_var} == null ? nyxMissing({result_var}) : Arrays.equals({result_var}, {expected_var}))"
+    elif expected_type.startswith("Map<"):
+        return f"({expected_var} == null ? nyxMissing({result_var}) : {expected_var}.equals({result_var}))"
+    elif expected_type in ["String", "Object"]:
+        return f"java.util.Objects.equals({result_var}, {expected_var})"
     else:
-        return f"{result_var}.equals({expected_var})" if expected_type in ["String"] else f"{result_var} == {expected_var}"
+        return f"{result_var} == {expected_var}"
 
-def generate_test_code(func_name, test_cases, is_submission=False):
+def split_type_args(args):
+    """Split the "K, V" of a generic type at the top level only."""
+    parts, depth, start = [], 0, 0
+    for k, c in enumerate(args):
+        if c == "<":
+            depth += 1
+        elif c == ">":
+            depth -= 1
+        elif c == "," and depth == 0:
+            parts.append(args[start:k].strip())
+            start = k + 1
+    parts.append(args[start:].strip())
+    return parts
+
+def java_reader(java_type, readers):
     """
-    Generate java code that tests the user's function.
+    Name of the static method that decodes a `java_type` value from the test vectors.
+    Arrays and maps get a generated method, collected in `readers` (name -> source).
     """
-    test_code_blocks=[]
-    if is_submission:
-        for i, test in enumerate(test_cases):
-            inputs = test.get('input', [])
-            expected = test.get('expected_output')
-            input_vars = []
-            input_args = []
-            for j, input_val in enumerate(inputs):
-                java_type = infer_java_type(input_val)
-                var_name = f"input_{i}_{j}"
-                java_value = python_to_java_value(input_val)
-                input_vars.append(f"    {java_type} {var_name} = {java_value};")
-                input_args.append(var_name)
-
-            expected_type = infer_java_type(expected)
-            expected_var = f"expected_{i}"
-            expected_value = python_to_java_value(expected)
-            
-            test_block = f"""
-        // Test case {i+1}
-        System.out.print("Test {i+1}: ");
-        try {{
-{chr(10).join(input_vars)}
-            {expected_type} {expected_var} = {expected_value};
-
-            // Call the function with test inputs
-            {expected_type} result = {func_name}({", ".join(input_args)});
-
-            // Compare result with expected output
-            if ({generate_comparison_code(expected_type, "result", expected_var)}) {{
-                System.out.println("PASS");
-            }} else {{
-                all_passed = false;
-                System.out.println("FAIL - Got: " + {get_display_string(expected_type, "result")} + ", Expected: " + {get_display_string(expected_type, expected_var)});
-            }}
-        }} catch (Exception e) {{
-            all_passed = false;
-            System.out.println("ERROR - " + e.getMessage());
+    simple = {
+        "int": "nyxReadInt", "Integer": "nyxReadInt", "long": "nyxReadLong", "Long": "nyxReadLong",
+        "boolean": "nyxReadBoolean", "Boolean": "nyxReadBoolean", "double": "nyxReadDouble",
+        "Double": "nyxReadDouble", "String": "nyxReadString",
+    }
+    if java_type in simple:
+        return simple[java_type]
+    name = "nyxRead_" + re.sub(r"\W", "_", java_type)
+    if name in readers:
+        return name
+    if java_type.endswith("[]"):
+        element_type = java_type[:-2]
+        element_reader = java_reader(element_type, readers)
+        # new int[n][] for int[][], generic element types need a cast from the raw array
+        root = element_type.split("<")[0].replace("[]", "")
+        create = f"new {root}[n]{'[]' * element_type.count('[]')}"
+        annotation = ""
+        if "<" in element_type:
+            create = f"({java_type}) {create}"
+            annotation = '\n    @SuppressWarnings("unchecked")'
+        readers[name] = f"""{annotation}
+    private static {java_type} {name}(NyxReader r) {{
+        if (r.none()) return null;
+        r.expect('L');
+        int n = r.u32();
+        {java_type} value = {create};
+        for (int k = 0; k < n; k++) value[k] = {element_reader}(r);
+        return value;
+    }}
+"""
+    elif java_type.startswith("Map<") and java_type.endswith(">"):
+        key_type, val_type = split_type_args(java_type[4:-1])
+        key_reader = java_reader(key_type, readers)
+        val_reader = java_reader(val_type, readers)
+        readers[name] = f"""
+    private static {java_type} {name}(NyxReader r) {{
+        if (r.none()) return null;
+        r.expect('M');
+        int n = r.u32();
+        {java_type} value = new HashMap<>();
+        for (int k = 0; k < n; k++) {{
+            {key_type} key = {key_reader}(r);
+            value.put(key, {val_reader}(r));
         }}
+        return value;
+    }}
 """
-            test_code_blocks.append(test_block)
     else:
-        for i, test in enumerate(test_cases):
-            if test.get("hidden", False):
-                continue
-            inputs = test.get('input', [])
-            expected = test.get('expected_output')
-            input_vars = []
-            input_args = []
-            for j, input_val in enumerate(inputs):
-                java_type = infer_java_type(input_val)
-                var_name = f"input_{i}_{j}"
-                java_value = python_to_java_value(input_val)
-                input_vars.append(f"    {java_type} {var_name} = {java_value};")
-                input_args.append(var_name)
-
-            expected_type = infer_java_type(expected)
-            expected_var = f"expected_{i}"
-            expected_value = python_to_java_value(expected)
-
-            test_block = f"""
-        // Test case {i+1}
-        System.out.print("Test {i+1}: ");
-        try {{
+        return "nyxReadObject"
+    return name
+
+def generate_test_code(func_name, test_cases, is_submission=False, readers=None, signature=None):
+    """
+    Generate java code that tests the user's function.
+    Values are decoded from the vector file at runtime and every test has the challenge's
+    signature (see signature.py), so this is one loop whatever the number of tests.
+    """
+    if readers is None:
+        readers = {}
+    return _test_code(func_name, *harness_shape(test_cases, is_submission, signature), readers)
+
+def _test_code(func_name, params, returns, count, visible, readers):
+    input_types = [java_type(name) for name in params]
+    expected_type = java_type(returns)
+    if visible is None:
+        label = f"Test cases 1-{count}"
+        loop = f"for (int nyxI = 0; nyxI < {count}; nyxI++)"
+    else:
+        label = "Visible test cases"
+        loop = "for (int nyxI : new int[]{" + ", ".join(str(i) for i in visible) + "})"
+    input_vars = [
+        f"                {input_type} input_{j} = {java_reader(input_type, readers)}(nyxIn);"
+        for j, input_type in enumerate(input_types)
+    ]
+    input_args = [f"input_{j}" for j in range(len(input_types))]
+
+    return f"""
+        // {label}
+        {loop} {{
+            if (!nyxSelected(nyxI)) continue;
+            try {{
+                NyxReader nyxIn = nyxTest(nyxI);
 {chr(10).join(input_vars)}
-            {expected_type} {expected_var} = {expected_value};
+                {expected_type} expected = {java_reader(expected_type, readers)}(nyxIn);
 
-            // Call the function with test inputs
-            {expected_type} result = {func_name}({", ".join(input_args)});
+                // Call the function with test inputs
+                nyxStart();
+                {expected_type} result = {func_name}({", ".join(input_args)});
+                String nyxUsed = nyxUsage();
 
-            // Compare result with expected output
-            if ({generate_comparison_code(expected_type, "result", expected_var)}) {{
-                System.out.println("PASS");
-            }} else {{
+                // Compare result with expected output
+                if ({generate_comparison_code(expected_type, "result", "expected")}) {{
+                    nyxReport(nyxI, "pass", nyxUsed);
+                }} else {{
+                    all_passed = false;
+                    nyxReport(nyxI, "fail", nyxUsed + ", \\"output\\": " + nyxJsonString(String.valueOf({get_display_string(expected_type, "result")})) + ", \\"expected\\": " + nyxJsonString(String.valueOf({get_display_string(expected_type, "expected")})));
+                }}
+            }} catch (Exception e) {{
+                all_passed = false;
+                nyxReport(nyxI, "error", nyxUsage() + ", \\"error\\": " + nyxJsonString(nyxError(e)));
+            }} catch (OutOfMemoryError e) {{
                 all_passed = false;
-                System.out.println("FAIL - Got: " + {get_display_string(expected_type, "result")} + ", Expected: " + {get_display_string(expected_type, expected_var)});
+                nyxReport(nyxI, "mle", nyxUsage());
+            }}
+            if (nyxFailFast && !all_passed) {{
+                nyxStop(nyxI);
+                break;
             }}
-        }} catch (Exception e) {{
-            all_passed = false;
-            System.out.println("ERROR - " + e.getMessage());
         }}
 """
-            test_code_blocks.append(test_block)
 
-    return "\n".join(test_code_blocks)
 
-def python_to_java_value(value, var_name="map"):
-    """
-    Convert Python values to java literals.
-    """
-    if value is None:
-        return "null"
-    elif isinstance(value, bool):
-        if value:
-            return "true"
-        return "false"
-    elif isinstance(value, int):
-        return str(value)
-    elif isinstance(value, float):
-        return str(value)
-    elif isinstance(value, str):
-        escaped = value.replace('\\', '\\\\').replace('"', '\\"')
-        return f'"{escaped}"'
-    elif isinstance(value, list):
-        elements = [python_to_java_value(item) for item in value]
-        return "{" + ", ".join(elements) + "}"
-    elif isinstance(value, dict):
-        key_type = infer_java_type(next(iter(value.keys())))
-        val_type = infer_java_type(next(iter(value.values())))
-        lines = [f"Map<{key_type}, {val_type}> {var_name} = new HashMap<>();"]
-        for k, v in value.items():
-            lines.append(f'{var_name}.put({python_to_java_value(k)}, {python_to_java_value(v)});')
-        return "\n".join(lines)
-    else:
-        return "null"
+# How signature types (see signature.py) are spelled in java
+JAVA_TYPES = {NONE: "Object", BOOL: "boolean", INT: "int", FLOAT: "double", STR: "String", MIXED: "Object"}
+# Generic arguments have to be boxed
+BOXED_TYPES = {"int": "Integer", "double": "Double", "boolean": "Boolean"}
 
+def _java_type(parsed):
+    if isinstance(parsed, str):
+        return JAVA_TYPES[parsed]
+    if parsed[0] == "list":
+        # Lists that don't agree on a type read as int[], the way they always have
+        return "int[]" if parsed[1] == MIXED else f"{_java_type(parsed[1])}[]"
+    key_type, val_type = _java_type(parsed[1]), _java_type(parsed[2])
+    return f"Map<{BOXED_TYPES.get(key_type, key_type)}, {BOXED_TYPES.get(val_type, val_type)}>"
 
-def infer_java_type(value):
-    """
-    Determine the appropriate java type for a Python value.
-    """
-    if value is None:
-        return "Object"
-    elif isinstance(value, bool):
-        return "boolean"
-    elif isinstance(value, int):
-        return "int"
-    elif isinstance(value, float):
-        return "double"
-    elif isinstance(value, str):
-        return "String"
-    elif isinstance(value, list):
-        if not value:
-            return "int[]"
-        first_type = type(value[0])
-        if all(isinstance(item, first_type) for item in value):
-            element_type = infer_java_type(value[0])
-            return f"{element_type}[]"
-        else:
-            return "int[]"
-    elif isinstance(value, dict):
-        if not value:
-            return "Map<String, Integer>"  # Default for empty dicts
-        key, val = next(iter(value.items()))
-        key_type = infer_java_type(key)
-        val_type = infer_java_type(val)
-        return f"Map<{key_type}, {val_type}>"
-    else:
-        return "Object"
+@functools.lru_cache(maxsize=256)
+def java_type(name):
+    """The java type for a signature type, e.g. "int[]" for "list[int]"."""
+    return _java_type(parse_type(name))
 
-async def compile_and_run(java_code, test_cases, jdk_path, is_submission):
-    """
-    Compile and run java code, then parse the results.
-    """
-    tmp_java_file = None
-    results = []
-    
-    try:
-        with tempfile.TemporaryDirectory() as tmpdir:
-            tmp_java_file = os.path.join(tmpdir, "Solution.java")
-            with open(tmp_java_file, "w") as tmp_file:
-                tmp_file.write(java_code)
-            compiler_process = await asyncio.create_subprocess_exec(
-                os.path.join(jdk_path, "bin", "javac"), tmp_java_file,
-                stdout = asyncio.subprocess.PIPE, stderr = asyncio.subprocess.PIPE
-            )
-            try:
-                _, stderr = await asyncio.wait_for(compiler_process.communicate(), timeout=20.0)
-                if compiler_process.returncode != 0:
-                    return [{
-                            "input": f"{os.path.join(jdk_path, 'bin', 'javac')} {tmp_java_file}",
-                            "output": None,
-                            "expected_output": None,
-                            "passed": False,
-                            "error": stderr.decode('utf-8', errors='replace').strip()
-                        }]
-            except asyncio.TimeoutError:
-                return [{
-                "input": f"{jdk_path} {tmp_java_file} ",
-                "output": None,
-                "expected_output": None,
-                "passed": False,
-                "error": "Execution timed out (20 seconds)"
-            }]
+async def run_in_daemon(daemon, java_code, test_cases, indices, limits, on_result=None, fail_fast=False):
+    """Compile and run in the resident JVM, same results as the javac/java path."""
+    vectors = vector_file(test_cases)
+    responses = []
+    on_frame = frame_listener(on_result, test_cases, display=json.dumps, check=limits.check)
 
-            process = await asyncio.create_subprocess_exec(
-                os.path.join(jdk_path, "bin", "java"), "-cp", tmpdir, "Solution",
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            try:
-                stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=20.0)
-            except asyncio.TimeoutError:
-                return [{
-                "input": "Execution",
+    async def run_shard(env):
+        # The daemon runs one job at a time, so this is only ever one shard, resumed after a
+        # test over the time limit made the daemon restart (see run_resuming)
+        response = await daemon.run(
+            java_code, {**env, VECTORS_ENV: vectors}, limits.time_limit_ms / 1000,
+            limits.process_timeout(len(indices)) + JVM_ALLOWANCE, on_frame,
+        )
+        responses.append(response)
+        return ProcessResult(stderr=response.get("error") or "", timed_out=response.get("timed_out"), frames=response["frames"])
+
+    result = await run_sharded(indices, run_shard, shards=1, on_frame=on_frame, fail_fast=fail_fast)
+    if responses and responses[0].get("compile_error") is not None:
+        return [{
+                "input": f"{os.path.join(daemon.jdk_path, 'bin', 'javac')} Solution.java",
                 "output": None,
                 "expected_output": None,
                 "passed": False,
-                "error": "Execution timed out (20 seconds)"
+                "error": responses[0]["compile_error"]
             }]
+    results = limits.check(results_from_frames(result.frames, test_cases, display=json.dumps))
+    if result.stderr and len(results) < len(indices):
+        results.append({"input": RUN_INPUT, "output": None, "expected_output": None, "passed": False, "error": result.stderr})
+    return results
 
-            for test in stdout.decode('utf-8', errors='replace').splitlines():
-                if "Test " in test:
-                    new1_test=test.split("Test ")
-                    test_index=int(new1_test[1].split(":")[0])-1
-                    if "PASS" in test:
-                        results.append({"input": test_cases[test_index]["input"], 
-                                        "output": python_to_java_value(test_cases[test_index]['expected_output']), 
-                                        "expected_output": python_to_java_value(test_cases[test_index]['expected_output']),
-                                        "passed": True,
-                                        "error": None})
-                    elif "FAIL" in test:
-                        fail_str = new1_test[1].split("FAIL - Got: ")[1]
-                        actual_output, expected_output = fail_str.split(", Expected: ")
-                        results.append({"input": test_cases[test_index]["input"], 
-                                        "output": actual_output, 
-                                        "expected_output": expected_output, 
-                                        "passed": False,
-                                        "error": None})
-    finally:
+async def compile_and_run(java_code, test_cases, jdk_path, is_submission, indices=None, limits=None, on_result=None):
+    """
+    Compile (or fetch the cached build of) the java program, run the tests at `indices`
+    and parse the results, with `limits` (a Limits) per test. on_result hears each test's
+    result as soon as it's in (see protocol.frame_listener). Submissions stop at the first
+    test that doesn't pass.
+    """
+    if indices is None:
+        indices = range(len(test_cases))
+    if limits is None:
+        limits = Limits(TIME_LIMIT_MS)
+    javac = os.path.join(jdk_path, "bin", "javac")
+    daemon = get_java_daemon(jdk_path)
+    if daemon is not None:
         try:
-            if tmp_java_file is not None and os.path.exists(tmp_java_file):
-                os.unlink(tmp_java_file)
-        except Exception as e:
-            print(f"Error cleaning up temp files: {e}")
-    return results
+            return await run_in_daemon(daemon, java_code, test_cases, indices, limits, on_result, is_submission)
+        except JavaDaemonError:
+            pass # Fall back to cold javac/java processes
+    key = artifact_key("java", java_code, await tool_identity(javac, "-version"))
+    # Class data sharing for both JVM starts once the archives exist, see cds.py
+    cds = await cds_flags(jdk_path, warmup_source(), WARMUP_TESTS)
+
+    async def build(workdir):
+        async with workspace() as ws:
+            tmp_java_file = os.path.join(ws.path, "Solution.java")
+            with open(tmp_java_file, "w") as tmp_file:
+                tmp_file.write(java_code)
+            async with slot("compile"):
+                compiler_process = await asyncio.create_subprocess_exec(
+                    javac, *(cds["javac"] if cds else []), "-d", workdir, tmp_java_file,
+                    stdout = asyncio.subprocess.PIPE, stderr = asyncio.subprocess.PIPE
+                )
+                try:
+                    _, stderr = await asyncio.wait_for(compiler_process.communicate(), timeout=20.0)
+                    if compiler_process.returncode != 0:
+                        return [{
+                                "input": f"{javac} {tmp_java_file}",
+                                "output": None,
+                                "expected_output": None,
+                                "passed": False,
+                                "error": stderr.decode('utf-8', errors='replace').strip()
+                            }]
+                except asyncio.TimeoutError:
+                    compiler_process.kill()
+                    return [{
+                    "input": f"{jdk_path} {tmp_java_file} ",
+                    "output": None,
+                    "expected_output": None,
+                    "passed": False,
+                    "error": "Execution timed out (20 seconds)"
+                }]
+        return None
+
+    # Pinned while its tests run, so another run's eviction can't take the classes away
+    async with cached(key, build) as (class_dir, failure):
+        if failure is not None:
+            return failure
+
+        # Same class for every shard, each JVM only runs its slice of the tests
+        vectors = vector_file(test_cases)
+        # The JVM reserves far more address space than it uses, so memory is capped with -Xmx, not RLIMIT_AS
+        heap = [f"-Xmx{limits.memory_limit_mb}m"] if limits.memory_limit_mb is not None else []
+        java = [os.path.join(jdk_path, "bin", "java"), *heap, "-cp", class_dir, "Solution"]
+        if cds and cds["java"]:
+            java = [java[0], *cds["java"], *heap, "-cp", cds["classpath"] + os.pathsep + class_dir, "Solution"]
+        on_frame = frame_listener(on_result, test_cases, display=json.dumps, check=limits.check)
+
+        async def run_shard(env):
+            async with workspace() as ws:
+                return ws.checked(await run_process(
+                    java, limits.process_timeout(len(indices)) + JVM_ALLOWANCE, cwd=ws.path,
+                    env={**os.environ, **env, **limits.env(), VECTORS_ENV: vectors}, on_frame=on_frame,
+                    preexec_fn=ws.preexec(),
+                ))
+
+        result = await run_sharded(indices, run_shard, on_frame=on_frame, fail_fast=is_submission)
+
+        results = limits.check(results_from_frames(result.frames, test_cases, display=json.dumps))
+        if result.returncode is not None and result.returncode != 0 and len(results) < len(indices):
+            results.append(crash_result(result.returncode, result.stderr))
+        return results
 
 def get_display_string(java_type, var_name):
     """Generate appropriate string representation for display."""
-    if java_type.endswith("[]"):
+    if java_type.endswith("[][]"):
+        return f"Arrays.deepToString({var_name})"
+    elif java_type.endswith("[]"):
         return f"Arrays.toString({var_name})"
     else:
         return var_name
\ No newline at end of file
@@ -0,0 +1,174 @@
+// Test harness for the JS runner (see js_runner.py).
+// Reads one job as JSON on stdin and runs every test in this single node process:
+//   {"code": str, "function_name": str, "tests": [{"index": int, "input": [...], "expected_output": ...}],
+//    "timeout_ms": int, "is_guest": bool, "selection": optional NYXBOX_TESTS style spec,
+//    "fail_fast": optional bool, stop at the first test that doesn't pass (NYXBOX_FAIL_FAST if unset)}
+// The solution is evaluated in its own vm context, and every test call gets its own timeout
+// (the challenge's time limit, see limits.py), so one slow or throwing case doesn't take the
+// other verdicts down with it.
+// Verdicts are written as frames to the result channel (see protocol.py).
+//
+// With --worker it stays alive for the worker pool (see js_pool.py) and takes framed jobs
+// (4 byte big-endian length + JSON, with an "id") on stdin instead. Each job runs on a thread
+// of its own that is terminated afterwards: code in a vm context can always reach the host's
+// objects (this.constructor.constructor('return process')()), but a thread's globals, process.env
+// and leftover timers go away with it. Its verdicts go out as {"id", "frame"} followed by
+// {"id", "done", "timed_out", "exit_code", "error"}, exit_code/error say how the thread ended
+// when the solution brought it down before the harness was done.
+'use strict';
+const fs = require('fs');
+const vm = require('vm');
+const { Worker, isMainThread, parentPort, workerData } = require('worker_threads');
+
+function equal(a, b) {
+    if (a === undefined) a = null;
+    if (a === b) return true;
+    if (a === null || b === null || typeof a !== 'object' || typeof b !== 'object') return false;
+    if (Array.isArray(a) !== Array.isArray(b)) return false;
+    const keysA = Object.keys(a), keysB = Object.keys(b);
+    if (keysA.length !== keysB.length) return false;
+    return keysA.every(k => Object.prototype.hasOwnProperty.call(b, k) && equal(a[k], b[k]));
+}
+
+function errorMessage(err) {
+    if (err && err.code === 'ERR_SCRIPT_EXECUTION_TIMEOUT') return 'Execution timed out';
+    return String(err && err.message !== undefined ? err.message : err);
+}
+
+// Parses NYXBOX_TESTS (see sharding.py), null means run everything
+function parseSelection(spec) {
+    if (spec === undefined) return null;
+    const ranges = [];
+    for (const part of spec.split(',')) {
+        if (!part) continue;
+        const [start, end] = part.split('-');
+        ranges.push([Number(start), Number(end === undefined ? start : end)]);
+    }
+    return index => ranges.some(([start, end]) => index >= start && index <= end);
+}
+
+// Wall and CPU time since the call started and this process's peak RSS so far (see protocol.py).
+// A pooled worker's peak RSS covers every job it ran before, so it reports no memory.
+function usage(wallStart, cpuStart, pooled) {
+    const cpu = process.cpuUsage(cpuStart);
+    const used = {
+        time_ms: Number(process.hrtime.bigint() - wallStart) / 1e6,
+        cpu_ms: (cpu.user + cpu.system) / 1000,
+    };
+    if (!pooled) used.memory_kb = process.resourceUsage().maxRSS;
+    return used;
+}
+
+// Returns whether any test hit its timeout. `pooled` is set on a warm worker's job thread.
+function runJob(job, selected, failFast, report, pooled) {
+    const sandbox = { console };
+    if (!job.is_guest) Object.assign(sandbox, { require, process, Buffer });
+    const context = vm.createContext(sandbox);
+    const tests = job.tests.filter(test => selected === null || selected(test.index));
+    try {
+        vm.runInContext(job.code, context, { filename: 'solution.js', timeout: job.timeout_ms });
+    } catch (err) {
+        // Nothing can run if the solution itself doesn't load
+        for (const test of failFast ? tests.slice(0, 1) : tests) {
+            report({ test: test.index, status: 'error', error: errorMessage(err) });
+            if (failFast) report({ stopped: test.index });
+        }
+        return Boolean(err && err.code === 'ERR_SCRIPT_EXECUTION_TIMEOUT');
+    }
+    // Inputs are parsed inside the context so the solution sees its own Array/Object
+    const call = new vm.Script(`${job.function_name}(...JSON.parse(__nyxInput))`, { filename: 'harness.js' });
+    let timedOut = false;
+    for (const test of tests) {
+        context.__nyxInput = JSON.stringify(test.input);
+        const wallStart = process.hrtime.bigint(), cpuStart = process.cpuUsage();
+        let passed = false;
+        try {
+            const result = call.runInContext(context, { timeout: job.timeout_ms });
+            const used = usage(wallStart, cpuStart, pooled);
+            if (equal(result, test.expected_output)) {
+                passed = true;
+                report({ test: test.index, status: 'pass', ...used });
+            } else {
+                report({ test: test.index, status: 'fail', output: JSON.stringify(result === undefined ? null : result), ...used });
+            }
+        } catch (err) {
+            if (err && err.code === 'ERR_SCRIPT_EXECUTION_TIMEOUT') {
+                timedOut = true;
+                report({ test: test.index, status: 'tle', ...usage(wallStart, cpuStart, pooled) });
+            } else {
+                report({ test: test.index, status: 'error', error: errorMessage(err), ...usage(wallStart, cpuStart, pooled) });
+            }
+        }
+        if (failFast && !passed) {
+            report({ stopped: test.index });
+            break;
+        }
+    }
+    return timedOut;
+}
+
+function frameWriter(fd) {
+    return frame => {
+        const body = Buffer.from(JSON.stringify(frame), 'utf8');
+        const head = Buffer.alloc(4);
+        head.writeUInt32BE(body.length, 0);
+        fs.writeSync(fd, Buffer.concat([head, body]));
+    };
+}
+
+function main() {
+    const job = JSON.parse(fs.readFileSync(0, 'utf8'));
+    const results = fs.openSync(process.env.NYXBOX_RESULT_PATH, 'w');
+    const spec = job.selection !== undefined ? job.selection : process.env.NYXBOX_TESTS;
+    const failFast = job.fail_fast !== undefined ? job.fail_fast : process.env.NYXBOX_FAIL_FAST !== undefined;
+    runJob(job, parseSelection(spec), failFast, frameWriter(results), false);
+    fs.closeSync(results);
+}
+
+// Runs one pooled job on a fresh thread, see the top of this file
+function runInThread(job, write) {
+    const thread = new Worker(__filename, { workerData: job });
+    let finished = false, error = '';
+    const done = (timedOut, exitCode) => {
+        if (finished) return;
+        finished = true;
+        write({ id: job.id, done: true, timed_out: timedOut, exit_code: exitCode, error });
+        thread.terminate();
+    };
+    thread.on('message', message => {
+        if (message.frame !== undefined) write({ id: job.id, frame: message.frame });
+        else done(message.timedOut, 0);
+    });
+    thread.on('error', err => { error = errorMessage(err); });
+    thread.on('exit', code => done(false, code));
+}
+
+function jobThread() {
+    const job = workerData;
+    const timedOut = runJob(job, parseSelection(job.selection), Boolean(job.fail_fast), frame => parentPort.postMessage({ frame }), true);
+    parentPort.postMessage({ timedOut });
+}
+
+function worker() {
+    const write = frameWriter(fs.openSync(process.env.NYXBOX_RESULT_PATH, 'w'));
+    let pending = Buffer.alloc(0);
+    process.stdin.on('data', chunk => {
+        pending = Buffer.concat([pending, chunk]);
+        while (pending.length >= 4) {
+            const length = pending.readUInt32BE(0);
+            if (pending.length < 4 + length) break;
+            const job = JSON.parse(pending.subarray(4, 4 + length).toString('utf8'));
+            pending = pending.subarray(4 + length);
+            runInThread(job, write);
+        }
+    });
+    process.stdin.on('end', () => process.exit(0));
+}
+
+if (!isMainThread) {
+    jobThread();
+} else if (process.argv.includes('--worker')) {
+    worker();
+} else {
+    main();
+}
@@ -0,0 +1,225 @@
+import asyncio
+import os
+import shutil
+import signal
+from .config import get_setting
+from .process import ProcessResult
+from .protocol import RESULT_PATH_ENV, FrameDecoder, encode_frame
+from .scheduler import slot
+from .workspace import get_workspace_pool
+
+# Warm `node js_harness.js --worker` processes, so repeated JS runs skip node startup.
+# Workers get their result channel as a passed fd, which is POSIX only.
+NODE_POOL_SUPPORTED = os.name != "nt"
+
+
+class NodeWorkerError(Exception):
+    """Raised when a worker died or could not be started, callers fall back to a one-shot node."""
+    pass
+
+
+class _WorkerReader(asyncio.Protocol):
+    def __init__(self, worker):
+        self.worker = worker
+        self.decoder = FrameDecoder()
+
+    def data_received(self, data):
+        for message in self.decoder.feed(data):
+            self.worker._on_message(message)
+
+    def connection_lost(self, exc):
+        self.worker._on_closed()
+
+
+class NodeWorker:
+    """
+    One warm node process, runs a single job at a time. It keeps one workspace (see
+    workspace.py) as its working directory for its whole life, dropped when it's killed.
+    `guest` is whether it serves guest jobs, set by its first one.
+    """
+    def __init__(self, harness_path):
+        self.harness_path = harness_path
+        self.process = None
+        self.workspace = None
+        self.guest = None
+        self.runs = 0
+        self._transport = None
+        self._job = None
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        read_fd, write_fd = os.pipe()
+        env = dict(os.environ)
+        env[RESULT_PATH_ENV] = f"/dev/fd/{write_fd}"
+        self.workspace = get_workspace_pool().acquire()
+        try:
+            # stdout/stderr are whatever the user prints, the verdicts come back on the channel
+            self.process = await asyncio.create_subprocess_exec(
+                "node", self.harness_path, "--worker",
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.DEVNULL,
+                pass_fds=(write_fd,),
+                env=env,
+                cwd=self.workspace.path,
+                preexec_fn=self.workspace.preexec(),
+            )
+        except Exception as e:
+            os.close(read_fd)
+            self.kill()
+            raise NodeWorkerError(str(e)) from e
+        finally:
+            os.close(write_fd)
+        self._transport, _ = await loop.connect_read_pipe(
+            lambda: _WorkerReader(self), os.fdopen(read_fd, "rb", buffering=0)
+        )
+
+    def is_alive(self):
+        return self.process is not None and self.process.returncode is None
+
+    def _on_message(self, message):
+        job = self._job
+        if job is None or message.get("id") != job["id"]:
+            return
+        if "frame" in message:
+            job["frames"].append(message["frame"])
+            if job["on_frame"] is not None:
+                job["on_frame"](message["frame"])
+        elif not job["future"].done():
+            job["future"].set_result(message)
+
+    def _on_closed(self):
+        if self._job is not None and not self._job["future"].done():
+            self._job["future"].set_exception(NodeWorkerError("Node worker exited unexpectedly"))
+
+    async def run(self, job_id, job, timeout, on_frame=None) -> tuple:
+        """
+        Send one job and wait for it. Returns (frames, done), done is the harness's "done"
+        message (see js_harness.js), None when node didn't answer within `timeout` at all.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._job = {"id": job_id, "future": future, "frames": [], "on_frame": on_frame}
+        self.runs += 1
+        try:
+            self.process.stdin.write(encode_frame({**job, "id": job_id}))
+            await self.process.stdin.drain()
+            return self._job["frames"], await asyncio.wait_for(future, timeout=timeout)
+        except asyncio.TimeoutError:
+            return self._job["frames"], None
+        except (ConnectionError, RuntimeError) as e:
+            raise NodeWorkerError(str(e)) from e
+        finally:
+            self._job = None
+
+    def kill(self):
+        if self._transport is not None:
+            self._transport.close()
+        if self.is_alive():
+            try:
+                self.process.kill()
+            except ProcessLookupError:
+                pass
+        if self.workspace is not None:
+            shutil.rmtree(self.workspace.path, ignore_errors=True)
+            self.workspace = None
+
+
+class NodeWorkerPool:
+    """
+    Up to `size` warm node workers shared by every JS run in this process.
+    Every job runs on a thread of its own inside the worker (see js_harness.js), and the
+    worker's workspace is wiped after it. A worker only serves guest jobs or only non-guest
+    ones, and is replaced after `max_runs` jobs or when a job wedged it or overfilled its
+    workspace.
+    """
+    def __init__(self, harness_path, size, max_runs):
+        self.harness_path = harness_path
+        self.size = size
+        self.max_runs = max_runs
+        self._loop = asyncio.get_running_loop()
+        self._slots = asyncio.Semaphore(size)
+        self._idle = []
+        self._next_id = 0
+
+    async def _acquire(self, guest=None) -> NodeWorker:
+        """An idle worker that may take a guest (or non-guest) job, or a new one. None takes any."""
+        for worker in [worker for worker in self._idle if guest is None or worker.guest in (None, guest)][::-1]:
+            self._idle.remove(worker)
+            if worker.is_alive():
+                return worker
+            worker.kill()
+        worker = NodeWorker(self.harness_path)
+        await worker.start()
+        return worker
+
+    def _release(self, worker, healthy):
+        if healthy and worker.is_alive() and worker.runs < self.max_runs:
+            self._idle.append(worker)
+        else:
+            worker.kill()
+
+    async def warm_up(self):
+        """Start workers ahead of the first run, e.g. when a JS challenge is opened."""
+        async def start_one():
+            async with self._slots:
+                worker = await self._acquire()
+                self._release(worker, True)
+        missing = self.size - len(self._idle)
+        try:
+            await asyncio.gather(*(start_one() for _ in range(missing)))
+        except NodeWorkerError:
+            pass
+
+    async def run(self, job, timeout, on_frame=None) -> ProcessResult:
+        """
+        Run a harness job (see js_harness.js) on a warm worker.
+        `timeout` only catches a wedged node, per test timeouts are enforced in the harness.
+        Takes a scheduler "run" slot before a worker, see scheduler.py.
+        """
+        async with slot("run"), self._slots:
+            worker = await self._acquire(bool(job.get("is_guest")))
+            self._next_id += 1
+            healthy = False
+            worker.guest = bool(job.get("is_guest"))
+            heard = []
+
+            def hear(frame):
+                heard.append(frame)
+                if on_frame is not None:
+                    on_frame(frame)
+            try:
+                async with worker.workspace.watching():
+                    try:
+                        frames, done = await worker.run(self._next_id, job, timeout, hear)
+                    except NodeWorkerError:
+                        if not worker.workspace.over_quota:
+                            raise
+                        # Killed for filling its workspace, like a one-shot node would have been
+                        return worker.workspace.checked(ProcessResult(returncode=-signal.SIGKILL, frames=heard))
+                healthy = done is not None and await asyncio.to_thread(worker.workspace.wipe)
+                if done is None:
+                    return ProcessResult(timed_out=True, frames=frames)
+                return worker.workspace.checked(ProcessResult(stderr=done.get("error") or "", returncode=done.get("exit_code", 0), frames=frames))
+            finally:
+                self._release(worker, healthy)
+
+    def close(self):
+        for worker in self._idle:
+            worker.kill()
+        self._idle = []
+
+
+_pool = None
+
+def get_node_pool(harness_path):
+    """
+    Shared worker pool for the running event loop, or None when the pool is turned off
+    (`js_workers` set to 0) or unsupported on this platform.
+    """
+    global _pool
+    size = int(get_setting("js_workers"))
+    if not NODE_POOL_SUPPORTED or size <= 0:
+        return None
+    if _pool is None or _pool._loop is not asyncio.get_running_loop():
+        _pool = NodeWorkerPool(harness_path, size, max(1, int(get_setting("js_worker_max_runs"))))
+    return _pool
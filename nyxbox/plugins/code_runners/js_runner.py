@@ -2,8 +2,21 @@ import json
 import tempfile
 import asyncio
 import subprocess
+import os
 import re
-async def run_js_code(code, challenge, is_submission = False, is_guest = False) -> list:
+from .process import run_process
+from .js_pool import NodeWorkerError, get_node_pool
+from .limits import Limits
+from .protocol import MLE_MESSAGE, crash_result, frame_listener, results_from_frames, stop_at_first_failure
+from .sharding import FAIL_FAST_ENV, SELECTION_ENV, run_sharded
+from .workspace import workspace
+
+# One static harness runs every test in a single node process, the job comes in over stdin
+JS_HARNESS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "js_harness.js")
+TIME_LIMIT_MS = 3000 # Per test unless the challenge sets its own, enforced inside the harness
+
+async def run_js_code(code, challenge, is_submission = False, is_guest = False, on_result=None) -> list:
+    """on_result(index, result) is called for each test as it finishes, see protocol.frame_listener."""
     all_results=[]
     if is_guest:
         if re.search(r'\b(import\s+|require\s*\()', code):
@@ -14,65 +27,59 @@ async def run_js_code(code, challenge, is_submission = False, is_guest = False)
                 "passed": False,
                 "error": "Use of import/require is disallowed"
             }]
-    for test_case in challenge['tests']:
-        if test_case.get("hidden", False) and not is_submission:
-            continue
-        args = ", ".join(json.dumps(arg) for arg in test_case["input"])
-        expected = test_case["expected_output"]
-        wrapped_code = f"""
-// --- USER CODE START ---
-{code}
-// --- USER CODE END ---
-
-try {{
-const result = {challenge.get('function_name')}({args});
-console.log(JSON.stringify(result));
-}} catch (err) {{
-console.error("ERROR:", err.message);
-process.exit(1);
-}}
-"""
-        with tempfile.NamedTemporaryFile("w", delete=False, suffix=".js") as f:
-            f.write(wrapped_code)
-            js_file = f.name
+    tests = [
+        {"index": i, "input": t["input"], "expected_output": t["expected_output"]}
+        for i, t in enumerate(challenge['tests'])
+        if is_submission or not t.get("hidden", False)
+    ]
+    limits = Limits.from_challenge(challenge, TIME_LIMIT_MS)
+    job = {
+        "code": code,
+        "function_name": challenge.get('function_name'),
+        "tests": tests,
+        "timeout_ms": limits.time_limit_ms,
+        "is_guest": is_guest,
+    }
+    # Every test has its own timeout in the harness, this one only catches a wedged node
+    process_timeout = limits.process_timeout(len(tests))
+    node = ["node", JS_HARNESS_PATH]
+    pool = get_node_pool(JS_HARNESS_PATH)
+    if limits.memory_limit_mb is not None:
+        # Warm workers share one heap across jobs, a capped run gets a node of its own.
+        # V8 reserves far more address space than it uses, so this is a heap cap, not RLIMIT_AS.
+        pool = None
+        node = ["node", f"--max-old-space-size={limits.memory_limit_mb}", JS_HARNESS_PATH]
+    on_frame = frame_listener(on_result, challenge['tests'], display=json.dumps, check=limits.check)
 
-        try:
-            proc = await asyncio.create_subprocess_exec(
-            "node", js_file,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-        )
+    async def run_shard(env):
+        if pool is not None:
+            try:
+                return await pool.run({**job, "selection": env[SELECTION_ENV], "fail_fast": FAIL_FAST_ENV in env}, process_timeout, on_frame)
+            except NodeWorkerError:
+                pass # Couldn't get a warm worker, fall back to a fresh node
+        async with workspace() as ws:
+            return ws.checked(await run_process(
+                node, process_timeout, cwd=ws.path,
+                stdin_data=json.dumps(job).encode("utf-8"), env={**os.environ, **env}, on_frame=on_frame,
+                preexec_fn=ws.preexec(),
+            ))
 
-            stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=3)
-            if proc.returncode != 0:
-                all_results.append({
-                    "input": str(test_case["input"]),
-                    "output": None,
-                    "expected_output": json.dumps(expected),
-                    "passed": False,
-                    "error": stderr.decode().strip()
-                })
-                continue
-            else:
-                result = json.loads(stdout.decode().strip())
-                # Compare None/null correctly
-                if expected is None:
-                    passed = result is None
-                else:
-                    passed = result == expected
-                all_results.append({
-                    "input": str(test_case["input"]),
-                    "output": json.dumps(result),
-                    "expected_output": json.dumps(expected),
-                    "passed": passed,
-                    "error": None
-                })
-        except asyncio.TimeoutError:
-            all_results.append({
-                "input": str(test_case["input"]),
-                "output": None,
-                "expected_output": json.dumps(expected),
-                "passed": False,
-                "error": "Execution timed out"
-            })
-    return all_results
\ No newline at end of file
+    result = await run_sharded([t["index"] for t in tests], run_shard, on_frame=on_frame, fail_fast=is_submission)
+    all_results = limits.check(results_from_frames(result.frames, challenge['tests'], display=json.dumps))
+    if all_results and len(all_results) < len(tests) and result.returncode:
+        # Died part way, e.g. node running out of the capped heap
+        crash = crash_result(result.returncode, result.stderr)
+        if "heap out of memory" in result.stderr:
+            crash["error"] = MLE_MESSAGE
+        all_results.append(crash)
+    elif not all_results and tests:
+        all_results.append({
+            "input": None,
+            "output": None,
+            "expected_output": None,
+            "passed": False,
+            "error": result.stderr or f"Program exited with code {result.returncode}"
+        })
+    if is_submission:
+        return stop_at_first_failure(all_results)
+    return all_results
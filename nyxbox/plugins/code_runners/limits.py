@@ -0,0 +1,63 @@
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+from .protocol import LIMIT_MESSAGES, MLE_MESSAGE, TLE_MESSAGE
+
+# Per-challenge resource limits. A challenge can set "time_limit_ms" (per test) and
+# "memory_limit_mb"; without them each runner keeps its own per-test budget and no memory cap.
+# Harnesses read the time limit from this env var and watch every test themselves.
+TIME_LIMIT_ENV = "NYXBOX_TIME_LIMIT_MS"
+# Exit code of a harness that reported a test over the time limit and had to stop, because the
+# call couldn't be interrupted. The runner starts a fresh one for the tests after it.
+TLE_EXIT_CODE = 124
+# What a harness gets on top of its tests' limits before the runner kills it
+STARTUP_ALLOWANCE = 5.0
+
+
+class Limits:
+    """Time limit per test (ms) and optional memory limit (MB) for one run."""
+    def __init__(self, time_limit_ms, memory_limit_mb=None):
+        self.time_limit_ms = int(time_limit_ms)
+        self.memory_limit_mb = int(memory_limit_mb) if memory_limit_mb else None
+
+    @classmethod
+    def from_challenge(cls, challenge, default_time_limit_ms):
+        challenge = challenge or {}
+        return cls(
+            challenge.get("time_limit_ms") or default_time_limit_ms,
+            challenge.get("memory_limit_mb"),
+        )
+
+    def process_timeout(self, test_count) -> float:
+        """Safety net for a whole harness run, the per-test limits are enforced inside it."""
+        return self.time_limit_ms / 1000 * max(1, test_count) + STARTUP_ALLOWANCE
+
+    def env(self) -> dict:
+        return {TIME_LIMIT_ENV: str(self.time_limit_ms)}
+
+    def preexec(self):
+        """preexec_fn capping the child's address space, None if there's no cap or no setrlimit."""
+        if self.memory_limit_mb is None or resource is None:
+            return None
+        limit = self.memory_limit_mb * 1024 * 1024
+
+        def apply():
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        return apply
+
+    def check(self, results) -> list:
+        """
+        Flag results whose measured usage went over the limits even though the harness
+        couldn't stop them (warm workers share a heap, Windows has no timers/rlimits).
+        """
+        for result in results:
+            if result.get("error") in LIMIT_MESSAGES.values():
+                continue
+            time_ms = result.get("time_ms")
+            memory_kb = result.get("memory_kb")
+            if time_ms is not None and time_ms > self.time_limit_ms:
+                result.update(passed=False, output=None, error=TLE_MESSAGE)
+            elif memory_kb is not None and self.memory_limit_mb is not None and memory_kb > self.memory_limit_mb * 1024:
+                result.update(passed=False, output=None, error=MLE_MESSAGE)
+        return results
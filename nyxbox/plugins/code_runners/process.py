@@ -0,0 +1,204 @@
+import asyncio
+import os
+import tempfile
+from .config import get_setting
+from .protocol import RESULT_PATH_ENV, FrameDecoder
+from .scheduler import slot
+
+READ_SIZE = 65536
+
+
+class ProcessResult:
+    """
+    What a harness run produced, frames are the decoded result channel. `truncated` is set
+    when the program went over the output cap and was killed for it.
+    """
+    def __init__(self, stdout="", stderr="", returncode=None, timed_out=False, frames=None, truncated=False):
+        self.stdout = stdout
+        self.stderr = stderr
+        self.returncode = returncode
+        self.timed_out = timed_out
+        self.frames = frames if frames is not None else []
+        self.truncated = truncated
+
+
+def output_limit() -> int:
+    """Bytes of stdout + stderr a program gets before it's killed, see `output_limit_kb`."""
+    return int(get_setting("output_limit_kb")) * 1024
+
+
+async def communicate_bounded(process, stdin_data, limit) -> tuple:
+    """
+    process.communicate(), except output is read as it comes and only the first `limit`
+    bytes of stdout + stderr together are kept. A process that writes more is killed right
+    there instead of piling it all up in memory. Returns (stdout, stderr, truncated).
+    """
+    buffers = (bytearray(), bytearray())
+    state = {"room": limit, "truncated": False}
+
+    async def feed():
+        if process.stdin is None:
+            return
+        try:
+            if stdin_data:
+                process.stdin.write(stdin_data)
+                await process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            pass # Exited without reading it all
+        finally:
+            process.stdin.close()
+
+    async def drain(stream, buffer):
+        # Keeps reading past the cap (dropping it) until the killed process closes the pipe
+        while True:
+            chunk = await stream.read(READ_SIZE)
+            if not chunk:
+                return
+            if len(chunk) <= state["room"]:
+                buffer += chunk
+                state["room"] -= len(chunk)
+                continue
+            buffer += chunk[:state["room"]]
+            state["room"] = 0
+            if not state["truncated"]:
+                state["truncated"] = True
+                try:
+                    process.kill()
+                except ProcessLookupError:
+                    pass
+
+    await asyncio.gather(feed(), drain(process.stdout, buffers[0]), drain(process.stderr, buffers[1]))
+    await process.wait()
+    return bytes(buffers[0]), bytes(buffers[1]), state["truncated"]
+
+
+class _FrameReader(asyncio.Protocol):
+    def __init__(self, on_frame):
+        self.decoder = FrameDecoder()
+        self.frames = []
+        self.on_frame = on_frame
+        self.closed = asyncio.get_running_loop().create_future()
+
+    def data_received(self, data):
+        for frame in self.decoder.feed(data):
+            self.frames.append(frame)
+            if self.on_frame is not None:
+                self.on_frame(frame)
+
+    def connection_lost(self, exc):
+        if not self.closed.done():
+            self.closed.set_result(None)
+
+
+async def run_process(argv, timeout, stdin_data=None, cwd=None, env=None, on_frame=None, preexec_fn=None) -> ProcessResult:
+    """
+    Spawn a harness with a result channel attached and wait for it.
+    stdin_data (bytes) is fed to the child, on_frame is called for each frame as it arrives,
+    preexec_fn runs in the child before exec (POSIX only, e.g. Limits.preexec()).
+    Output past the `output_limit_kb` setting gets the child killed, see communicate_bounded.
+    Waits for a "run" slot first (see scheduler.py), the timeout only starts once it has one.
+    """
+    async with slot("run"):
+        return await _spawn(argv, timeout, stdin_data, cwd, env, on_frame, preexec_fn)
+
+
+async def _spawn(argv, timeout, stdin_data, cwd, env, on_frame, preexec_fn) -> ProcessResult:
+    child_env = dict(os.environ if env is None else env)
+    if os.name == "nt":
+        return await _run_with_result_file(argv, timeout, stdin_data, cwd, child_env, on_frame)
+
+    loop = asyncio.get_running_loop()
+    read_fd, write_fd = os.pipe()
+    child_env[RESULT_PATH_ENV] = f"/dev/fd/{write_fd}"
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *argv,
+            stdin=asyncio.subprocess.PIPE if stdin_data is not None else asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            pass_fds=(write_fd,),
+            env=child_env,
+            cwd=cwd,
+            preexec_fn=preexec_fn,
+        )
+    except Exception:
+        os.close(read_fd)
+        raise
+    finally:
+        os.close(write_fd)
+    transport, reader = await loop.connect_read_pipe(
+        lambda: _FrameReader(on_frame), os.fdopen(read_fd, "rb", buffering=0)
+    )
+    try:
+        try:
+            stdout, stderr, truncated = await asyncio.wait_for(
+                communicate_bounded(process, stdin_data, output_limit()), timeout=timeout
+            )
+        except asyncio.TimeoutError:
+            try:
+                process.kill()
+                await process.wait()
+            except ProcessLookupError:
+                pass
+            return ProcessResult(returncode=process.returncode, timed_out=True, frames=reader.frames)
+        try:
+            # Something the program spawned could still hold the channel open, don't wait on it forever
+            await asyncio.wait_for(asyncio.shield(reader.closed), timeout=1)
+        except asyncio.TimeoutError:
+            pass
+    finally:
+        transport.close()
+    return ProcessResult(
+        stdout=stdout.decode("utf-8", errors="replace"),
+        stderr=stderr.decode("utf-8", errors="replace").strip(),
+        returncode=process.returncode,
+        frames=reader.frames,
+        truncated=truncated,
+    )
+
+
+async def _run_with_result_file(argv, timeout, stdin_data, cwd, child_env, on_frame) -> ProcessResult:
+    # No fd passing on Windows, so the harness writes its frames to a file we read afterwards
+    with tempfile.NamedTemporaryFile(suffix=".frames", delete=False) as tmp_file:
+        result_path = tmp_file.name
+    child_env[RESULT_PATH_ENV] = result_path
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *argv,
+            stdin=asyncio.subprocess.PIPE if stdin_data is not None else asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env=child_env,
+            cwd=cwd,
+        )
+        timed_out = truncated = False
+        stdout = stderr = b""
+        try:
+            stdout, stderr, truncated = await asyncio.wait_for(
+                communicate_bounded(process, stdin_data, output_limit()), timeout=timeout
+            )
+        except asyncio.TimeoutError:
+            timed_out = True
+            try:
+                process.kill()
+                await process.wait()
+            except ProcessLookupError:
+                pass
+        with open(result_path, "rb") as f:
+            frames = FrameDecoder().feed(f.read())
+        if on_frame is not None:
+            for frame in frames:
+                on_frame(frame)
+        return ProcessResult(
+            stdout=stdout.decode("utf-8", errors="replace"),
+            stderr=stderr.decode("utf-8", errors="replace").strip(),
+            returncode=process.returncode,
+            timed_out=timed_out,
+            frames=frames,
+            truncated=truncated,
+        )
+    finally:
+        try:
+            os.unlink(result_path)
+        except OSError:
+            pass
@@ -0,0 +1,137 @@
+import json
+import struct
+
+# Every harness reports its verdicts on a dedicated channel instead of stdout, so whatever
+# the user prints can never be mistaken for a result. The channel path is handed over in
+# this env var (/dev/fd/N on POSIX, a temp file on Windows).
+RESULT_PATH_ENV = "NYXBOX_RESULT_PATH"
+
+# A frame is a 4 byte big-endian length followed by that many bytes of UTF-8 JSON.
+# Harnesses write one per test:
+#   {"test": index into the tests the harness was given,
+#    "status": "pass" | "fail" | "error" | "tle" | "mle" (over the time/memory limit, see limits.py),
+#              "ole" is never sent by a harness, the runner adds it for a run killed over its output cap,
+#    "output": shown for fails, "expected": shown for fails, "error": message for errors,
+#    "time_ms": wall time of the call, "cpu_ms": user+sys CPU time of the call,
+#    "memory_kb": peak resident memory of the harness process by the end of the test}
+# Harnesses told to fail fast (see sharding.FAIL_FAST_ENV) follow the first test that doesn't
+# pass with {"stopped": its index} and run nothing after it.
+# The usage fields are optional. The JVM reports its peak heap use during the test as memory,
+# its RSS says little about the solution (and nothing when it runs in the java daemon).
+HEADER = struct.Struct(">I")
+USAGE_FIELDS = ("time_ms", "cpu_ms", "memory_kb")
+
+TLE_MESSAGE = "Time Limit Exceeded"
+MLE_MESSAGE = "Memory Limit Exceeded"
+OLE_MESSAGE = "Output Limit Exceeded"
+LIMIT_MESSAGES = {"tle": TLE_MESSAGE, "mle": MLE_MESSAGE, "ole": OLE_MESSAGE}
+
+
+def encode_frame(payload) -> bytes:
+    data = json.dumps(payload).encode("utf-8")
+    return HEADER.pack(len(data)) + data
+
+
+class FrameDecoder:
+    """Streaming decoder, feed it bytes as they arrive and get complete frames back."""
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def feed(self, data) -> list:
+        self._buffer += data
+        frames = []
+        offset = 0
+        while len(self._buffer) - offset >= HEADER.size:
+            (length,) = HEADER.unpack_from(self._buffer, offset)
+            end = offset + HEADER.size + length
+            if len(self._buffer) < end:
+                break
+            # Harnesses pass user output through byte for byte, it isn't always valid UTF-8
+            frames.append(json.loads(self._buffer[offset + HEADER.size:end].decode("utf-8", errors="replace")))
+            offset = end
+        del self._buffer[:offset]
+        return frames
+
+
+def frame_to_result(frame, test_case, display=str) -> dict:
+    """Turn one harness frame into the result dict the UI works with."""
+    status = frame.get("status")
+    expected = frame.get("expected")
+    if expected is None:
+        expected = display(test_case["expected_output"])
+    usage = {field: frame.get(field) for field in USAGE_FIELDS}
+    if status == "pass":
+        return {"input": str(test_case["input"]), "output": expected, "expected_output": expected, "passed": True, "error": None, **usage}
+    elif status == "fail":
+        return {"input": str(test_case["input"]), "output": frame.get("output"), "expected_output": expected, "passed": False, "error": None, **usage}
+    elif status in LIMIT_MESSAGES:
+        return {"input": str(test_case["input"]), "output": None, "expected_output": expected, "passed": False, "error": LIMIT_MESSAGES[status], **usage}
+    return {"input": str(test_case["input"]), "output": None, "expected_output": expected, "passed": False, "error": frame.get("error") or "Unknown error", **usage}
+
+
+def results_from_frames(frames, test_cases, display=str) -> list:
+    """Map frames back onto the tests the harness was given, in the order they were reported."""
+    results = []
+    for frame in frames:
+        index = frame.get("test")
+        if not isinstance(index, int) or not 0 <= index < len(test_cases):
+            continue
+        results.append(frame_to_result(frame, test_cases[index], display))
+    return results
+
+
+def frame_listener(on_result, test_cases, display=str, check=None):
+    """
+    on_frame callback that hands each test's result to on_result(index, result) as soon as its
+    frame arrives, so callers can show verdicts while the rest still run. None without an
+    on_result. `check` gets a one result list to adjust first (Limits.check).
+    """
+    if on_result is None:
+        return None
+
+    def on_frame(frame):
+        index = frame.get("test")
+        if not isinstance(index, int) or not 0 <= index < len(test_cases):
+            return
+        result = frame_to_result(frame, test_cases[index], display)
+        if check is not None:
+            check([result])
+        on_result(index, result)
+    return on_frame
+
+
+def stop_at_first_failure(results) -> list:
+    """
+    A fail-fast run's results up to its first failure, which gets "stopped" set: the tests
+    after it didn't run, or ran in another shard and don't count.
+    """
+    for i, result in enumerate(results):
+        if not result["passed"]:
+            return results[:i] + [{**result, "stopped": True}]
+    return results
+
+
+# Input shown on results about the whole harness run rather than one of its tests
+RUN_INPUT = "Execution"
+CRASH_PREFIXES = ("Program crashed", "Program exited with code")
+
+
+def crash_message(returncode, stderr="") -> str:
+    if returncode < 0:
+        message = f"{CRASH_PREFIXES[0]} (signal {-returncode})"
+    else:
+        message = f"{CRASH_PREFIXES[1]} {returncode}"
+    if stderr:
+        message += f"\n{stderr}"
+    return message
+
+
+def crash_result(returncode, stderr="") -> dict:
+    """Result entry for a harness that died without reporting every test."""
+    return {"input": RUN_INPUT, "output": None, "expected_output": None, "passed": False, "error": crash_message(returncode, stderr)}
+
+
+def is_crash(result) -> bool:
+    """Whether a result is about a harness that died (see crash_result), rather than a verdict."""
+    error = result.get("error")
+    return result.get("input") == RUN_INPUT or (isinstance(error, str) and error.startswith(CRASH_PREFIXES))
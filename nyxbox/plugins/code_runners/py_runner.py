@@ -1,165 +1,242 @@
 import asyncio
-import tempfile
+import functools
 import os
 import sys
 import re
+from .build_cache import artifact_key
+from .fork_server import FORK_SERVER_SUPPORTED, ForkServerError, get_fork_server
+from .limits import TIME_LIMIT_ENV, Limits
+from .process import ProcessResult, run_process
+from .protocol import RESULT_PATH_ENV, frame_listener, results_from_frames, stop_at_first_failure
+from .sharding import FAIL_FAST_ENV, SELECTION_ENV, run_sharded
+from .testvec import VECTORS_ENV, vector_file
+from .workspace import quota_bytes, workspace
 
-TIMEOUT=3
+TIME_LIMIT_MS = 3000 # Per test, unless the challenge sets its own
 
-async def run_python_code(code, challenge, is_submission=False, is_guest=False):
-    all_results = []
-    if is_guest:
-        pattern = r'^\s*(?:import\s+\w+(?:\s+as\s+\w+)?|from\s+[A-Za-z0-9_\.]+\s+import\s+)'
-        if re.search(pattern, code, re.MULTILINE):
-            return [{
-                "input": None,
-                "output": None,
-                "expected_output": None,
-                "passed": False,
-                "error": "Imports are not allowed!"
-            }]
-    # Create test program
-    if is_guest:
-        test_code = f"""
-{code}
+async def execute_python(source, on_frame=None, env=None, timeout=TIME_LIMIT_MS / 1000, limits=None, harness=None) -> ProcessResult:
+    """
+    Run a python program with the runner's isolation flags (-I -S), env is added to its environment.
+    Uses the fork server where we can, otherwise cold starts an interpreter. `limits` caps the
+    child's memory, the time limit itself is up to the harness. It runs in a workspace (see
+    workspace.py) and the source never touches the disk. harness is a (key, source) pair run
+    after `source`, see python_harness.
+    """
+    memory_limit_mb = limits.memory_limit_mb if limits is not None else None
+    async with workspace() as ws:
+        if FORK_SERVER_SUPPORTED:
+            try:
+                response = await get_fork_server().run(source, timeout, on_frame, env, memory_limit_mb, ws.path, quota_bytes(), harness)
+                return ws.checked(ProcessResult(
+                    stdout=response["stdout"],
+                    stderr=response["stderr"].strip(),
+                    returncode=response["returncode"],
+                    timed_out=response["timed_out"],
+                    frames=response["frames"],
+                    truncated=response.get("truncated", False),
+                ))
+            except (ForkServerError, asyncio.TimeoutError):
+                pass # Server is gone, cold start this one and let the next run restart it
+        if harness is not None:
+            source += harness[1]
+        return ws.checked(await _execute_cold(source, on_frame, env, timeout, limits, ws))
 
-import sys
-func_name = '{challenge['function_name']}'
-tests = {challenge['tests']}
-is_submission = {is_submission}
+async def _execute_cold(source, on_frame, env, timeout, limits, ws) -> ProcessResult:
+    # The program comes in over stdin ("-"), the harness reads its tests from the vector file
+    return await run_process(
+        [sys.executable, "-I", "-S", "-"], timeout, stdin_data=source.encode("utf-8"),
+        cwd=ws.path, env={**os.environ, **(env or {})}, on_frame=on_frame,
+        preexec_fn=ws.preexec(limits.preexec() if limits is not None else None),
+    )
 
-import builtins, sys
+# Appended after the user's code. Verdicts go out on the result channel (see protocol.py),
+# so anything the solution prints is simply ignored.
+HARNESS_TEMPLATE = """
 
-sys.path[:] = ['']
-_orig_import = builtins.__import__
-def __blocked_import__(name, globals=None, locals=None, fromlist=(), level=0):
-    print("Test 0: FAIL - Importing is not allowed!")
-    exit()
-builtins.__import__ = __blocked_import__
+import sys, os as _nyx_os, json as _nyx_json, struct as _nyx_struct, mmap as _nyx_mmap, time as _nyx_time, signal as _nyx_signal
+try:
+    import resource as _nyx_resource
+except ImportError: # Windows
+    _nyx_resource = None
+func_name = '{func_name}'
 
-for i, test_case in enumerate(tests):
-    if not is_submission and test_case.get('hidden', False):
-        continue
-    
+_nyx_results = open(_nyx_os.environ['{result_env}'], 'wb')
+def _nyx_report(frame):
+    data = _nyx_json.dumps(frame).encode('utf-8')
+    _nyx_results.write(_nyx_struct.pack('>I', len(data)) + data)
+    _nyx_results.flush()
+
+def _nyx_selection(spec):
+    if spec is None:
+        return None
+    selected = set()
+    for part in spec.split(','):
+        if part:
+            start, _, end = part.partition('-')
+            selected.update(range(int(start), int(end or start) + 1))
+    return selected
+_nyx_selected = _nyx_selection(_nyx_os.environ.get('{selection_env}'))
+_nyx_fail_fast = '{fail_fast_env}' in _nyx_os.environ
+
+# Per-test watchdog (see limits.py). Raises a BaseException so `except Exception` in the
+# solution can't swallow it, Windows has no interval timers and relies on the process timeout.
+class _NyxTimeLimit(BaseException):
+    pass
+_nyx_time_limit = int(_nyx_os.environ.get('{time_limit_env}') or 0) / 1000
+_nyx_watchdog = bool(_nyx_time_limit) and hasattr(_nyx_signal, 'setitimer')
+def _nyx_alarm(signum, frame):
+    raise _NyxTimeLimit()
+if _nyx_watchdog:
+    _nyx_signal.signal(_nyx_signal.SIGALRM, _nyx_alarm)
+def _nyx_arm(seconds):
+    if _nyx_watchdog:
+        _nyx_signal.setitimer(_nyx_signal.ITIMER_REAL, seconds)
+
+# Wall and CPU time since the call started and this process's peak RSS so far (see protocol.py)
+def _nyx_usage(wall_start, cpu_start):
+    usage = {{
+        "time_ms": (_nyx_time.perf_counter_ns() - wall_start) / 1e6,
+        "cpu_ms": (_nyx_time.process_time_ns() - cpu_start) / 1e6,
+    }}
+    if _nyx_resource is not None:
+        peak = _nyx_resource.getrusage(_nyx_resource.RUSAGE_SELF).ru_maxrss
+        usage["memory_kb"] = peak // 1024 if sys.platform == 'darwin' else peak
+    return usage
+
+# Test inputs come from the vector file (see testvec.py), only the selected tests are decoded
+def _nyx_value(data, pos):
+    tag = data[pos:pos + 1]
+    pos += 1
+    if tag == b'N':
+        return None, pos
+    if tag == b'B':
+        return data[pos] != 0, pos + 1
+    if tag == b'I':
+        return _nyx_struct.unpack_from('>q', data, pos)[0], pos + 8
+    if tag == b'R':
+        return _nyx_struct.unpack_from('>d', data, pos)[0], pos + 8
+    (size,) = _nyx_struct.unpack_from('>I', data, pos)
+    pos += 4
+    if tag == b'G':
+        return int(data[pos:pos + size]), pos + size
+    if tag == b'S':
+        return data[pos:pos + size].decode('utf-8'), pos + size
+    if tag == b'L':
+        items = []
+        for _ in range(size):
+            item, pos = _nyx_value(data, pos)
+            items.append(item)
+        return items, pos
+    if tag == b'M':
+        items = {{}}
+        for _ in range(size):
+            key, pos = _nyx_value(data, pos)
+            items[key], pos = _nyx_value(data, pos)
+        return items, pos
+    raise ValueError('Bad test vector')
+
+def _nyx_tests():
+    with open(_nyx_os.environ['{vectors_env}'], 'rb') as f:
+        data = _nyx_mmap.mmap(f.fileno(), 0, access=_nyx_mmap.ACCESS_READ)
+    (count,) = _nyx_struct.unpack_from('>I', data, 8)
+    for i in range(count):
+        if _nyx_selected is not None and i not in _nyx_selected:
+            continue
+        (pos,) = _nyx_struct.unpack_from('>I', data, 12 + 4 * i)
+        (arity,) = _nyx_struct.unpack_from('>I', data, pos)
+        pos += 4
+        inputs = []
+        for _ in range(arity):
+            value, pos = _nyx_value(data, pos)
+            inputs.append(value)
+        expected, pos = _nyx_value(data, pos)
+        yield i, inputs, expected
+tests = list(_nyx_tests())
+{guest_block}
+for i, inputs, expected in tests:
+    _nyx_start = (_nyx_time.perf_counter_ns(), _nyx_time.process_time_ns())
+    _nyx_passed = False
     try:
-        result = {challenge['function_name']}(*test_case['input'])
-        expected = test_case['expected_output']
+        _nyx_arm(_nyx_time_limit)
+        try:
+            result = {func_name}(*inputs)
+        finally:
+            _nyx_arm(0)
+        usage = _nyx_usage(*_nyx_start)
         if result == expected:
-            print(f"Test {{i+1}}: PASS")
+            _nyx_passed = True
+            _nyx_report({{"test": i, "status": "pass", **usage}})
         else:
-            print(f"Test {{i+1}}: FAIL - Got: {{result}} Expected: {{expected}}")
+            _nyx_report({{"test": i, "status": "fail", "output": str(result), "expected": str(expected), **usage}})
+    except _NyxTimeLimit:
+        _nyx_report({{"test": i, "status": "tle", **_nyx_usage(*_nyx_start)}})
+    except MemoryError:
+        _nyx_report({{"test": i, "status": "mle", **_nyx_usage(*_nyx_start)}})
     except Exception as e:
-        print(f"Test {{i+1}}: ERROR - {{str(e)}}")
+        _nyx_report({{"test": i, "status": "error", "error": str(e), **_nyx_usage(*_nyx_start)}})
+    if _nyx_fail_fast and not _nyx_passed:
+        _nyx_report({{"stopped": i}})
+        break
 """
-    else:
-        test_code = f"""
-{code}
 
-import sys
-func_name = '{challenge['function_name']}'
-tests = {challenge['tests']}
-is_submission = {is_submission}
+GUEST_BLOCK = """
+import builtins
 
-for i, test_case in enumerate(tests):
-    if not is_submission and test_case.get('hidden', False):
-        continue    
-    try:
-        result = {challenge['function_name']}(*test_case['input'])
-        expected = test_case['expected_output']
-        if result == expected:
-            print(f"Test {{i+1}}: PASS")
-        else:
-            print(f"Test {{i+1}}: FAIL - Got: {{result}} Expected: {{expected}}")
-    except Exception as e:
-        print(f"Test {{i+1}}: ERROR - {{str(e)}}")
+sys.path[:] = ['']
+_orig_import = builtins.__import__
+def __blocked_import__(name, globals=None, locals=None, fromlist=(), level=0):
+    raise ImportError("Importing is not allowed!")
+builtins.__import__ = __blocked_import__
 """
+
+@functools.lru_cache(maxsize=32)
+def python_harness(func_name, is_guest):
+    """
+    (key, source) of the harness for a function. Which tests run is picked at runtime, so it
+    only depends on the function's name and whether it's a guest's run: it's formatted once,
+    and the fork server compiles it once (see ForkServer.run).
+    """
+    source = HARNESS_TEMPLATE.format(
+        func_name=func_name,
+        result_env=RESULT_PATH_ENV,
+        vectors_env=VECTORS_ENV,
+        selection_env=SELECTION_ENV,
+        time_limit_env=TIME_LIMIT_ENV,
+        fail_fast_env=FAIL_FAST_ENV,
+        guest_block=GUEST_BLOCK if is_guest else "",
+    )
+    return artifact_key("py-harness", source), source
+
+async def run_python_code(code, challenge, is_submission=False, is_guest=False, on_result=None):
+    """on_result(index, result) is called for each test as it finishes, see protocol.frame_listener."""
+    all_results = []
+    if is_guest:
+        pattern = r'^\s*(?:import\s+\w+(?:\s+as\s+\w+)?|from\s+[A-Za-z0-9_\.]+\s+import\s+)'
+        if re.search(pattern, code, re.MULTILINE):
+            return [{
+                "input": None,
+                "output": None,
+                "expected_output": None,
+                "passed": False,
+                "error": "Imports are not allowed!"
+            }]
+    harness = python_harness(challenge['function_name'], is_guest)
     
-    # Write to temp file and execute
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as tmp_file:
-        tmp_file.write(test_code)
-        tmp_file_name = tmp_file.name
+    # Split the tests across cores, each shard is its own forked child
+    indices = [i for i, t in enumerate(challenge['tests']) if is_submission or not t.get('hidden', False)]
+    vectors = vector_file(challenge['tests'])
+    limits = Limits.from_challenge(challenge, TIME_LIMIT_MS)
+    on_frame = frame_listener(on_result, challenge['tests'], check=limits.check)
+    result = await run_sharded(indices, lambda env: execute_python(
+        code, on_frame, env={**env, **limits.env(), VECTORS_ENV: vectors},
+        timeout=limits.process_timeout(len(indices)), limits=limits, harness=harness,
+    ), on_frame=on_frame, fail_fast=is_submission)
     
-    try:
-        process = await asyncio.create_subprocess_exec(
-            sys.executable, "-I", "-S", tmp_file_name,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        
-        try:
-            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=TIMEOUT)
-        except asyncio.TimeoutError:
-            try:
-                process.kill()
-                await process.wait()
-            except:
-                pass
-            return [{"input": "Execution", "output": None, "expected_output": None, "passed": False, "error": f"Execution timed out, Timeout = {TIMEOUT}"}]
-        
-        if stderr:
-            stderr_text = stderr.decode('utf-8', errors='replace').strip()
-            return [{"input": None, "output": None, "expected_output": None, "passed": False, "error": stderr_text}]
-        
-        # Parse results
-        output_lines = stdout.decode('utf-8', errors='replace').strip().split('\n')
-        test_cases = [t for t in challenge['tests'] if is_submission or not t.get('hidden', False)]
-        
-        for i, line in enumerate(output_lines):
-            if line.startswith("Test ") and i < len(test_cases):
-                test_case = test_cases[i]
-                
-                if ": PASS" in line:
-                    all_results.append({
-                        "input": str(test_case["input"]),
-                        "output": str(test_case["expected_output"]),
-                        "expected_output": str(test_case["expected_output"]),
-                        "passed": True,
-                        "error": None
-                    })
-                elif ": FAIL" in line:
-                    try:
-                        fail_part = line.split(": FAIL - Got: ")[1]
-                        actual_output, expected_output = fail_part.split(" Expected: ", 1)
-                        all_results.append({
-                            "input": str(test_case["input"]),
-                            "output": actual_output,
-                            "expected_output": expected_output,
-                            "passed": False,
-                            "error": None
-                        })
-                    except:
-                        all_results.append({
-                            "input": str(test_case["input"]),
-                            "output": None,
-                            "expected_output": str(test_case["expected_output"]),
-                            "passed": False,
-                            "error": "Failed to parse test output"
-                        })
-                elif ": ERROR" in line:
-                    try:
-                        error_message = line.split(": ERROR - ")[1]
-                    except:
-                        error_message = "Unknown error"
-                    all_results.append({
-                        "input": str(test_case["input"]),
-                        "output": None,
-                        "expected_output": str(test_case["expected_output"]),
-                        "passed": False,
-                        "error": error_message
-                    })
-                    if is_submission:
-                        break
+    if result.stderr and result.returncode != 0:
+        return [{"input": None, "output": None, "expected_output": None, "passed": False, "error": result.stderr}]
     
-    finally:
-        try:
-            os.unlink(tmp_file_name)
-        except:
-            pass
+    all_results = limits.check(results_from_frames(result.frames, challenge['tests']))
     
     if is_submission:
-        # Return only up to first failed test
-        for i, result in enumerate(all_results):
-            if not result["passed"]:
-                return all_results[:i+1]
-    
-    return all_results
\ No newline at end of file
+        return stop_at_first_failure(all_results)
+    return all_results
@@ -0,0 +1,192 @@
+import asyncio
+import collections
+import contextlib
+import contextvars
+import heapq
+import itertools
+import os
+import pathlib
+import time
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+from .config import available_cores, get_setting
+
+# Every compile and every program run goes through here, so however many editors (or web
+# sessions) are busy at once, the box only ever runs a bounded number of compilers and
+# solutions. There are two slot pools, "compile" and "run", with their own budgets.
+# Waiters are served by priority: an interactive Run goes ahead of background work like CDS
+# training or a complexity estimate, and equal priorities go first come, first served.
+#
+# textual-serve starts a process per web session, so on top of the in-process queue every
+# slot is also a lock file under ~/.nyxbox/slots that's flock()ed while in use. That's what
+# makes the budget machine-wide, and the OS drops the lock of a session that dies. Priorities
+# only order waiters within one process.
+SLOTS_DIR = pathlib.Path.home() / ".nyxbox" / "slots"
+KINDS = ("compile", "run")
+
+INTERACTIVE = 0
+BACKGROUND = 10
+
+# Priority for slots taken by the current task (and tasks it starts), see `priority`
+PRIORITY = contextvars.ContextVar("nyxbox_priority", default=INTERACTIVE)
+
+# How many recent waits the latency stats cover
+LATENCY_WINDOW = 200
+_SHARED_POLL_MAX = 0.1
+
+
+@contextlib.contextmanager
+def priority(level):
+    """Run the block (and everything it starts) with slots taken at `level`."""
+    token = PRIORITY.set(level)
+    try:
+        yield
+    finally:
+        PRIORITY.reset(token)
+
+
+def slot_capacity(kind) -> int:
+    """Size of a pool from the `compile_slots`/`run_slots` settings, 0 means pick for this box."""
+    configured = int(get_setting(f"{kind}_slots"))
+    if configured > 0:
+        return configured
+    cores = available_cores()
+    # Compilers are memory hungry, half the cores for them still leaves the rest for runs
+    return max(1, cores // 2) if kind == "compile" else cores
+
+
+class _SharedSlots:
+    """Machine-wide tokens for one pool, one lock file per slot."""
+    def __init__(self, kind, capacity):
+        self.dir = SLOTS_DIR / kind
+        self.paths = [self.dir / f"{i}.lock" for i in range(capacity)]
+
+    async def acquire(self) -> int:
+        self.dir.mkdir(parents=True, exist_ok=True)
+        delay = 0.005
+        while True:
+            for path in self.paths:
+                fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    return fd
+                except BlockingIOError:
+                    os.close(fd)
+            # Another process holds them all, there's nothing to wait on but time
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, _SHARED_POLL_MAX)
+
+    def release(self, fd):
+        try:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+
+class SlotPool:
+    """A bounded number of slots of one kind with a priority queue in front of it."""
+    def __init__(self, kind, capacity, shared=True):
+        self.kind = kind
+        self.capacity = capacity
+        self.busy = 0
+        self.completed = 0
+        self.waits = collections.deque(maxlen=LATENCY_WINDOW)
+        self._waiters = []  # heap of (priority, seq, future)
+        self._seq = itertools.count()
+        self._shared = _SharedSlots(kind, capacity) if shared and fcntl is not None else None
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for _, _, future in self._waiters if not future.done())
+
+    async def acquire(self, level=INTERACTIVE):
+        """Wait for a slot, returns the token to give back to release()."""
+        start = time.monotonic()
+        if self.busy < self.capacity and not self.queued:
+            self.busy += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (level, next(self._seq), future))
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    # Got handed the slot right as we were cancelled, pass it on
+                    self._release_local()
+                raise
+        token = None
+        if self._shared is not None:
+            try:
+                token = await self._shared.acquire()
+            except BaseException:
+                self._release_local()
+                raise
+        self.waits.append(time.monotonic() - start)
+        return token
+
+    def release(self, token):
+        if token is not None:
+            self._shared.release(token)
+        self.completed += 1
+        self._release_local()
+
+    def _release_local(self):
+        # The slot goes straight to the best waiter, so busy only drops when nobody wants it
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.busy -= 1
+
+    def stats(self) -> dict:
+        waits = sorted(self.waits)
+        return {
+            "capacity": self.capacity,
+            "busy": self.busy,
+            "queued": self.queued,
+            "completed": self.completed,
+            "wait_ms_mean": sum(waits) / len(waits) * 1000 if waits else 0.0,
+            "wait_ms_p95": waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000 if waits else 0.0,
+        }
+
+
+class Scheduler:
+    """The compile and run pools for one event loop."""
+    def __init__(self, shared=True):
+        self.pools = {kind: SlotPool(kind, slot_capacity(kind), shared) for kind in KINDS}
+
+    @contextlib.asynccontextmanager
+    async def slot(self, kind):
+        """Hold a `kind` slot for the block, queued at the current PRIORITY."""
+        pool = self.pools[kind]
+        token = await pool.acquire(PRIORITY.get())
+        try:
+            yield
+        finally:
+            pool.release(token)
+
+    def stats(self) -> dict:
+        """Per pool: capacity, busy, queued (queue depth), completed and recent wait latency."""
+        return {kind: pool.stats() for kind, pool in self.pools.items()}
+
+
+_scheduler = None
+_scheduler_loop = None
+
+def get_scheduler() -> Scheduler:
+    """Shared scheduler for the running event loop."""
+    global _scheduler, _scheduler_loop
+    loop = asyncio.get_running_loop()
+    if _scheduler is None or _scheduler_loop is not loop:
+        # Futures can't cross event loops, a new loop gets a fresh queue
+        _scheduler = Scheduler()
+        _scheduler_loop = loop
+    return _scheduler
+
+
+def slot(kind):
+    """`async with slot("run"):` around a compile or a program run."""
+    return get_scheduler().slot(kind)
@@ -0,0 +1,121 @@
+import asyncio
+from .config import available_cores, get_setting
+from .limits import TLE_EXIT_CODE
+from .process import ProcessResult
+from .protocol import crash_message
+
+# Harnesses only run the tests listed here (indices into the tests they were given), as
+# comma separated inclusive ranges like "0-4,7". Unset means run everything.
+SELECTION_ENV = "NYXBOX_TESTS"
+# Set (to anything) on submissions: harnesses stop at the first test that doesn't pass and say
+# so with a {"stopped": index} frame (see protocol.py)
+FAIL_FAST_ENV = "NYXBOX_FAIL_FAST"
+
+
+def encode_selection(indices) -> str:
+    ranges = []
+    for index in sorted(indices):
+        if ranges and ranges[-1][1] == index - 1:
+            ranges[-1][1] = index
+        else:
+            ranges.append([index, index])
+    return ",".join(str(a) if a == b else f"{a}-{b}" for a, b in ranges)
+
+
+def shard_count(test_count) -> int:
+    """How many shards to split test_count tests into, from the `shards` setting."""
+    shards = get_setting("shards") or available_cores()
+    return max(1, min(int(shards), test_count))
+
+
+def split_shards(indices, shards) -> list:
+    """Split indices into `shards` contiguous chunks, so merging back keeps the original order."""
+    indices = list(indices)
+    size, extra = divmod(len(indices), shards)
+    chunks = []
+    start = 0
+    for shard in range(shards):
+        end = start + size + (1 if shard < extra else 0)
+        if end > start:
+            chunks.append(indices[start:end])
+        start = end
+    return chunks
+
+
+def merge_results(results) -> ProcessResult:
+    """
+    Stitch per shard results back together, shards are in test order already. Shards that
+    fail the same way (a solution that doesn't even load) say so once.
+    """
+    merged = ProcessResult(stdout="", stderr="", returncode=0)
+    errors = []
+    for result in results:
+        merged.frames.extend(result.frames)
+        merged.stdout += result.stdout
+        if result.stderr and result.stderr not in errors:
+            errors.append(result.stderr)
+        merged.timed_out = merged.timed_out or result.timed_out
+        merged.truncated = merged.truncated or result.truncated
+        if not merged.returncode and result.returncode:
+            merged.returncode = result.returncode
+    merged.stderr = "\n".join(errors)
+    return merged
+
+
+async def run_resuming(chunk, run_shard, on_frame=None, fail_fast=False) -> ProcessResult:
+    """
+    Run one shard, and whenever a test over its time limit, one printing past the output
+    cap or one crashing the harness (killed by a signal) took the harness down, report it as
+    such and start a fresh harness for the tests after it (unless `fail_fast`, then that's
+    where the shard stops). Harnesses run their selection in order, so when one was killed
+    without saying, the first unreported test is the culprit. on_frame also hears about
+    those verdicts.
+    """
+    results = []
+    remaining = list(chunk)
+    extra_env = {FAIL_FAST_ENV: "1"} if fail_fast else {}
+    while remaining:
+        result = await run_shard({SELECTION_ENV: encode_selection(remaining), **extra_env})
+        results.append(result)
+        killed = result.timed_out or result.truncated
+        crashed = not killed and result.returncode is not None and result.returncode < 0
+        if not killed and not crashed and result.returncode != TLE_EXIT_CODE:
+            break
+        reported = [frame["test"] for frame in result.frames if "test" in frame]
+        seen = set(reported)
+        remaining = [index for index in remaining if index not in seen]
+        frame = None
+        if killed and remaining:
+            frame = {"test": remaining.pop(0), "status": "ole" if result.truncated else "tle"}
+        elif crashed and remaining:
+            frame = {"test": remaining.pop(0), "status": "error", "error": crash_message(result.returncode, result.stderr)}
+            result.stderr = ""
+        if frame is not None:
+            result.frames.append(frame)
+            reported.append(frame["test"])
+            if on_frame is not None:
+                on_frame(frame)
+        result.timed_out = False
+        result.returncode = 0
+        if fail_fast:
+            # The harness was killed before it could say it stopped
+            if reported:
+                result.frames.append({"stopped": reported[-1]})
+            break
+    return merge_results(results)
+
+
+async def run_sharded(indices, run_shard, shards=None, on_frame=None, fail_fast=False) -> ProcessResult:
+    """
+    Run the tests at `indices` split across processes and merge the verdicts.
+    run_shard(env) gets the extra env vars for its shard and returns a ProcessResult, it should
+    pass on_frame on to the process so frames are heard as they arrive. With `fail_fast` every
+    shard stops at its first test that doesn't pass (see FAIL_FAST_ENV), shards run side by
+    side so the others still get to theirs.
+    """
+    indices = list(indices)
+    if not indices:
+        return await run_shard({SELECTION_ENV: ""})
+    chunks = split_shards(indices, shards or shard_count(len(indices)))
+    results = await asyncio.gather(*(run_resuming(chunk, run_shard, on_frame, fail_fast) for chunk in chunks))
+    return merge_results(results)
@@ -0,0 +1,161 @@
+import functools
+
+# A challenge's function signature, in types every language renders its own way (see
+# cpp_runner.cpp_type, java_runner.java_type). A signature is
+# {"params": [type, ...], "returns": type}, with types written like Python's:
+# "int", "float", "bool", "str", "none", "list[int]", "dict[str, list[float]]", and "mixed"
+# for values that don't agree on a type. A challenge can declare one under "signature",
+# otherwise it's inferred from the tests, once per test list.
+NONE = "none"
+BOOL = "bool"
+INT = "int"
+FLOAT = "float"
+STR = "str"
+MIXED = "mixed"
+SCALARS = {NONE, BOOL, INT, FLOAT, STR, MIXED}
+# Spellings a hand written signature might use
+ALIASES = {"string": STR, "double": FLOAT, "boolean": BOOL, "integer": INT, "null": NONE}
+
+# Element type of an empty container, until another value says what it holds
+_UNKNOWN = None
+_signatures = {}
+
+
+def _merge(a, b):
+    if a == b or b is _UNKNOWN:
+        return a
+    if a is _UNKNOWN:
+        return b
+    # A None here and there (a missing answer) doesn't decide the type, the typed harnesses
+    # read it as that type's null or empty value
+    if a == NONE:
+        return b
+    if b == NONE:
+        return a
+    if {a, b} == {INT, FLOAT}:
+        return FLOAT
+    if isinstance(a, tuple) and isinstance(b, tuple) and a[0] == b[0]:
+        return (a[0], *(_merge(x, y) for x, y in zip(a[1:], b[1:])))
+    return MIXED
+
+
+def _type_of(value):
+    if value is None:
+        return NONE
+    if isinstance(value, bool):
+        return BOOL
+    if isinstance(value, int):
+        return INT
+    if isinstance(value, float):
+        return FLOAT
+    if isinstance(value, str):
+        return STR
+    if isinstance(value, list):
+        element = _UNKNOWN
+        for item in value:
+            element = _merge(element, _type_of(item))
+            if element == MIXED:
+                break
+        return ("list", element)
+    if isinstance(value, dict):
+        key = val = _UNKNOWN
+        for k, v in value.items():
+            key, val = _merge(key, _type_of(k)), _merge(val, _type_of(v))
+        return ("dict", key, val)
+    return MIXED
+
+
+def _name(parsed, default=INT) -> str:
+    # Empty containers default to list[int] and dict[str, int]
+    if parsed is _UNKNOWN:
+        return default
+    if isinstance(parsed, str):
+        return parsed
+    if parsed[0] == "list":
+        return f"list[{_name(parsed[1])}]"
+    return f"dict[{_name(parsed[1], STR)}, {_name(parsed[2])}]"
+
+
+def type_of(value) -> str:
+    """Type name of one value, e.g. "list[int]"."""
+    return _name(_type_of(value))
+
+
+def _split_args(inner) -> list:
+    args, depth, start = [], 0, 0
+    for i, char in enumerate(inner):
+        if char == "[":
+            depth += 1
+        elif char == "]":
+            depth -= 1
+        elif char == "," and depth == 0:
+            args.append(inner[start:i])
+            start = i + 1
+    args.append(inner[start:])
+    return args
+
+
+@functools.lru_cache(maxsize=256)
+def parse_type(name):
+    """
+    A type name as nested tuples: a scalar name, ("list", element) or ("dict", key, value).
+    Anything unrecognized parses as MIXED.
+    """
+    name = name.strip()
+    name = ALIASES.get(name, name)
+    if name.endswith("]"):
+        head, _, inner = name[:-1].partition("[")
+        args = [parse_type(arg) for arg in _split_args(inner)]
+        if head == "list" and len(args) == 1:
+            return ("list", args[0])
+        if head == "dict" and len(args) == 2:
+            return ("dict", args[0], args[1])
+        return MIXED
+    return name if name in SCALARS else MIXED
+
+
+def infer_signature(tests) -> dict:
+    """The signature every test in `tests` fits, merging what each one's values say."""
+    params, returns = [], _UNKNOWN
+    for test in tests:
+        inputs = test.get("input", [])
+        for i, value in enumerate(inputs):
+            if i < len(params):
+                params[i] = _merge(params[i], _type_of(value))
+            else:
+                params.append(_type_of(value))
+        returns = _merge(returns, _type_of(test.get("expected_output")))
+    return {"params": [_name(param) for param in params], "returns": _name(returns, NONE)}
+
+
+def challenge_signature(challenge) -> dict:
+    """
+    The challenge's signature: the declared one, or inferred from its tests. Inferring looks at
+    every test value, so it's remembered per test list (same trick as verdicts.tests_digest).
+    """
+    declared = challenge.get("signature")
+    if declared:
+        return declared
+    tests = challenge.get("tests", [])
+    cached = _signatures.get(id(tests))
+    if cached is not None and cached[0] is tests:
+        return cached[1]
+    signature = infer_signature(tests)
+    if len(_signatures) >= 32:
+        _signatures.clear()
+    _signatures[id(tests)] = (tests, signature)
+    return signature
+
+
+def harness_shape(test_cases, is_submission, signature=None) -> tuple:
+    """
+    What a generated harness depends on besides the function's name, as a hashable tuple for
+    the generators to cache on: the signature's types, the number of tests and the indices of
+    the visible ones (None when it runs them all).
+    """
+    if signature is None:
+        signature = challenge_signature({"tests": test_cases})
+    visible = None
+    if not is_submission and any(test.get("hidden", False) for test in test_cases):
+        visible = tuple(i for i, test in enumerate(test_cases) if not test.get("hidden", False))
+    return tuple(signature["params"]), signature["returns"], len(test_cases), visible
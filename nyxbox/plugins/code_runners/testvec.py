@@ -0,0 +1,97 @@
+import hashlib
+import json
+import os
+import pathlib
+import struct
+import tempfile
+
+# Test data goes to the harnesses as a compact binary file instead of being baked into their
+# source, so big inputs cost I/O rather than compile time (and stay clear of Java's 64 KB
+# method limit). The file is written once per challenge and its path handed over in this env var.
+VECTORS_ENV = "NYXBOX_VECTORS"
+VECTOR_DIR = pathlib.Path.home() / ".nyxbox" / "test_vectors"
+
+# Layout, all integers big-endian:
+#   b"NYXV", u32 version, u32 test count, then one u32 absolute offset per test
+#   test:  u32 input count, the inputs, then the expected output
+#   value: one tag byte followed by
+#     N  null               B  u8 bool            I  i64
+#     G  u32 length + decimal digits, for ints that don't fit in 64 bits
+#     R  f64                S  u32 length + UTF-8
+#     L  u32 count + values M  u32 count + key, value pairs
+MAGIC = b"NYXV"
+VERSION = 1
+
+_I64 = struct.Struct(">q")
+_U32 = struct.Struct(">I")
+_F64 = struct.Struct(">d")
+
+_written = {}
+
+
+def encode_value(value, out: bytearray):
+    if value is None:
+        out += b"N"
+    elif isinstance(value, bool):
+        out += b"B" + (b"\x01" if value else b"\x00")
+    elif isinstance(value, int):
+        if -2**63 <= value < 2**63:
+            out += b"I" + _I64.pack(value)
+        else:
+            digits = str(value).encode("ascii")
+            out += b"G" + _U32.pack(len(digits)) + digits
+    elif isinstance(value, float):
+        out += b"R" + _F64.pack(value)
+    elif isinstance(value, str):
+        data = value.encode("utf-8")
+        out += b"S" + _U32.pack(len(data)) + data
+    elif isinstance(value, (list, tuple)):
+        out += b"L" + _U32.pack(len(value))
+        for item in value:
+            encode_value(item, out)
+    elif isinstance(value, dict):
+        out += b"M" + _U32.pack(len(value))
+        for key, item in value.items():
+            encode_value(key, out)
+            encode_value(item, out)
+    else:
+        raise TypeError(f"Can't encode {type(value).__name__} in a test vector")
+
+
+def encode_tests(tests) -> bytes:
+    """Encode a challenge's test list, indices in the file match indices in the list."""
+    body = bytearray()
+    offsets = []
+    base = len(MAGIC) + 8 + 4 * len(tests)
+    for test in tests:
+        offsets.append(base + len(body))
+        inputs = test.get("input", [])
+        body += _U32.pack(len(inputs))
+        for value in inputs:
+            encode_value(value, body)
+        encode_value(test.get("expected_output"), body)
+    header = MAGIC + _U32.pack(VERSION) + _U32.pack(len(tests))
+    return header + b"".join(_U32.pack(offset) for offset in offsets) + bytes(body)
+
+
+def vector_file(tests) -> str:
+    """
+    Path of the encoded test file for this test list, written on first use. Files are
+    named by content, so the same challenge always maps to the same file.
+    """
+    cached = _written.get(id(tests))
+    if cached is not None and cached[0] is tests and os.path.exists(cached[1]):
+        return cached[1]
+    key = hashlib.sha256(json.dumps(tests, sort_keys=True).encode("utf-8")).hexdigest()
+    path = VECTOR_DIR / f"{key}.bin"
+    if not path.exists():
+        VECTOR_DIR.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=VECTOR_DIR, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(encode_tests(tests))
+        os.replace(tmp_path, path)
+    # Holding on to the list keeps its id from being reused by another one
+    if len(_written) >= 32:
+        _written.clear()
+    _written[id(tests)] = (tests, str(path))
+    return str(path)
@@ -0,0 +1,183 @@
+import asyncio
+import json
+import os
+import pathlib
+import platform
+import shutil
+import sys
+import tempfile
+
+# Everything the runners can compile or run with (C++ compilers, JDKs, node, python), probed
+# once at app start in parallel. Probe results are kept in ~/.nyxbox/toolchains.json keyed by
+# the binary's real path and only redone when its mtime changes, so after the first start
+# opening the compile popup doesn't spawn anything.
+TOOLCHAINS_PATH = pathlib.Path.home() / ".nyxbox" / "toolchains.json"
+_FORMAT_VERSION = 1
+
+# In the order the C++ runner picks them
+CPP_COMPILERS = ("g++", "clang++")
+CPP_STANDARDS = ("c++23", "c++20", "c++17", "c++14", "c++11")
+PYTHONS = ("python3", "python")
+PROBE_TIMEOUT = 10.0
+
+_task = None
+
+
+def _jdk_dirs() -> list:
+    system = platform.system()
+    if system == "Windows":
+        bases = [r"C:\Program Files\Java", r"C:\Program Files (x86)\Java"]
+        home = ""
+    elif system == "Darwin":
+        bases = ["/Library/Java/JavaVirtualMachines/"]
+        home = os.path.join("Contents", "Home")
+    else:
+        bases = ["/usr/lib/jvm"]
+        home = ""
+    dirs = []
+    for base in bases:
+        try:
+            subs = sorted(os.listdir(base))
+        except OSError:
+            continue
+        dirs.extend(os.path.join(base, sub, home) if home else os.path.join(base, sub) for sub in subs)
+    return dirs
+
+
+async def _output(argv, stdin_data=b"") -> tuple:
+    """(returncode, stdout + stderr) of a short probe command, returncode is None if it hung."""
+    process = await asyncio.create_subprocess_exec(
+        *argv, stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT,
+    )
+    try:
+        output, _ = await asyncio.wait_for(process.communicate(stdin_data), timeout=PROBE_TIMEOUT)
+    except asyncio.TimeoutError:
+        process.kill()
+        return None, ""
+    return process.returncode, output.decode("utf-8", errors="replace").strip()
+
+
+async def _probe_cpp(path) -> dict:
+    _, banner = await _output([path, "--version"])
+
+    async def supports(standard):
+        returncode, _ = await _output([path, f"-std={standard}", "-x", "c++", "-fsyntax-only", "-"])
+        return returncode == 0
+
+    supported = await asyncio.gather(*(supports(standard) for standard in CPP_STANDARDS))
+    return {
+        "version": banner.splitlines()[0] if banner else "",
+        "standards": [standard for standard, ok in zip(CPP_STANDARDS, supported) if ok],
+    }
+
+
+async def _probe_jdk(javac) -> dict:
+    _, output = await _output([javac, "-version"])
+    # "javac 17.0.2", or "javac 1.8.0_292" for Java 8 and older
+    lines = [line for line in output.splitlines() if line.startswith("javac")]
+    if not lines:
+        return {"version": None}
+    version_str = lines[0].split()[1]
+    if version_str.startswith("1."):
+        return {"version": version_str.split(".")[1]}
+    return {"version": version_str.split(".")[0].split("-")[0]}
+
+
+async def _probe_version(path) -> dict:
+    _, output = await _output([path, "--version"])
+    return {"version": output.splitlines()[0] if output else ""}
+
+
+def _load() -> dict:
+    try:
+        with open(TOOLCHAINS_PATH, "r") as f:
+            data = json.load(f)
+        if isinstance(data, dict) and data.get("format") == _FORMAT_VERSION:
+            return data.get("probes", {})
+    except (OSError, json.JSONDecodeError):
+        pass
+    return {}
+
+
+def _save(probes):
+    try:
+        TOOLCHAINS_PATH.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=TOOLCHAINS_PATH.parent, prefix=".toolchains-")
+        with os.fdopen(fd, "w") as f:
+            json.dump({"format": _FORMAT_VERSION, "probes": probes}, f, indent=1)
+        os.replace(tmp_path, TOOLCHAINS_PATH)
+    except OSError:
+        pass
+
+
+async def discover() -> dict:
+    """
+    Find and probe every toolchain. Returns
+    {"cpp": [{"name", "path", "version", "standards"}, ...] in CPP_COMPILERS order,
+     "java": {major version: jdk path}, "node": {"path", "version"} or None,
+     "python": [{"path", "version"}, ...]}.
+    """
+    cached = _load()
+    probes = {}
+
+    async def probe(kind, path, prober):
+        real = os.path.realpath(path)
+        try:
+            mtime = os.stat(real).st_mtime_ns
+        except OSError:
+            return None
+        key = f"{kind}:{real}"
+        entry = cached.get(key)
+        if entry is None or entry.get("mtime") != mtime:
+            try:
+                entry = {"mtime": mtime, "info": await prober(real)}
+            except OSError:
+                return None
+        probes[key] = entry
+        return entry["info"]
+
+    cpp_paths = [(name, shutil.which(name)) for name in CPP_COMPILERS]
+    cpp_paths = [(name, path) for name, path in cpp_paths if path]
+    javac_name = "javac.exe" if platform.system() == "Windows" else "javac"
+    jdks = [d for d in _jdk_dirs() if os.path.exists(os.path.join(d, "bin", javac_name))]
+    node = shutil.which("node")
+    pythons = list(dict.fromkeys(
+        os.path.realpath(path) for path in [sys.executable, *map(shutil.which, PYTHONS)] if path
+    ))
+
+    cpp_infos, jdk_infos, node_info, python_infos = await asyncio.gather(
+        asyncio.gather(*(probe("cpp", path, _probe_cpp) for _, path in cpp_paths)),
+        asyncio.gather(*(probe("jdk", os.path.join(d, "bin", javac_name), _probe_jdk) for d in jdks)),
+        probe("node", node, _probe_version) if node else asyncio.sleep(0),
+        asyncio.gather(*(probe("python", path, _probe_version) for path in pythons)),
+    )
+
+    if probes != cached:
+        _save(probes)
+    java = {}
+    for jdk_path, info in zip(jdks, jdk_infos):
+        if info and info.get("version"):
+            java[info["version"]] = jdk_path
+    return {
+        "cpp": [
+            {"name": name, "path": path, **info}
+            for (name, path), info in zip(cpp_paths, cpp_infos) if info
+        ],
+        "java": java,
+        "node": {"path": node, **node_info} if node_info else None,
+        "python": [{"path": path, **info} for path, info in zip(pythons, python_infos) if info],
+    }
+
+
+async def get_toolchains(refresh=False) -> dict:
+    """
+    The discovered toolchains, probing on the first call (the app starts that right away)
+    and sharing the result with every later one. `refresh` probes again, e.g. after an install.
+    """
+    global _task
+    loop = asyncio.get_running_loop()
+    if refresh or _task is None or _task.get_loop() is not loop or (_task.done() and (_task.cancelled() or _task.exception())):
+        _task = loop.create_task(discover())
+    # Shielded so a cancelled caller (a closed popup) doesn't cancel discovery for everyone else
+    return await asyncio.shield(_task)
@@ -0,0 +1,161 @@
+import collections
+import json
+import os
+import pathlib
+import tempfile
+from importlib.metadata import version, PackageNotFoundError
+from .build_cache import artifact_key
+from .config import get_setting
+from .protocol import LIMIT_MESSAGES, is_crash
+from .signature import challenge_signature
+
+# Results of earlier runs, so hitting Run (or Submit) again on unchanged code doesn't spawn
+# anything. Keyed by language, code, the challenge's tests and limits, the toolchain, the
+# runners' own sources and whether it was a submission (or a guest's). The newest
+# `verdict_cache_entries` live in memory, and with `verdict_cache_persist` also one JSON file
+# each under ~/.nyxbox/verdicts.
+VERDICTS_DIR = pathlib.Path.home() / ".nyxbox" / "verdicts"
+_FORMAT_VERSION = 1
+# Files in this package a verdict can depend on: the runners, their harness templates and
+# the static harnesses
+_HARNESS_SUFFIXES = (".py", ".js", ".java")
+
+try:
+    _NYXBOX_VERSION = version("nyxbox")
+except PackageNotFoundError:
+    _NYXBOX_VERSION = "dev"
+
+
+def _harness_digest() -> str:
+    # A changed harness can judge the same code differently. Source checkouts are all version
+    # "dev", so the sources themselves go into the key
+    parts = []
+    for path in sorted(pathlib.Path(__file__).parent.iterdir()):
+        if path.suffix in _HARNESS_SUFFIXES:
+            try:
+                parts += [path.name, path.read_bytes()]
+            except OSError:
+                pass
+    return artifact_key(*parts)
+
+
+_HARNESS_DIGEST = _harness_digest()
+
+_tests_digests = {}
+
+
+def tests_digest(tests) -> str:
+    # Generated stress tests are big, hash each list once (same trick as testvec.vector_file)
+    cached = _tests_digests.get(id(tests))
+    if cached is not None and cached[0] is tests:
+        return cached[1]
+    digest = artifact_key(json.dumps(tests, sort_keys=True))
+    if len(_tests_digests) >= 32:
+        _tests_digests.clear()
+    _tests_digests[id(tests)] = (tests, digest)
+    return digest
+
+
+def verdict_key(language, code, challenge, toolchain, is_submission, is_guest=False) -> str:
+    # Guest runs get extra checks (import filtering), they're kept apart
+    return artifact_key(
+        _FORMAT_VERSION, _NYXBOX_VERSION, _HARNESS_DIGEST, language, code, challenge.get("function_name"),
+        tests_digest(challenge.get("tests", [])), challenge.get("time_limit_ms"),
+        challenge.get("memory_limit_mb"), challenge_signature(challenge), toolchain, "submit" if is_submission else "run", "guest" if is_guest else "user",
+    )
+
+
+def cacheable(results) -> bool:
+    """
+    Limit verdicts depend on how busy the machine was and crashes on the machine's state
+    (a worker that went away, a harness killed from outside), those runs are worth repeating.
+    """
+    return bool(results) and not any(
+        result.get("error") in LIMIT_MESSAGES.values() or is_crash(result) for result in results
+    )
+
+
+class VerdictCache:
+    """LRU of result lists in memory, optionally backed by files on disk."""
+    def __init__(self, max_entries, persist):
+        self.max_entries = max_entries
+        self.persist = persist
+        self._entries = collections.OrderedDict()
+
+    def get(self, key):
+        results = self._entries.get(key)
+        if results is not None:
+            self._entries.move_to_end(key)
+        elif self.persist:
+            results = self._load(key)
+            if results is not None:
+                self._remember(key, results)
+        # Copies, callers are free to annotate what they get
+        return None if results is None else [dict(result) for result in results]
+
+    def put(self, key, results):
+        results = [dict(result) for result in results]
+        self._remember(key, results)
+        if self.persist:
+            self._save(key, results)
+
+    def _remember(self, key, results):
+        self._entries[key] = results
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _load(self, key):
+        path = VERDICTS_DIR / f"{key}.json"
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+            if isinstance(data, dict) and data.get("format") == _FORMAT_VERSION:
+                # Touched so _evict() sees it as recent
+                os.utime(path)
+                return data["results"]
+        except (OSError, json.JSONDecodeError, KeyError):
+            pass
+        return None
+
+    def _save(self, key, results):
+        try:
+            VERDICTS_DIR.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=VERDICTS_DIR, suffix=".tmp")
+        except OSError:
+            return
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({"format": _FORMAT_VERSION, "results": results}, f)
+            os.replace(tmp_path, VERDICTS_DIR / f"{key}.json")
+        except (OSError, TypeError, ValueError):
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+        self._evict()
+
+    def _evict(self):
+        # Disk keeps a few times what memory does, oldest go first
+        try:
+            entries = sorted(
+                (entry.stat().st_mtime, entry.path) for entry in os.scandir(VERDICTS_DIR)
+                if entry.name.endswith(".json")
+            )
+        except OSError:
+            return
+        for _, path in entries[:max(0, len(entries) - 4 * self.max_entries)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+_cache = None
+
+def get_verdict_cache() -> VerdictCache:
+    global _cache
+    if _cache is None:
+        _cache = VerdictCache(max(1, int(get_setting("verdict_cache_entries"))), bool(get_setting("verdict_cache_persist")))
+    return _cache
@@ -0,0 +1,302 @@
+import asyncio
+import atexit
+import contextlib
+import os
+import pathlib
+import shutil
+import signal
+import tempfile
+import time
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+from .config import get_setting
+from .scheduler import slot_capacity
+
+# Scratch directories programs run in (their cwd), so whatever a solution writes lands in a
+# place that gets wiped. They live on tmpfs where there is one (/dev/shm), so a run's files
+# never hit the disk, and they're recycled: wiped when a run gives one back and handed to the
+# next one. Every process has its own root named after its pid, under a per user directory,
+# which is how the janitor tells the roots of NyxBox processes that are gone.
+# tmpfs is memory, so `workspace_quota_mb` holds for the whole workspace while a program runs
+# (see Workspace.watching), not just per file, and a tmpfs without room for every run slot's
+# quota isn't used at all.
+NYXBOX_DIR = pathlib.Path.home() / ".nyxbox"
+# How often the janitor sweeps, in seconds
+JANITOR_INTERVAL = 300.0
+# Leftovers older than this (a crashed build's temp dir, a half written cache file) get swept
+STALE_AGE = 3600.0
+# How often a workspace in use is measured against the quota, in seconds
+WATCH_INTERVAL = 0.1
+QUOTA_MESSAGE = "Workspace quota exceeded"
+# What tmpfs takes at the least for a file or directory, however small
+_PAGE = 4096
+
+_base = None
+_pool = None
+_janitor = None
+_janitor_loop = None
+
+
+def _base_candidates() -> list:
+    shm = "/dev/shm"
+    bases = [shm] if os.path.isdir(shm) and os.access(shm, os.W_OK) else []
+    bases.append(tempfile.gettempdir())
+    user = os.getuid() if hasattr(os, "getuid") else os.environ.get("USERNAME", "user")
+    return [pathlib.Path(base) / f"nyxbox-{user}" for base in bases]
+
+
+def workspace_base() -> pathlib.Path:
+    """Where this process's workspaces go, tmpfs if it has room for every run slot's quota."""
+    global _base
+    if _base is None:
+        candidates = _base_candidates()
+        _base = candidates[-1]
+        if len(candidates) > 1:
+            try:
+                stats = os.statvfs(candidates[0].parent)
+                if stats.f_bavail * stats.f_frsize >= quota_bytes() * slot_capacity("run"):
+                    _base = candidates[0]
+            except OSError:
+                pass
+    return _base
+
+
+def quota_bytes() -> int:
+    return int(get_setting("workspace_quota_mb")) * 1024 * 1024
+
+
+def _size(path) -> int:
+    """Space the files and directories under `path` take up, at least a page each."""
+    total = 0
+    for root, dirs, files in os.walk(path):
+        for name in dirs + files:
+            try:
+                total += max(os.lstat(os.path.join(root, name)).st_blocks * 512, _PAGE)
+            except (OSError, AttributeError):
+                total += _PAGE
+    return total
+
+
+def _kill_running_in(path):
+    """SIGKILL every process working in `path`, whatever started it (Linux only, through /proc)."""
+    path = os.path.realpath(path)
+    try:
+        pids = [int(name) for name in os.listdir("/proc") if name.isdigit()]
+    except OSError:
+        return
+    for pid in pids:
+        try:
+            cwd = os.readlink(f"/proc/{pid}/cwd")
+        except OSError:
+            continue
+        if pid != os.getpid() and (cwd == path or cwd.startswith(path + os.sep)):
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except OSError:
+                pass
+
+
+def _is_empty(path) -> bool:
+    try:
+        with os.scandir(path) as entries:
+            return next(entries, None) is None
+    except OSError:
+        return False
+
+
+def _wipe_within_quota(path) -> bool:
+    """Empty a used workspace for the next run, False if it's better dropped altogether."""
+    try:
+        # Over the quota it isn't worth wiping file by file
+        if _size(path) > quota_bytes():
+            return False
+        for entry in os.scandir(path):
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path)
+            else:
+                os.unlink(entry.path)
+        return True
+    except OSError:
+        return False
+
+
+class Workspace:
+    """One run's scratch directory, see workspace(). over_quota is set once watching() killed its run."""
+    def __init__(self, path):
+        self.path = path
+        self.over_quota = False
+
+    @contextlib.asynccontextmanager
+    async def watching(self):
+        """
+        `async with ws.watching():` measures the workspace every WATCH_INTERVAL meanwhile, and
+        once it's past `workspace_quota_mb` kills everything running in it and sets over_quota.
+        """
+        task = asyncio.create_task(self._watch())
+        try:
+            yield self
+        finally:
+            task.cancel()
+
+    async def _watch(self):
+        limit = quota_bytes()
+        while True:
+            await asyncio.sleep(WATCH_INTERVAL)
+            if await asyncio.to_thread(_size, self.path) > limit:
+                self.over_quota = True
+                await asyncio.to_thread(_kill_running_in, self.path)
+                return
+
+    def checked(self, result):
+        """`result` (a ProcessResult) with the reason in its stderr if watching() killed the run."""
+        if self.over_quota:
+            message = f"{QUOTA_MESSAGE} ({get_setting('workspace_quota_mb')} MB)"
+            result.stderr = f"{message}\n{result.stderr}" if result.stderr else message
+        return result
+
+    def wipe(self) -> bool:
+        """Empty it for the next run in place, False if it's better dropped (see _wipe_within_quota)."""
+        return _is_empty(self.path) or _wipe_within_quota(self.path)
+
+    def preexec(self, then=None):
+        """
+        preexec_fn capping every file the program writes at `workspace_quota_mb` (a program
+        writing past it gets SIGXFSZ), then running `then` (e.g. Limits.preexec()).
+        """
+        if resource is None:
+            return then
+        limit = quota_bytes()
+
+        def apply():
+            resource.setrlimit(resource.RLIMIT_FSIZE, (limit, limit))
+            if then is not None:
+                then()
+        return apply
+
+
+class WorkspacePool:
+    """Pre-created workspace directories under `root`, keeps up to `size` of them around."""
+    def __init__(self, root, size):
+        self.root = pathlib.Path(root)
+        self.size = size
+        self._free = []
+
+    def _create(self) -> str:
+        self.root.mkdir(parents=True, exist_ok=True)
+        return tempfile.mkdtemp(prefix="ws-", dir=self.root)
+
+    def fill(self):
+        while len(self._free) < self.size:
+            self._free.append(self._create())
+
+    def acquire(self) -> Workspace:
+        while self._free:
+            path = self._free.pop()
+            if os.path.isdir(path):
+                return Workspace(path)
+        return Workspace(self._create())
+
+    async def release(self, workspace):
+        path = workspace.path
+        if len(self._free) < self.size and (_is_empty(path) or await asyncio.to_thread(_wipe_within_quota, path)):
+            self._free.append(path)
+        else:
+            await asyncio.to_thread(shutil.rmtree, path, True)
+
+    def close(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+def _alive(pid) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def sweep():
+    """
+    Remove what NyxBox left behind: workspace roots of processes that are gone, and build
+    dirs or temp files in ~/.nyxbox that are older than STALE_AGE (a crash mid-write).
+    """
+    # os.kill(pid, 0) would terminate the process on Windows
+    if os.name != "nt":
+        roots = []
+        # Other processes may have settled on the other base
+        for base in _base_candidates():
+            try:
+                roots += list(os.scandir(base))
+            except OSError:
+                pass
+        for entry in roots:
+            if entry.name.isdigit() and int(entry.name) != os.getpid() and not _alive(int(entry.name)):
+                shutil.rmtree(entry.path, ignore_errors=True)
+    now = time.time()
+    try:
+        directories = [NYXBOX_DIR, *(entry.path for entry in os.scandir(NYXBOX_DIR) if entry.is_dir())]
+    except OSError:
+        return
+    for directory in directories:
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            continue
+        for entry in entries:
+            if not (entry.name.startswith((".build-", ".toolchains-")) or entry.name.endswith(".tmp")):
+                continue
+            try:
+                if now - entry.stat(follow_symlinks=False).st_mtime < STALE_AGE:
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                else:
+                    os.unlink(entry.path)
+            except OSError:
+                pass
+
+
+async def _sweep_forever():
+    while True:
+        await asyncio.to_thread(sweep)
+        await asyncio.sleep(JANITOR_INTERVAL)
+
+
+def get_workspace_pool() -> WorkspacePool:
+    global _pool
+    if _pool is None:
+        _pool = WorkspacePool(workspace_base() / str(os.getpid()), slot_capacity("run"))
+        try:
+            _pool.fill()
+        except OSError:
+            pass # Created on demand then
+        atexit.register(_pool.close)
+    return _pool
+
+
+def _ensure_janitor():
+    global _janitor, _janitor_loop
+    loop = asyncio.get_running_loop()
+    if _janitor is None or _janitor_loop is not loop or _janitor.done():
+        _janitor = loop.create_task(_sweep_forever())
+        _janitor_loop = loop
+
+
+@contextlib.asynccontextmanager
+async def workspace():
+    """
+    `async with workspace() as ws:` a scratch directory for one run, wiped afterwards. It's
+    watched against the quota meanwhile, pass the run's result through ws.checked().
+    """
+    pool = get_workspace_pool()
+    _ensure_janitor()
+    ws = pool.acquire()
+    try:
+        async with ws.watching():
+            yield ws
+    finally:
+        await pool.release(ws)
@@ -0,0 +1,291 @@
+# Fork server ("zygote") for the python runner.
+# This file is run as a script with `python -I -S zygote.py`, NOT imported, so keep it
+# stdlib only and cheap to start. The parent talks to it over stdin/stdout using frames of
+# a 4 byte big-endian length followed by a UTF-8 JSON object.
+#
+# Request:  {"id": int, "source": str, "timeout": float, "env": {extra env vars for the child},
+#            "memory_limit_mb": int or null, an RLIMIT_AS cap for the child,
+#            "file_limit": int or null, an RLIMIT_FSIZE cap, "cwd": str or null, where the child runs,
+#            "output_limit": int, bytes of stdout + stderr kept before the child is killed,
+#            "harness_key": str or null, code run after "source" in the same namespace,
+#            "harness": str or null, that code's source. The server compiles it once and keeps it
+#            under harness_key, so it's only sent the first time}
+# Frame:    {"id": int, "frame": {...}}  forwarded live from the child's result channel (see protocol.py)
+# Response: {"id": int, "done": true, "stdout": str, "stderr": str, "returncode": int, "timed_out": bool,
+#            "truncated": bool}
+#
+# Every request gets a freshly forked child, so nothing the user code does leaks into the
+# next run, but we skip interpreter startup entirely.
+import builtins
+import json
+import os
+import resource
+import selectors
+import signal
+import struct
+import sys
+import time
+import traceback
+
+# Warm up the modules solutions usually reach for, the whole point is the child gets them for free
+import bisect, collections, functools, heapq, itertools, math, re, string  # noqa: E401,F401
+
+HEADER = struct.Struct(">I")
+READ_SIZE = 65536
+RESULT_FD = 3
+RESULT_PATH_ENV = "NYXBOX_RESULT_PATH"  # Same as protocol.RESULT_PATH_ENV, we can't import it from here
+
+
+def write_frame(fd, payload):
+    data = json.dumps(payload).encode("utf-8")
+    data = HEADER.pack(len(data)) + data
+    while data:
+        written = os.write(fd, data)
+        data = data[written:]
+
+
+def split_frames(buffer):
+    """Pop every complete frame off the front of buffer."""
+    frames = []
+    while len(buffer) >= HEADER.size:
+        (length,) = HEADER.unpack_from(buffer)
+        if len(buffer) < HEADER.size + length:
+            break
+        frames.append(json.loads(buffer[HEADER.size:HEADER.size + length].decode("utf-8", errors="replace")))
+        del buffer[:HEADER.size + length]
+    return frames
+
+
+def print_user_traceback(error):
+    """Print the traceback of an exception out of the user's code, minus our own frames above it."""
+    tb = error.__traceback__
+    while tb is not None and tb.tb_frame.f_code.co_filename != "<solution>":
+        tb = tb.tb_next
+    traceback.print_exception(type(error), error, tb)
+
+
+def run_child(source, env, memory_limit_mb, out_w, err_w, res_w, file_limit=None, cwd=None, harness=None):
+    """Runs inside the forked child, never returns. `harness` is a code object run after source."""
+    code = 1
+    try:
+        signal.set_wakeup_fd(-1)
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        os.setpgid(0, 0)  # Own group so a timeout can take out anything the code spawns
+        if memory_limit_mb:
+            limit = int(memory_limit_mb) * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        if file_limit:
+            resource.setrlimit(resource.RLIMIT_FSIZE, (int(file_limit), int(file_limit)))
+        if cwd:
+            os.chdir(cwd)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)
+        os.dup2(out_w, 1)
+        os.dup2(err_w, 2)
+        os.dup2(res_w, RESULT_FD)
+        os.closerange(RESULT_FD + 1, 65536)  # Protocol pipe + other children's pipes, user code gets none of it
+        os.environ.update(env)
+        os.environ[RESULT_PATH_ENV] = f"/dev/fd/{RESULT_FD}"
+        namespace = {"__name__": "__main__", "__builtins__": builtins}
+        try:
+            exec(compile(source, "<solution>", "exec"), namespace)
+            if harness is not None:
+                exec(harness, namespace)
+            code = 0
+        except SystemExit as e:
+            if e.code is None:
+                code = 0
+            elif isinstance(e.code, int):
+                code = e.code
+            else:
+                print(e.code, file=sys.stderr)
+                code = 1
+        except BaseException as e:
+            print_user_traceback(e)
+            code = 1
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        except Exception:
+            pass
+    finally:
+        os._exit(code)
+
+
+class Job:
+    def __init__(self, job_id, pid, out_r, err_r, res_r, timeout, output_limit):
+        self.id = job_id
+        self.pid = pid
+        self.streams = {out_r: bytearray(), err_r: bytearray(), res_r: bytearray()}
+        self.out_r = out_r
+        self.err_r = err_r
+        self.res_r = res_r
+        self.open = 3
+        self.deadline = time.monotonic() + timeout
+        self.timed_out = False
+        self.output_room = output_limit
+        self.truncated = False
+
+
+def main():
+    resp_fd = os.dup(1)
+    # Anything printed by the server itself by accident should not corrupt the protocol
+    os.dup2(os.open(os.devnull, os.O_WRONLY), 1)
+    selector = selectors.DefaultSelector()
+    selector.register(0, selectors.EVENT_READ, None)
+    # A child exiting wakes the select below, so it gets reaped without blocking on it
+    wake_r, wake_w = os.pipe()
+    os.set_blocking(wake_r, False)
+    os.set_blocking(wake_w, False)
+    signal.set_wakeup_fd(wake_w)
+    signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+    selector.register(wake_r, selectors.EVENT_READ, None)
+    jobs = {}  # pipe fd -> Job
+    running = {}  # pid -> Job, until the child is reaped, so its deadline holds even once its pipes are closed
+    harnesses = {}  # harness_key -> code object, inherited by every child
+    pending = bytearray()
+
+    def start(request):
+        harness_key = request.get("harness_key")
+        if request.get("harness") is not None:
+            harnesses[harness_key] = compile(request["harness"], "<harness>", "exec")
+        out_r, out_w = os.pipe()
+        err_r, err_w = os.pipe()
+        res_r, res_w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            run_child(request["source"], request.get("env") or {}, request.get("memory_limit_mb"), out_w, err_w, res_w,
+                      request.get("file_limit"), request.get("cwd"), harnesses.get(harness_key))
+        os.close(out_w)
+        os.close(err_w)
+        os.close(res_w)
+        job = Job(request["id"], pid, out_r, err_r, res_r, float(request.get("timeout", 3)), int(request.get("output_limit", 1 << 20)))
+        running[pid] = job
+        for fd in (out_r, err_r, res_r):
+            jobs[fd] = job
+            selector.register(fd, selectors.EVENT_READ, job)
+
+    def close_pipes(job):
+        if job.res_r in jobs:
+            # Pass on the frames the child got out before it was killed, without waiting on
+            # anything that escaped the process group and still holds the pipe
+            os.set_blocking(job.res_r, False)
+            try:
+                while True:
+                    chunk = os.read(job.res_r, READ_SIZE)
+                    if not chunk:
+                        break
+                    job.streams[job.res_r] += chunk
+            except BlockingIOError:
+                pass
+            for frame in split_frames(job.streams[job.res_r]):
+                write_frame(resp_fd, {"id": job.id, "frame": frame})
+        for fd in (job.out_r, job.err_r, job.res_r):
+            if fd in jobs:
+                selector.unregister(fd)
+                del jobs[fd]
+                os.close(fd)
+        job.open = 0
+
+    def reap(job, block=False):
+        """Answer for the job once its child has exited, False if it's still running."""
+        pid, status = os.waitpid(job.pid, 0 if block else os.WNOHANG)
+        if pid == 0:
+            return False
+        del running[job.pid]
+        write_frame(resp_fd, {
+            "id": job.id,
+            "done": True,
+            "stdout": job.streams[job.out_r].decode("utf-8", errors="replace"),
+            "stderr": job.streams[job.err_r].decode("utf-8", errors="replace"),
+            "returncode": os.waitstatus_to_exitcode(status),
+            "timed_out": job.timed_out,
+            "truncated": job.truncated,
+        })
+        return True
+
+    def kill(job):
+        job.deadline = None  # SIGCHLD says when it's gone
+        try:
+            os.killpg(job.pid, signal.SIGKILL)
+        except OSError:
+            pass
+        close_pipes(job)
+        reap(job)
+
+    while True:
+        timeout = None
+        deadlines = [job.deadline for job in running.values() if job.deadline is not None]
+        if deadlines:
+            timeout = max(0, min(deadlines) - time.monotonic())
+        for key, _ in selector.select(timeout):
+            if key.fd == wake_r:
+                try:
+                    while os.read(wake_r, READ_SIZE):
+                        pass
+                except BlockingIOError:
+                    pass
+                # Children whose pipes are all closed are only waiting on this
+                for job in [job for job in running.values() if job.open == 0]:
+                    reap(job)
+                continue
+            if key.fd == 0:
+                chunk = os.read(0, READ_SIZE)
+                if not chunk:
+                    # Parent went away, take the children with us
+                    for job in list(running.values()):
+                        job.timed_out = True
+                        try:
+                            os.killpg(job.pid, signal.SIGKILL)
+                        except OSError:
+                            pass
+                        close_pipes(job)
+                        reap(job, block=True)
+                    return
+                pending += chunk
+                while len(pending) >= HEADER.size:
+                    (length,) = HEADER.unpack_from(pending)
+                    if len(pending) < HEADER.size + length:
+                        break
+                    request = json.loads(pending[HEADER.size:HEADER.size + length])
+                    del pending[:HEADER.size + length]
+                    start(request)
+                continue
+            job = key.data
+            if jobs.get(key.fd) is not job:
+                continue  # Already finished (and the fd may have been reused) earlier in this batch
+            chunk = os.read(key.fd, READ_SIZE)
+            if chunk:
+                if key.fd == job.res_r:
+                    job.streams[key.fd] += chunk
+                    for frame in split_frames(job.streams[key.fd]):
+                        write_frame(resp_fd, {"id": job.id, "frame": frame})
+                    continue
+                # stdout/stderr, kept up to the output cap and the child killed past it
+                job.streams[key.fd] += chunk[:job.output_room]
+                job.output_room -= len(chunk)
+                if job.output_room < 0:
+                    job.output_room = 0
+                    job.truncated = True
+                    kill(job)
+                continue
+            selector.unregister(key.fd)
+            del jobs[key.fd]
+            os.close(key.fd)
+            job.open -= 1
+            if job.open == 0:
+                reap(job)
+        now = time.monotonic()
+        for job in list(running.values()):
+            if job.deadline is not None and now >= job.deadline:
+                # Its pipes may be closed already, the child is still killed
+                job.timed_out = True
+                kill(job)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,266 @@
+import math
+import random
+import string
+from .code_runners.engine import get_runner, RunnerUnavailable
+from .code_runners.protocol import TLE_MESSAGE
+from .code_runners.scheduler import priority, BACKGROUND
+from .code_runners.signature import challenge_signature
+from .utils import escape_brackets, format_ms, DAEMON_USER
+
+# "Is my solution O(n log n)?" The sample tests are far too small to tell an O(n²) solution
+# from an O(n) one, so this builds bigger and bigger inputs shaped like the challenge's first
+# test, times the user's function on each with the normal runners and fits the times against
+# the usual complexity classes.
+
+# Doubling, so a quadratic solution still gets a few sizes in before it hits the time limit.
+# 500 to about 4 million: over a narrower range log n barely changes and O(n) and O(n log n)
+# fit the same times about equally well.
+SIZES = tuple(500 * 2 ** k for k in range(14))
+# Each size runs this many times in one harness run and the fastest one counts
+REPEATS = 3
+# Per run, a size that takes longer than this ends the estimate
+TIME_LIMIT_MS = 2000
+# Need at least this many sizes to fit anything
+MIN_POINTS = 3
+PLOT_WIDTH = 30
+
+COMPLEXITY_CLASSES = (
+    ("O(1)", lambda n: 1.0),
+    ("O(log n)", lambda n: math.log2(n)),
+    ("O(n)", lambda n: float(n)),
+    ("O(n log n)", lambda n: n * math.log2(n)),
+    ("O(n²)", lambda n: float(n) ** 2),
+    ("O(n³)", lambda n: float(n) ** 3),
+)
+# Classes above are in order of growth. A faster growing class only beats a slower one if it
+# fits clearly better, its residual under 1/CLEAR_MARGIN of the other's; any class fitting
+# within that margin of the pick makes the estimate inconclusive.
+CLEAR_MARGIN = 2.0
+# A fit that rises less than this (relative) over the measured sizes is really a constant
+GROWTH_FLOOR = 0.2
+# Root mean square relative error of a good fit. Caches and allocators make big inputs slower
+# per element than small ones, a pick that misses the times by more than this didn't
+# clearly beat the slower class it replaced either (unless that one was far off, over
+# CLEAR_MARGIN² times its residual).
+FIT_TOLERANCE = 0.15
+
+
+def _example_test(challenge):
+    """First test with an expected output, the runners infer return types from it."""
+    tests = challenge.get("tests", [])
+    for test in tests:
+        if test.get("expected_output") is not None:
+            return test
+    return tests[0] if tests else None
+
+
+def _largest_number(value):
+    if isinstance(value, bool):
+        return 0
+    if isinstance(value, (int, float)):
+        return abs(value)
+    if isinstance(value, list):
+        return max((_largest_number(v) for v in value), default=0)
+    return 0
+
+
+def scale_value(value, n, rng, floor=0):
+    """
+    A value shaped like `value` but of size n, or None if it has no size (numbers, bools...).
+    Numbers start above `floor`, see scaled_input.
+    """
+    if isinstance(value, str):
+        alphabet = sorted(set(value)) or string.ascii_lowercase
+        return "".join(rng.choice(alphabet) for _ in range(n))
+    if isinstance(value, list) and value:
+        first = value[0]
+        if isinstance(first, bool):
+            return [rng.random() < 0.5 for _ in range(n)]
+        if isinstance(first, int):
+            return [rng.randint(floor + 1, floor + 2 * n) for _ in range(n)]
+        if isinstance(first, float):
+            return [rng.uniform(floor + 1, floor + 2 * n) for _ in range(n)]
+        if isinstance(first, str):
+            return [rng.choice(value) for _ in range(n)]
+    return None
+
+
+def scaled_input(example_input, n, rng):
+    """
+    The example's input with every list/string param grown to size n, None if none can be.
+    Generated numbers are all bigger than any number in the example, so a search for a
+    target (two-sum, three-sum...) never finds it early and the worst case gets timed.
+    """
+    floor = math.ceil(_largest_number(example_input))
+    scaled = [scale_value(value, n, rng, floor) for value in example_input]
+    if any(value is not None for value in scaled):
+        return [value if new is None else new for value, new in zip(example_input, scaled)]
+    # Only numbers, e.g. palindrome-number, scale their magnitude instead
+    scaled = [
+        rng.randint(n, 10 * n) if isinstance(value, int) and not isinstance(value, bool) else value
+        for value in example_input
+    ]
+    return scaled if scaled != list(example_input) else None
+
+
+def _fit(xs, times_ms):
+    """
+    Weighted least squares of time ≈ a + c·x, weighted by 1/time² so it's the relative error
+    that counts and the big sizes don't drown out the small ones. Returns (a, c, residual).
+    """
+    ts = [max(t, 1e-3) for t in times_ms]
+    ws = [1 / (t * t) for t in ts]
+    sw = sum(ws)
+    sx = sum(w * x for w, x in zip(ws, xs))
+    sxx = sum(w * x * x for w, x in zip(ws, xs))
+    st = sum(w * t for w, t in zip(ws, ts))
+    sxt = sum(w * x * t for w, x, t in zip(ws, xs, ts))
+    det = sw * sxx - sx * sx
+    if det <= 1e-12 * sw * sxx:
+        # x doesn't change (O(1)) or barely does, a constant is all there is to fit
+        a, c = st / sw, 0.0
+    else:
+        a = (sxx * st - sx * sxt) / det
+        c = (sw * sxt - sx * st) / det
+        if a < 0 or c < 0:
+            # Negative startup cost or shrinking time isn't a real fit of this class,
+            # fall back to the line through the origin
+            a, c = 0.0, sxt / sxx
+    residual = sum(w * (t - a - c * x) ** 2 for w, x, t in zip(ws, xs, ts))
+    return a, c, residual
+
+
+def fit_complexity(sizes, times_ms) -> list:
+    """Fit every complexity class to the times. Returns (name, a, c, residual), best fit first."""
+    fits = []
+    for name, f in COMPLEXITY_CLASSES:
+        a, c, residual = _fit([f(n) for n in sizes], times_ms)
+        fits.append((name, a, c, residual))
+    fits.sort(key=lambda fit: fit[3])
+    return fits
+
+
+def pick_complexity(sizes, fits) -> tuple:
+    """
+    (best, close) from fit_complexity's fits: the class to report, preferring the slower
+    growing one unless a faster one fits clearly better, and the other classes that fit about
+    as well as it does (then the estimate is inconclusive). best is None without fits.
+    """
+    if not fits:
+        return None, []
+    growth = dict(COMPLEXITY_CLASSES)
+    low, high = min(sizes), max(sizes)
+
+    def grows(name, a, c):
+        f = growth[name]
+        start = a + c * f(low)
+        return start > 0 and c * (f(high) - f(low)) > GROWTH_FLOOR * start
+
+    by_name = {name: (a, c, residual) for name, a, c, residual in fits}
+    residuals = {name: residual for name, (_, _, residual) in by_name.items()}
+    best = beaten = None
+    for name, _ in COMPLEXITY_CLASSES:
+        if best is None or residuals[name] * CLEAR_MARGIN < residuals[best]:
+            best, beaten = name, best
+    close = [
+        name for name, a, c, residual in fits
+        if name != best and residual <= residuals[best] * CLEAR_MARGIN and grows(name, a, c)
+    ]
+    # _fit's residual is the sum of squared relative errors
+    poor = math.sqrt(residuals[best] / len(sizes)) > FIT_TOLERANCE
+    if poor and beaten is not None and beaten not in close and grows(beaten, *by_name[beaten][:2]):
+        if residuals[beaten] <= residuals[best] * CLEAR_MARGIN ** 2:
+            close.insert(0, beaten)
+    return best, close
+
+
+async def _run(language, code, challenge, tests, is_guest) -> list:
+    runner = get_runner(language)
+    if runner is None:
+        return [{"input": None, "output": None, "expected_output": None, "passed": False, "error": f"Can't estimate {language} code"}]
+    challenge = {**challenge, "tests": tests, "time_limit_ms": TIME_LIMIT_MS, "signature": challenge_signature(challenge)}
+    try:
+        # Timings are the whole point here, a cached verdict has none worth reusing. Compiled
+        # languages get their optimized build, an -O0 one would skew the fit
+        options = {"profile": "benchmark"} if language == "cpp" else {}
+        return await runner.run(code, challenge, is_guest=is_guest, force=True, **options)
+    except RunnerUnavailable as e:
+        return [{"input": None, "output": None, "expected_output": None, "passed": False, "error": str(e)}]
+
+
+async def estimate_complexity(language, code, challenge, is_guest=False) -> dict:
+    """
+    Time `code` on growing inputs and fit the curve. Returns a dict with "sizes" and
+    "times_ms" (what got measured), "fits" (see fit_complexity, empty if there weren't
+    enough sizes), "best" and "close" (see pick_complexity), "timed_out_at" (size that went
+    over TIME_LIMIT_MS, or None) and "error" (why it stopped early, or None). Wrong answers
+    don't matter here, only time.
+    """
+    report = {"sizes": [], "times_ms": [], "fits": [], "best": None, "close": [], "timed_out_at": None, "error": None}
+    example = _example_test(challenge)
+    if example is None:
+        report["error"] = "This challenge has no tests to build inputs from"
+        return report
+    for n in SIZES:
+        # Same input on every run, so a rerun measures the same thing
+        test_input = scaled_input(example["input"], n, random.Random(n))
+        if test_input is None:
+            report["error"] = "None of this challenge's inputs can be scaled up"
+            return report
+        tests = [{"input": test_input, "expected_output": example.get("expected_output")}] * REPEATS
+        # A long series of big runs, an interactive Run shouldn't have to queue behind it
+        with priority(BACKGROUND):
+            results = await _run(language, code, challenge, tests, is_guest)
+        if any(result.get("error") == TLE_MESSAGE for result in results):
+            report["timed_out_at"] = n
+            break
+        errors = [result["error"] for result in results if result.get("error")]
+        if errors:
+            report["error"] = errors[0]
+            break
+        times = [result["time_ms"] for result in results if result.get("time_ms") is not None]
+        if not times:
+            report["error"] = "The runner didn't report any timings"
+            break
+        report["sizes"].append(n)
+        report["times_ms"].append(min(times))
+        # Big inputs take a while to generate, skip the size that's bound to go over anyway
+        if len(report["times_ms"]) >= 2 and report["times_ms"][-2] > 0:
+            if report["times_ms"][-1] ** 2 / report["times_ms"][-2] > TIME_LIMIT_MS:
+                break
+    if len(report["sizes"]) >= MIN_POINTS:
+        report["fits"] = fit_complexity(report["sizes"], report["times_ms"])
+        report["best"], report["close"] = pick_complexity(report["sizes"], report["fits"])
+    return report
+
+
+def format_complexity(report) -> str:
+    """Markup for the Complexity tab: best fit, a bar plot of time per size and the runners-up."""
+    lines = []
+    best = report["best"]
+    if best is not None:
+        _, a, c, _ = next(fit for fit in report["fits"] if fit[0] == best)
+        if report["close"]:
+            tied = [name for name, _ in COMPLEXITY_CLASSES if name == best or name in report["close"]]
+            lines.append(f"{DAEMON_USER} [bold]Inconclusive[/bold], {', '.join(tied[:-1])} and {tied[-1]} fit these times about as well.")
+        else:
+            lines.append(f"{DAEMON_USER} Looks like [bold]{best}[/bold] to me.")
+    else:
+        lines.append(f"{DAEMON_USER} [red][bold]Not enough data to guess a complexity.[/bold][/red]")
+    if report["error"]:
+        lines.append(f"Stopped early: {escape_brackets(report['error'])}")
+    if report["timed_out_at"]:
+        lines.append(f"n = {report['timed_out_at']:,} took longer than {format_ms(TIME_LIMIT_MS)}, so I stopped there.")
+    if report["sizes"]:
+        lines.append("")
+        longest = max(report["times_ms"]) or 1
+        label_width = len(f"{max(report['sizes']):,}")
+        for n, t in zip(report["sizes"], report["times_ms"]):
+            bar = "█" * max(1, round(t / longest * PLOT_WIDTH))
+            fitted = f"  (fit {format_ms(a + c * dict(COMPLEXITY_CLASSES)[best](n))})" if best is not None else ""
+            lines.append(f"n = {n:>{label_width},}  {bar:<{PLOT_WIDTH}}  {format_ms(t)}{fitted}")
+    others = [fit[0] for fit in report["fits"] if fit[0] != best and fit[0] not in report["close"]]
+    if others:
+        lines.append("")
+        lines.append("Other candidates, closest first: " + ", ".join(others[:3]))
+    return "\n".join(lines)
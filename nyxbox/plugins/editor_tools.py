@@ -2,7 +2,6 @@ import os
 import json
 import io, contextlib # Used to redirect STDIN & STDOUT for output
 import random
-import subprocess
 import tempfile
 import asyncio
 import platform
@@ -14,13 +13,19 @@ from textual.app import ComposeResult
 from textual.message import Message
 from textual.screen import Screen, ModalScreen
 from textual import on
+from textual.worker import Worker, WorkerState
 from textual.widget import Widget
 from . import challenge_view as UserChallView
-from .code_runners.cpp_runner import run_cpp_code
-from .code_runners.java_runner import run_java_code
-from .code_runners.py_runner import run_python_code
-from .code_runners.js_runner import run_js_code
-from .utils import escape_brackets, format_result, create_log, return_log_path, DAEMON_USER
+from .code_runners.engine import get_runner, ALL_TESTS, FAILED_ONLY, FAILED_FIRST
+from .code_runners.cpp_runner import cpp_type
+from .code_runners.java_runner import java_type, prepare_cds
+from .code_runners.signature import challenge_signature
+from .code_runners.js_runner import JS_HARNESS_PATH
+from .code_runners.js_pool import get_node_pool
+from .code_runners.toolchains import get_toolchains
+from .code_runners.generators import with_stress_tests, GeneratorError
+from .complexity import estimate_complexity, format_complexity
+from .utils import escape_brackets, shorten, format_result, format_usage, usage_summary, create_log, return_log_path, DAEMON_USER
 import tree_sitter_cpp
 from tree_sitter import Language
 # TODO:
@@ -88,9 +93,12 @@ class ResultModal(ModalScreen):
             f"{DAEMON_USER} It's okay, we can go back to the drawing board!",
             f"{DAEMON_USER} Failure is not the end! Keep trying!"
         ]
+        usage = usage_summary(self.results)
         if self.is_success:
             with Vertical(id="result_container"):
                 yield Label(f"{random.choice(CONGRATULATION_MESSAGE)}\nThere were {len(self.chall.get('tests', []))} tests and you passed them all for {self.chall.get('name')}!", id="message_title")
+                if usage:
+                    yield Label(usage, id="usage_summary")
                 with Horizontal(id="action_buttons"):
                     yield Button("Exit to Menu", id="exit_to_menu", variant="error")
                     yield Button("Keep Coding", id="keep_coding", variant="primary")
@@ -99,6 +107,8 @@ class ResultModal(ModalScreen):
             with Vertical(id="result_container"):
                 yield Label(f"{random.choice(IS_SUCCESS_FALSE_MESSAGE)}", id="message_title")
                 yield Label(f"There were {len(self.chall.get('tests', []))} tests! Unfortuantely, you only passed {len(self.passed)} tests.", id="amount_failed")
+                if usage:
+                    yield Label(usage, id="usage_summary")
                 with Horizontal(id="action_buttons"):
                     yield Button("Exit to Menu", id="exit_to_menu", variant="error")
                     yield Button("Keep Coding", id="keep_coding_not_success", variant="primary")
@@ -122,9 +132,17 @@ class ResultModal(ModalScreen):
 
 class TestResultsWidget(Widget):
     """Custom widget to implement tabbed view of chall + tests"""
+    # Live verdicts are drawn at most this often (seconds), a fast run would redraw per test otherwise
+    LIVE_REFRESH = 0.1
+
     def __init__(self):
         super().__init__()
         self.results = []
+        self.test_results = {} # so a partial run keeps the other tests' results on screen, see show_run
+        self._picker_tests = None
+        self._live = [] # verdicts that came in since the last redraw
+        self._live_counts = [0, 0] # submissions: tests done, passed
+        self._live_timer = None
         self._is_scrolling = False
     
     def on_mount(self):
@@ -181,6 +199,26 @@ class TestResultsWidget(Widget):
                         f"{DAEMON_USER} Everyone fails before they succeed. You'll never be able to tell if you don't run though!"
                         ]
                     yield Static(random.choice(self.PRE_FAILED_TESTS_MESSAGES), id="failed_tests_content_static")  
+            with TabPane("Pick Tests", id="pick_tests_tab_pane"):
+                with ScrollableContainer():
+                    yield Label(f"{DAEMON_USER} Which tests should Run go through? Submit always runs them all!")
+                    yield Select([
+                        ("Every test", ALL_TESTS),
+                        ("Only the ones that failed", FAILED_ONLY),
+                        ("Failed ones first, then the rest", FAILED_FIRST),
+                        ("Just the ones I pick below", "picked"),
+                        ],
+                        value=ALL_TESTS,
+                        allow_blank=False,
+                        id="test_mode_select")
+                    yield SelectionList(id="test_picker")
+            with TabPane("Complexity", id="complexity_tab_pane"):
+                with ScrollableContainer():
+                    self.PRE_COMPLEXITY_MESSAGES=[
+                        f"{DAEMON_USER} Think your solution scales? Hit Complexity and I'll throw bigger inputs at it.",
+                        f"{DAEMON_USER} Tiny tests can't tell O(n) from O(n²). I can!",
+                        ]
+                    yield Static(random.choice(self.PRE_COMPLEXITY_MESSAGES), id="complexity_content_static")
     # @staticmethod
     # def escape_brackets(s):
     #     # Escapes [ and ] for Textual markup
@@ -193,11 +231,90 @@ class TestResultsWidget(Widget):
         passed_tests_static = self.query_one("#passed_tests_content_static", Static)
         failed_tests_static = self.query_one("#failed_tests_content_static", Static)
         submit_results_static = self.query_one("#submit_static", Static)
+        complexity_static = self.query_one("#complexity_content_static", Static)
+        self.test_results = {}
         all_tests_static.update(random.choice(self.PRE_RUN_MESSAGES))
+        complexity_static.update(random.choice(self.PRE_COMPLEXITY_MESSAGES))
         failed_tests_static.update(random.choice(self.PRE_FAILED_TESTS_MESSAGES))
         submit_results_static.update(random.choice(self.PRE_SUBMIT_MESSAGES))
         passed_tests_static.update(random.choice(self.PRE_PASSED_TESTS_MESSAGES))
 
+    def fill_test_picker(self, chall):
+        """List the challenge's visible tests in the Pick Tests tab, once per test list"""
+        tests = chall.get("tests", [])
+        if tests is self._picker_tests:
+            return
+        self._picker_tests = tests
+        picker = self.query_one("#test_picker", SelectionList)
+        picker.clear_options()
+        picker.add_options([
+            (f"Test {i + 1}: {escape_brackets(shorten(test.get('input'), 60))}", i)
+            for i, test in enumerate(tests) if not test.get("hidden", False)
+        ])
+
+    def test_selection(self):
+        """What the next Run should cover, see engine.select_tests"""
+        mode = self.query_one("#test_mode_select", Select).value
+        if mode == "picked":
+            return sorted(self.query_one("#test_picker", SelectionList).selected) or ALL_TESTS
+        return mode
+
+    def begin_run(self, is_submission=False):
+        """A run is starting, what's on screen is from an earlier one now"""
+        self._stop_live()
+        self._live_counts = [0, 0]
+        if not is_submission:
+            self.test_results = {i: (text, False) for i, (text, _) in self.test_results.items()}
+
+    def show_live_result(self, chall, result, is_submission=False):
+        """One test's verdict from a run still in progress, redrawn together with its neighbours"""
+        self._live.append(result)
+        if self._live_timer is None:
+            self._live_timer = self.set_timer(self.LIVE_REFRESH, lambda: self._draw_live(chall, is_submission))
+
+    def _draw_live(self, chall, is_submission):
+        self._live_timer = None
+        live, self._live = self._live, []
+        if is_submission:
+            self._live_counts[0] += len(live)
+            self._live_counts[1] += sum(1 for result in live if result.get("passed"))
+            done, passed = self._live_counts
+            self.query_one("#submit_static", Static).update(
+                f"{DAEMON_USER} Judging... {done}/{len(chall.get('tests', []))} tests done, {passed} passed so far."
+            )
+            return
+        for result in live:
+            self.test_results[result["test_index"]] = (format_result(result), True)
+        self._draw_test_results(chall)
+
+    def _stop_live(self):
+        if self._live_timer is not None:
+            self._live_timer.stop()
+            self._live_timer = None
+        self._live = []
+
+    def _draw_test_results(self, chall):
+        # index -> (formatted, from this run)
+        self.update_content(chall, [
+            text if fresh else f"{text} \n[dim](from an earlier run)[/dim]"
+            for _, (text, fresh) in sorted(self.test_results.items())
+        ])
+
+    def show_run(self, chall, results):
+        """Show a Run's results, tests it didn't cover keep their earlier result"""
+        self._stop_live()
+        if not results or any(result.get("test_index") is None for result in results):
+            # Nothing to line up with the tests (compile error...), show it as is
+            self.test_results = {}
+            self.update_content(chall, [format_result(result) for result in results])
+            return
+        ran = {result["test_index"] for result in results}
+        # Anything shown live that the final results don't have (a submission cut short) is stale
+        self.test_results = {i: (text, fresh and i in ran) for i, (text, fresh) in self.test_results.items()}
+        for result in results:
+            self.test_results[result["test_index"]] = (format_result(result), True)
+        self._draw_test_results(chall)
+
     def update_content(self, chall, results=None):
         """Update widgets with latest run"""
         if self._is_scrolling:
@@ -205,6 +322,7 @@ class TestResultsWidget(Widget):
         self.all_results = results
         challenge_static = self.query_one("#challenge_content_static", Static)
         if chall:
+            self.fill_test_picker(chall)
             example_test = chall.get('tests', [{}])[0]
             example_input = escape_brackets(str(example_test.get('input', [])))
             example_expected = escape_brackets(str(example_test.get('expected_output', '???')))
@@ -255,6 +373,7 @@ class TestResultsWidget(Widget):
             passed_tests_static.update("\n\n".join([r for r in results if "[green]" in r]))
         self.refresh()
     def update_submit_content(self, chall, results=None):
+        self._stop_live()
         submit_static = self.query_one("#submit_static", Static)
         results = results or []
         passed = [r for r in results if r.get("passed")]
@@ -268,7 +387,15 @@ class TestResultsWidget(Widget):
             f"{DAEMON_USER} It's time, let's see if you learned something new!"
         ]
         summary = f"{random.choice(SUMMARY_MESSAGE)}\n \n"
-        summary += f"There were {total} tests. You have passed {len(passed)} tests so far. \n \n"
+        summary += f"There were {total} tests. You have passed {len(passed)} tests so far. \n"
+        stopped = next((r for r in results if r.get("stopped")), None)
+        if stopped is not None and stopped.get("test_index") is not None:
+            # Submissions fail fast, see protocol.stop_at_first_failure
+            summary += f"Stopped after test {stopped['test_index'] + 1}, the {total - len(results)} tests after it were skipped. \n"
+        usage = usage_summary(results)
+        if usage:
+            summary += f"{usage}\n"
+        summary += " \n"
         FAIL_MESSAGE=[
             f"{DAEMON_USER} That one didn't make it through. Why don't you take a look?",
             f"{DAEMON_USER} You were the chosen one! How could you?",
@@ -286,16 +413,22 @@ class TestResultsWidget(Widget):
         ]
         if failed:
             last_failed = failed[-1]
-            summary += f"{random.choice(FAIL_MESSAGE)}\nInput: {escape_brackets(last_failed.get('input'))}\nOutput: {escape_brackets(last_failed.get('output'))}\nExpected: {escape_brackets(last_failed.get('expected_output', last_failed.get('expected', None)))}\n\n"
+            summary += f"{random.choice(FAIL_MESSAGE)}\nInput: {escape_brackets(shorten(last_failed.get('input')))}\nOutput: {escape_brackets(shorten(last_failed.get('output')))}\nExpected: {escape_brackets(shorten(last_failed.get('expected_output', last_failed.get('expected', None))))}\n{format_usage(last_failed)}\n"
         elif errors:
             last_error = errors[-1]
-            summary += f"{random.choice(ERROR_MESSAGE)}\nInput: {escape_brackets(last_error.get('input'))}\nError: {escape_brackets(last_error.get('error'))}\n\n"
+            summary += f"{random.choice(ERROR_MESSAGE)}\nInput: {escape_brackets(shorten(last_error.get('input')))}\nError: {escape_brackets(last_error.get('error'))}\n{format_usage(last_error)}\n"
         elif passed:
             summary += random.choice(ALL_PASSED_MESSAGE)
         self.app.push_screen(ResultModal(results, chall, self, len(failed) == 0))
         submit_static.update(summary)
         self.refresh()
 
+    def update_complexity_content(self, report):
+        """Show a complexity estimate (see complexity.estimate_complexity) and switch to its tab"""
+        self.query_one("#complexity_content_static", Static).update(format_complexity(report))
+        self.query_one("#results_tabs", TabbedContent).active = "complexity_tab_pane"
+        self.refresh()
+
 class EditorClosePrompt(ModalScreen):
     
     def compose(self) -> ComposeResult:
@@ -341,6 +474,28 @@ class SelectLanguage(ModalScreen):
         if isinstance(selected, str):
             self.app.post_message(LanguageSelected(selected))    
 
+def notify_if_cached(screen, results):
+    """Let the user know when results came from the verdict cache instead of a fresh run."""
+    if results and results[0].get("cached"):
+        screen.notify(
+            title="Nothing changed!",
+            message=f"{DAEMON_USER} Same code as last time, so here's what it did last time. F5/F6 to really run or submit it again!",
+            severity="information",
+            timeout=4,
+            markup=True
+        )
+
+async def run_live(all_view, language, code, challenge, is_submission=False, **kwargs) -> list:
+    """Run the code with every verdict shown in all_view as soon as it's in, returns the results"""
+    all_view.begin_run(is_submission)
+    results = []
+    async for kind, payload in get_runner(language).stream(code, challenge, is_submission=is_submission, **kwargs):
+        if kind == "test":
+            all_view.show_live_result(challenge, payload, is_submission)
+        else:
+            results = payload
+    return results
+
 class Editor(Screen):
     def __init__(self, is_guest):
         super().__init__()
@@ -349,6 +504,8 @@ class Editor(Screen):
     BINDINGS = [
         ("ctrl+s", "save_code", "Save"),
         ("ctrl+r", "run_code", "Run"),
+        ("f5", "run_code(True)", "Rerun"),
+        ("f6", "submit_solution(True)", "Resubmit"),
         ("ctrl+q", "quit_editor", "Quit Editor"),
         ("v", "", ""),
         ("e", "", "")
@@ -378,6 +535,7 @@ class Editor(Screen):
                 h2.styles.margin = (0, 0)  # Remove all margins
                 h2.styles.padding = (0, 0)
                 with h2:
+                    yield Button("Complexity", id="complexity_edit_button", variant='primary')
                     yield Button("Reset Code", id="reset_edit_button", variant='error')
                     yield Button("Quit Editor", id="quit_edit_button", variant = 'error')
                 yield Footer()
@@ -391,9 +549,22 @@ class Editor(Screen):
             case "reset_edit_button":
                 self.action_reset_editor()
             case "submit_edit_button":
-                asyncio.create_task(self.action_submit_solution())
+                self.run_worker(self.action_submit_solution(), group="submit", exclusive=False, exit_on_error=False)
             case "run_edit_button":
-                asyncio.create_task(self.action_run_code())
+                self.run_worker(self.action_run_code(), group="run", exclusive=False, exit_on_error=False)
+            case "complexity_edit_button":
+                self.run_worker(self.action_estimate_complexity(), group="complexity", exclusive=False, exit_on_error=False)
+
+    def on_worker_state_changed(self, event: Worker.StateChanged) -> None:
+        # A run that blew up fails on its own instead of taking the app down
+        if event.state == WorkerState.ERROR and event.worker.group in ("run", "submit", "complexity"):
+            self.notify(
+                title="Something broke!",
+                message=f"{DAEMON_USER} I couldn't finish that {event.worker.group}. ({escape_brackets(event.worker.error)})",
+                severity="error",
+                timeout=5,
+                markup=True
+            )
     def on_ready(self):
         self.all_view.update_content(self.challenge)
 
@@ -473,38 +644,12 @@ class Editor(Screen):
                 self.textarea.language = 'javascript'
                 self.all_view.update_content(self.challenge, None)
                 self.app.pop_screen()
+                # Get node workers up while the user is still typing
+                pool = get_node_pool(JS_HARNESS_PATH)
+                if pool is not None:
+                    self.run_worker(pool.warm_up(), exclusive=False, exit_on_error=False)
             case 'cpp':
-                example_test = self.challenge.get('tests', [{}])[0]
-                inputs = example_test.get("input", [])
-                expected_output = example_test.get("expected_output", None)
-                def infer_cpp_type(value):
-                    """Infer C++ type from a Python value."""
-                    if isinstance(value, bool):
-                        return "bool" 
-                    if isinstance(value, int):
-                        return "int"
-                    elif isinstance(value, dict):
-                        if not value:
-                            return "map<string, int>"  
-                        key_type = infer_cpp_type(next(iter(value.keys())))
-                        val_type = infer_cpp_type(next(iter(value.values())))
-                        return f"map<{key_type}, {val_type}>"
-                    elif isinstance(value, float):
-                        return "double"
-                    elif isinstance(value, str):
-                        return "string"
-                    elif isinstance(value, list):
-                        if not value:
-                            return "vector<int>"
-                        first_type = type(value[0])
-                        if all(isinstance(x, first_type) for x in value):
-                            element_type = infer_cpp_type(value[0])
-                        else:
-                            return "vector<auto>"  # This isn't valid C++ but signals a type issue
-                        
-                        return f"vector<{element_type}>"
-                    else:
-                        return "auto"
+                signature = challenge_signature(self.challenge)
                 def default_return_value_cpp(cpp_type):
                     """Provide a default return value for a given C++ type."""
                     if cpp_type == "bool":
@@ -521,9 +666,9 @@ class Editor(Screen):
                         return "{}"
                     else:
                         return "0"
-                param_types = [infer_cpp_type(param) for param in inputs]
+                param_types = [cpp_type(name) for name in signature["params"]]
                 param_str = ", ".join(f"{ptype} param{i}" for i, ptype in enumerate(param_types))
-                return_type = infer_cpp_type(expected_output)
+                return_type = cpp_type(signature["returns"])
 
                 template = f"""#include <iostream>
 #include <vector>
@@ -555,33 +700,10 @@ using namespace std;
                     markup=True
                     )
             case 'java':
-                def infer_java_type(value):
-                    if value is None:
-                        return "Object"
-                    elif isinstance(value, bool):
-                        return "boolean"
-                    elif isinstance(value, int):
-                        return "int"
-                    elif isinstance(value, float):
-                        return "double"
-                    elif isinstance(value, str):
-                        return "String"
-                    elif isinstance(value, list):
-                        if not value:
-                            return "int[]"  # Default for empty lists
-                        first_type = infer_java_type(value[0])
-                        return f"{first_type}[]"
-                    elif isinstance(value, dict):
-                        return "Map<Object, Object>"
-                    else:
-                        return "Object"
-                
-                example_test = self.challenge.get('tests', [{}])[0]
-                inputs = example_test.get("input", [])
-                param_types = [infer_java_type(val) for val in inputs]
+                signature = challenge_signature(self.challenge)
+                param_types = [java_type(name) for name in signature["params"]]
                 param_str = ", ".join(f"{ptype} param{i}" for i, ptype in enumerate(param_types))
-                expected_output = example_test.get("expected_output", None)
-                return_type = infer_java_type(expected_output)
+                return_type = java_type(signature["returns"])
                 template = f"""public static {return_type} {self.challenge['function_name']}({param_str}) {{
     // Your code here.
     // Don't use System.out.println(), return the result instead!
@@ -605,14 +727,16 @@ using namespace std;
         """Return the current code from the editor"""
         return self.query_one(TextArea).text
     
-    async def action_run_code(self) -> None:
-        """Execute the current code and show results"""
+    async def action_run_code(self, force=False) -> None:
+        """Execute the current code and show results, `force` skips the verdict cache"""
         code = self.query_one(TextArea).text
+        selection = self.all_view.test_selection()
         all_results=[]
         formatted_results=[]
         match self.language:
             case 'py':
-                results=await run_python_code(code, self.challenge, is_guest=self.is_guest)
+                results=await run_live(self.all_view, 'py', code, self.challenge, is_guest=self.is_guest, force=force, selection=selection)
+                notify_if_cached(self, results)
                 self.notify(
                     title="Hey... I started running your code!",
                     message=f"{DAEMON_USER} Wait a sec as I finish!",
@@ -627,11 +751,11 @@ using namespace std;
                     timeout=3,
                     markup=True
                 )
-                formatted_results = [format_result(result) for result in results]
-                self.all_view.update_content(self.challenge, formatted_results)
+                self.all_view.show_run(self.challenge, results)
 
             case 'js':
-                all_results = await run_js_code(code, self.challenge, is_guest = self.is_guest)
+                all_results = await run_live(self.all_view, 'js', code, self.challenge, is_guest = self.is_guest, force=force, selection=selection)
+                notify_if_cached(self, all_results)
                 self.notify(
                     title="Hey... I started running your code!",
                     message=f"{DAEMON_USER} Wait a sec as I finish!",
@@ -639,7 +763,6 @@ using namespace std;
                     timeout=3,
                     markup=True
                     )
-                formatted_results = [format_result(result) for result in all_results]
                 self.notify(
                     title="Hey mortal...I finished running your code!",
                     message=f"{DAEMON_USER} Check your 'All Tests' tab! See ya~",
@@ -647,33 +770,78 @@ using namespace std;
                     timeout=3,
                     markup=True
                 )
-                self.all_view.update_content(self.challenge, formatted_results)
+                self.all_view.show_run(self.challenge, all_results)
             case 'cpp':
                 self.app.push_screen(self.CompilationStandardPopup(self.challenge, 
                         self.textarea.text, 
                         self.challenge['function_name'], 
-                        [test for test in self.challenge['tests'] if not test.get("hidden", False)], 
+                        self.challenge['tests'], # The runners skip hidden ones on a Run
                         self.language, 
                         self.textarea, 
-                        self.all_view))
+                        self.all_view,
+                        force=force,
+                        selection=selection))
             case 'java':
                 self.app.push_screen(self.CompilationStandardPopup(self.challenge, 
                     self.textarea.text, 
                     self.challenge['function_name'], 
-                    [test for test in self.challenge['tests'] if not test.get("hidden", False)], 
+                    self.challenge['tests'],
                     self.language, 
                     self.textarea, 
-                    self.all_view))
+                    self.all_view,
+                    force=force,
+                    selection=selection))
+
+    async def action_estimate_complexity(self):
+        """Time the current code on growing inputs and guess its complexity"""
+        if self.language not in ("py", "js", "cpp", "java"):
+            self.notify(
+                title="Not yet!",
+                message=f"{DAEMON_USER} I can't time that language yet, sorry!",
+                severity="error",
+                timeout=3,
+                markup=True
+            )
+            return
+        self.notify(
+            title="Hey... I'm timing your code!",
+            message=f"{DAEMON_USER} Bigger and bigger inputs, this can take a bit!",
+            severity="information",
+            timeout=3,
+            markup=True
+        )
+        report = await estimate_complexity(self.language, self.query_one(TextArea).text, self.challenge, is_guest=self.is_guest)
+        self.all_view.update_complexity_content(report)
+        self.notify(
+            title="Hey mortal...I finished timing your code!",
+            message=f"{DAEMON_USER} Check your 'Complexity' tab! See ya~",
+            severity="information",
+            timeout=3,
+            markup=True
+        )
 
-    async def action_submit_solution(self):
-        """Submit solution for evaluation against test cases, hidden and non-hidden"""
+    async def action_submit_solution(self, force=False):
+        """Submit solution for evaluation against test cases, hidden and non-hidden, `force` skips the verdict cache"""
         code = self.query_one(TextArea).text
+        try:
+            # Challenges can describe big hidden stress tests, those only run on submit
+            challenge = await with_stress_tests(self.challenge)
+        except GeneratorError as e:
+            self.notify(
+                title="My stress tests broke!",
+                message=f"{DAEMON_USER} Couldn't build this challenge's stress tests, submitting without them. ({escape_brackets(e)})",
+                severity="warning",
+                timeout=5,
+                markup=True
+            )
+            challenge = self.challenge
         namespace={}
         all_results=[]
         formatted_results=[]
         match self.language:
             case 'py':
-                results=await run_python_code(code, self.challenge, is_submission=True, is_guest=self.is_guest)
+                results=await run_live(self.all_view, 'py', code, challenge, is_submission=True, is_guest=self.is_guest, force=force)
+                notify_if_cached(self, results)
                 self.notify(
                     title="Hey... I started running your code!",
                     message=f"{DAEMON_USER} Wait a sec as I finish!",
@@ -681,7 +849,7 @@ using namespace std;
                     timeout=3,
                     markup=True
                     )
-                self.all_view.update_submit_content(self.challenge, results)
+                self.all_view.update_submit_content(challenge, results)
                 self.notify(
                     title="Hey... I finished running your code!",
                     message=f"{DAEMON_USER} Check ur submit tab!",
@@ -690,7 +858,8 @@ using namespace std;
                     markup=True
                     )
             case 'js':
-                all_results = await run_js_code(code, self.challenge, True, is_guest = self.is_guest)
+                all_results = await run_live(self.all_view, 'js', code, challenge, is_submission=True, is_guest = self.is_guest, force=force)
+                notify_if_cached(self, all_results)
                 self.notify(
                     title="Hey mortal...I finished running your code!",
                     message=f"{DAEMON_USER} Check ur submit tab!",
@@ -698,26 +867,28 @@ using namespace std;
                     timeout=3,
                     markup=True
                 )
-                self.all_view.update_submit_content(self.challenge, all_results)
+                self.all_view.update_submit_content(challenge, all_results)
             case 'cpp':
-                self.app.push_screen(self.CompilationStandardPopup(self.challenge, 
+                self.app.push_screen(self.CompilationStandardPopup(challenge, 
                     self.textarea.text, 
-                    self.challenge['function_name'], 
-                    self.challenge['tests'],
+                    challenge['function_name'], 
+                    challenge['tests'],
                     self.language, 
                     self.textarea, 
                     self.all_view, 
-                    is_submission=True))
+                    is_submission=True,
+                    force=force))
             case 'java':
                 self.app.push_screen(self.CompilationStandardPopup(
-                    self.challenge, 
+                    challenge, 
                     self.textarea.text, 
-                    self.challenge['function_name'], 
-                    self.challenge['tests'],
+                    challenge['function_name'], 
+                    challenge['tests'],
                     self.language, 
                     self.textarea, 
                     self.all_view, 
-                    is_submission=True))
+                    is_submission=True,
+                    force=force))
 
     
     def action_reset_editor(self):
@@ -725,7 +896,7 @@ using namespace std;
         self.app.push_screen(self.EditorResetConfirm(self))
 
     class CompilationStandardPopup(ModalScreen):
-        def __init__(self, chall, user_code, func_name, test_cases, language, editor, testresultswidget, is_submission=False, is_guest = False):
+        def __init__(self, chall, user_code, func_name, test_cases, language, editor, testresultswidget, is_submission=False, is_guest = False, force=False, selection=ALL_TESTS):
             super().__init__()
             self.chall = chall
             self.code = user_code
@@ -737,55 +908,32 @@ using namespace std;
             self.editor_class = Editor
             self.is_submission = is_submission
             self.is_guest = is_guest
+            self.force = force
+            self.selection = selection
         async def on_mount(self) -> None:
+            toolchains = await get_toolchains() # Probed at app start, usually ready already
             if self.lang == "cpp":
-                result = None
-                try:
-                    result = subprocess.run(["clang++", "--version"], capture_output=True, text=True)
-                    if result.returncode != 0:
-                        try:
-                            result = subprocess.run(["g++", "--version"], capture_output=True, text=True)
-                        except FileNotFoundError:
-                            self.app.pop_screen()
-                            self.notify(
-                                title="No compiler?",
-                                message=f"{DAEMON_USER} Hey, you don't have a supported compiler. How do you want me to compile? Maybe install clang++ or g++?",
-                                severity="error",
-                                timeout=3,
-                                markup=True
-                            )
-                except FileNotFoundError:
-                    try:
-                        result = subprocess.run(["g++", "--version"], capture_output=True, text=True)
-                    except FileNotFoundError:
-                        self.app.pop_screen()
-                        self.notify(
-                            title="No compiler?",
-                            message=f"{DAEMON_USER} Hey, you don't have a supported compiler. How do you want me to compile? Maybe install clang++ or g++?",
-                            severity="error",
-                            timeout=3,
-                            markup=True
-                        )
-                    except Exception as e:
-                        self.app.pop_screen()
-                        self.notify(
-                            title="Random error?",
-                            message=f"{DAEMON_USER} What the heck? Attempted to check g++ version, got {str(e)}",
-                            severity="error",
-                            timeout=10,
-                            markup=True
-                        )
-                except Exception as e:
+                if not toolchains["cpp"]:
                     self.app.pop_screen()
                     self.notify(
-                            title="Random error?",
-                            message=f"{DAEMON_USER} What the heck? Attempted to check clang++ version, got: {str(e)}",
-                            severity="error",
-                            timeout=10,
-                            markup=True
-                        )
+                        title="No compiler?",
+                        message=f"{DAEMON_USER} Hey, you don't have a supported compiler. How do you want me to compile? Maybe install clang++ or g++?",
+                        severity="error",
+                        timeout=3,
+                        markup=True
+                    )
+                    return
+                # Only offer the standards the compiler the runner will use understands
+                standards = toolchains["cpp"][0]["standards"]
+                if standards:
+                    select = self.query_one("#std_select", Select)
+                    select.set_options([(standard.replace("c++", "C++"), standard) for standard in standards])
+                    select.value = "c++17" if "c++17" in standards else standards[0]
             elif self.lang == "java":
-                self.jdk_mapping = await asyncio.to_thread(self.scan_jdks) # Store discovered JDKs
+                self.jdk_mapping = toolchains["java"] # Discovered JDKs, major version -> path
+                for jdk_path in self.jdk_mapping.values():
+                    # Train the CDS archives the cold javac/java path uses, off the UI
+                    self.run_worker(prepare_cds(jdk_path), exclusive=False, exit_on_error=False)
                 select = self.query_one("#std_select", Select)
                 yes_button = self.query_one("#yes_comp", Button)
                 no_button = self.query_one("#no_comp", Button)
@@ -836,12 +984,15 @@ using namespace std;
                     tests=self.tests,
                     is_submission=self.is_submission,
                     all_view=self.all_view,
-                    chall=self.chall))
+                    chall=self.chall,
+                    force=self.force,
+                    selection=self.selection))
                 return 
             else:
                 if value and isinstance(value, str):
                     if self.lang == "cpp":
-                        results = await run_cpp_code(self.code, self.func_name, self.tests, value, self.is_submission, self.is_guest)
+                        results = await run_live(self.all_view, "cpp", self.code, {**(self.chall or {}), "function_name": self.func_name, "tests": self.tests}, self.is_submission, is_guest=self.is_guest, standard=value, force=self.force, selection=self.selection)
+                        notify_if_cached(self, results)
                         self.notify(
                             title="Hey... I started running your code!",
                             message=f"{DAEMON_USER} Wait a sec as I finish!",
@@ -849,7 +1000,6 @@ using namespace std;
                             timeout=3,
                             markup=True
                         )
-                        formatted_results = [format_result(result) for result in results]
                         if self.is_submission:
                             self.all_view.update_submit_content(self.chall, results)
                             self.notify(
@@ -860,7 +1010,7 @@ using namespace std;
                                 markup=True
                             )
                         else:
-                            self.all_view.update_content(self.chall, formatted_results)
+                            self.all_view.show_run(self.chall, results)
                             self.notify(
                                 title="Hey mortal...I finished running your code!",
                                 message=f"{DAEMON_USER} Check your 'All Tests' tab! See ya~",
@@ -876,7 +1026,8 @@ using namespace std;
                             self.notify(title="Error", message=f"Selected JDK version '{value}' not found in mapping.", severity="error")
                             return
 
-                        results = await run_java_code(self.code, self.func_name, self.tests, jdk_path, self.is_submission, self.is_guest)
+                        results = await run_live(self.all_view, "java", self.code, {**(self.chall or {}), "function_name": self.func_name, "tests": self.tests}, self.is_submission, is_guest=self.is_guest, jdk_path=jdk_path, force=self.force, selection=self.selection)
+                        notify_if_cached(self, results)
                         self.notify(
                             title="Hey... I started running your code!",
                             message=f"{DAEMON_USER} Wait a sec as I finish!",
@@ -884,7 +1035,6 @@ using namespace std;
                             timeout=3,
                             markup=True
                         )
-                        formatted_results = [format_result(result) for result in results]
                         if self.is_submission:
                             self.all_view.update_submit_content(self.chall, results)
                             self.notify(
@@ -895,7 +1045,7 @@ using namespace std;
                                 markup=True
                             )
                         else:
-                            self.all_view.update_content(self.chall, formatted_results)
+                            self.all_view.show_run(self.chall, results)
                             self.notify(
                                 title="Hey mortal...I finished running your code!",
                                 message=f"{DAEMON_USER} Check your 'All Tests' tab! See ya~",
@@ -913,78 +1063,11 @@ using namespace std;
                         markup=True
                     )
 
-        def scan_jdks(self) -> dict:
-            system = platform.system()
-            jdk_mapping={} 
-            if system=="Windows":
-                base_dirs = [r"C:\Program Files\Java", r"C:\Program Files (x86)\Java"]
-                for base in base_dirs:
-                    if os.path.exists(base):
-                        for sub in os.listdir(base):
-                            jdk_path = os.path.join(base, sub)
-                            javac = os.path.join(jdk_path, "bin", "javac.exe")
-                            if os.path.exists(javac):
-                                try:
-                                    result = subprocess.run([javac, "-version"], capture_output=True, text=True)
-                                    version_line = result.stdout or result.stderr
-                                    if version_line.startswith("javac"):
-                                        version_str = version_line.split()[1]
-                                        if version_str.startswith("1."):
-                                            version = version_str.split(".")[1]
-                                        else:
-                                            version = version_str.split(".")[0]
-                                        jdk_mapping[version] = jdk_path
-                                except Exception:
-                                    pass
-            elif system=="Darwin":
-                base_dirs = [r"/Library/Java/JavaVirtualMachines/"]
-                for base in base_dirs:
-                    if os.path.exists(base):
-                        for sub_folder in os.listdir(base):
-                            jdk_path = os.path.join(base, sub_folder, "Contents", "Home")
-                            javac = os.path.join(jdk_path, "bin", "javac")
-                            if os.path.exists(javac):
-                                try:
-                                    result = subprocess.run([javac, "-version"], capture_output=True, text=True)
-                                    version_line = result.stdout or result.stderr
-                                    if version_line.startswith("javac"):
-                                        version_str = version_line.split()[1]
-                                        if version_str.startswith("1."):
-                                            version = version_str.split(".")[1]
-                                        else:
-                                            version = version_str.split(".")[0]
-                                        jdk_mapping[version] = jdk_path
-                                except Exception:
-                                    pass
-            elif system=="Linux":
-                base_dirs = [r"/usr/lib/jvm"]
-                for base in base_dirs:
-                    if os.path.exists(base):
-                        for sub_folder in os.listdir(base):
-                            jdk_path = os.path.join(base, sub_folder)
-                            javac = os.path.join(jdk_path, "bin", "javac")
-                            if os.path.exists(javac):
-                                try:
-                                    result = subprocess.run([javac, "-version"], capture_output=True, text=True)
-                                    version_line = result.stdout or result.stderr
-                                    if version_line.startswith("javac"):
-                                        version_str = version_line.split()[1]
-                                        if version_str.startswith("1."):
-                                            version = version_str.split(".")[1]  
-                                        else:
-                                            version = version_str.split(".")[0] 
-                                        jdk_mapping[version] = jdk_path
-                                except Exception:
-                                    pass
-            self.jdk_mapping = jdk_mapping
-            return jdk_mapping
-
-
         @on(Button.Pressed, "#no_comp")
         def stop_comp(self):
             self.app.pop_screen()
     class CustomCompilationPath(ModalScreen):       
-        def __init__(self, language, editor, func_name, tests, is_submission, all_view, chall):
+        def __init__(self, language, editor, func_name, tests, is_submission, all_view, chall, force=False, selection=ALL_TESTS):
                     super().__init__()
                     self.language=language
                     self.editor=editor
@@ -995,6 +1078,8 @@ using namespace std;
                     self.chall = chall
                     self.all_view = all_view
                     self.editor_class = Editor
+                    self.force = force
+                    self.selection = selection
 
             
         def compose(self) -> ComposeResult:
@@ -1045,7 +1130,8 @@ using namespace std;
                         return
                     self.app.pop_screen()
                     self.app.pop_screen() #We do it twice since we know there are two layers of screens
-                    results = await run_java_code(self.editor.text, self.func_name, self.tests, current_path_value, self.is_submission)
+                    results = await run_live(self.all_view, "java", self.editor.text, {**(self.chall or {}), "function_name": self.func_name, "tests": self.tests}, self.is_submission, jdk_path=current_path_value, force=self.force, selection=self.selection)
+                    notify_if_cached(self, results)
                     self.notify(
                         title="Hey... I started running your code!",
                         message=f"{DAEMON_USER} Wait a sec as I finish!",
@@ -1053,7 +1139,6 @@ using namespace std;
                         timeout=3,
                         markup=True
                     )
-                    formatted_results = [format_result(result) for result in results]
                     if self.is_submission:
                         self.all_view.update_submit_content(self.chall, results)
                         self.notify(
@@ -1064,7 +1149,7 @@ using namespace std;
                             markup=True
                         )
                     else:
-                        self.all_view.update_content(self.chall, formatted_results)
+                        self.all_view.show_run(self.chall, results)
                         self.notify(
                             title="Hey mortal...I finished running your code!",
                             message=f"{DAEMON_USER} Check your 'All Tests' tab! See ya~",
@@ -16,15 +16,52 @@ except PackageNotFoundError:
 USER_AGENT = f"NyxBoxClient/{NYXBOX_VERSION}"
 DAEMON_USER="[#B3507D][bold]nyx[/bold][/#B3507D]@[#A3C9F9]hackclub[/#A3C9F9]:~$"
 SERVER_URL="https://nyxbox.thisisrainy.hackclub.app"
+# Longest input/output shown for a test, generated stress tests can be megabytes
+DISPLAY_LIMIT = 300
 
 def escape_brackets(s):
         # Escapes [ and ] for Textual markup
         return str(s).replace("[", "\\[").replace("]", "]")
 
+def shorten(value, limit=DISPLAY_LIMIT):
+    """str(value), cut off for display if it's too long."""
+    text = str(value)
+    return text if len(text) <= limit else f"{text[:limit]}... ({len(text):,} chars)"
+
+def format_ms(ms):
+    return f"{ms * 1000:.0f} µs" if ms < 1 else f"{ms:.1f} ms" if ms < 1000 else f"{ms / 1000:.2f} s"
+
+def format_kb(kb):
+    return f"{kb} KB" if kb < 1024 else f"{kb / 1024:.1f} MB"
+
+def format_usage(result):
+    """Time/CPU/memory line for a result, empty if the runner didn't measure anything."""
+    parts = []
+    if result.get("time_ms") is not None:
+        parts.append(f"Time: {format_ms(result['time_ms'])}")
+    if result.get("cpu_ms") is not None:
+        parts.append(f"CPU: {format_ms(result['cpu_ms'])}")
+    if result.get("memory_kb") is not None:
+        parts.append(f"Memory: {format_kb(result['memory_kb'])}")
+    return " | ".join(parts)
+
+def usage_summary(results):
+    """Slowest test and peak memory over a whole run, empty if nothing was measured."""
+    times = [r["time_ms"] for r in results if r.get("time_ms") is not None]
+    memory = [r["memory_kb"] for r in results if r.get("memory_kb") is not None]
+    parts = []
+    if times:
+        parts.append(f"Slowest test: {format_ms(max(times))}, total: {format_ms(sum(times))}")
+    if memory:
+        parts.append(f"Peak memory: {format_kb(max(memory))}")
+    return " | ".join(parts)
+
 def format_result(result):
-    input_str = escape_brackets(result.get("input"))
-    output_str = escape_brackets(result.get("output"))
-    expected_str = escape_brackets(result.get("expected_output"))
+    usage = format_usage(result)
+    usage_str = f" \n{usage}" if usage else ""
+    input_str = escape_brackets(shorten(result.get("input")))
+    output_str = escape_brackets(shorten(result.get("output")))
+    expected_str = escape_brackets(shorten(result.get("expected_output")))
     error_str = escape_brackets(result.get("error"))
     if result.get("error"):
         ERROR_MESSAGES = [
@@ -34,7 +71,7 @@ def format_result(result):
             f"{DAEMON_USER} [red][bold]Every coder faces errors - you're doing great![/bold][/red]",
             f"{DAEMON_USER} [red][bold]Let's see what the machine is trying to tell us.[/bold][/red]"
         ]
-        return f"{random.choice(ERROR_MESSAGES)} \nInput: {input_str} \nError: {error_str}"
+        return f"{random.choice(ERROR_MESSAGES)} \nInput: {input_str} \nError: {error_str}{usage_str}"
     elif not result.get("passed"):
         FAILED_MESSAGES = [
             f"{DAEMON_USER} [red][bold]Almost there! Just a small adjustment needed.[/bold][/red]",
@@ -44,7 +81,7 @@ def format_result(result):
             f"{DAEMON_USER} [red][bold]You're learning! Check the differences and see where it went wrong!.[/bold][/red]",
             f"{DAEMON_USER} [red][bold]Keep going! You're building great problem-solving skills.[/bold][/red]"
         ]
-        return f"{random.choice(FAILED_MESSAGES)} \nInput: {input_str} \nOutput: {output_str} \nExpected: {expected_str}"
+        return f"{random.choice(FAILED_MESSAGES)} \nInput: {input_str} \nOutput: {output_str} \nExpected: {expected_str}{usage_str}"
     
     elif result.get("passed"):
         PASSED_MESSAGES = [
@@ -55,7 +92,7 @@ def format_result(result):
             f"{DAEMON_USER} [green][bold]You should be proud of that solution.[/bold][/green]",
             f"{DAEMON_USER} [green][bold]Well done! Your code passed this test.[/bold][/green]"
         ]
-        return f"{random.choice(PASSED_MESSAGES)} \nInput: {input_str} \nOutput: {output_str} \nExpected: {expected_str}"
+        return f"{random.choice(PASSED_MESSAGES)} \nInput: {input_str} \nOutput: {output_str} \nExpected: {expected_str}{usage_str}"
     
     else:
         FALLBACK_MESSAGES = [